@@ -1,18 +1,19 @@
 from flask import Flask
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore
 
-app = Flask(__name__)
-CORS(app)
-# Initialize Firebase
-cred = credentials.Certificate("serviceAccountKey.json")  # Download from Firebase
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# The services each talk to Firestore themselves (see common/storage.py);
+# this placeholder only answers health checks, so it no longer initializes
+# Firebase at import.
+def create_app():
+    app = Flask(__name__)
+    CORS(app)
 
-@app.route("/")
-def home():
-    return "Tournament Backend API is Running!"
+    @app.route("/")
+    def home():
+        return "Tournament Backend API is Running!"
+
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    app.run(debug=True)
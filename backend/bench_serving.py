@@ -0,0 +1,193 @@
+# bench_serving.py
+"""Requests/sec on two hot read paths: Flask dev server vs serve.py (gunicorn).
+
+    # Against a running stack (docker compose up, then SERVE_MODE=dev docker compose up)
+    python bench_serving.py --tournament cup --base-tournament http://localhost:5002 \\
+        --base-composite http://localhost:5006
+
+    # Or start tournament-service, teams-service and join-team-service locally
+    # on the SQLite storage backend, once per mode, and compare
+    python bench_serving.py --launch dev gunicorn
+
+Measures GET /tournament/<id> and GET
+/composite/tournament_details_with_teams/<id>. The composite calls
+tournament-service and teams-service by their compose host names, so
+--launch needs them to resolve locally (e.g. an /etc/hosts line
+"127.0.0.1 tournament-service teams-service").
+
+Each run uses --concurrency client threads, each with a keep-alive session,
+for --duration seconds after a short warm-up. Add --slow-downstream to
+make teams-service sleep for that many seconds per request. That mimics a
+slow dependency and shows how each mode holds up when composite requests
+block.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICES = {
+    # name: (directory, module, port, worker class, extra env)
+    "tournament-service": ("services/tournament-service", "tournament_service", 5002, "gthread", {"WEB_WORKERS": "1"}),
+    "teams-service": ("services/teams-service", "teams_service", 5003, "gthread", {}),
+    "join-team-service": ("composite-services/join_team_service", "join_team_service", 5006, "gevent", {}),
+}
+
+
+def seed(path, tournament_id, teams):
+    sys.path.insert(0, os.path.join(HERE, "common"))
+    import storage
+
+    db = storage.LocalClient(path)
+    team_entries = []
+    batch = db.batch()
+    for i in range(teams):
+        team_id = f"{tournament_id}-team{i}"
+        players = {f"{team_id}-p{j}": f"Player {j}" for j in range(5)}
+        batch.set(db.collection("teams").document(team_id), {"name": f"Team {i}", "players": players})
+        team_entries.append({"teamId": team_id, "players": list(players),
+                             "teamStats": {"wins": 0, "losses": 0, "elo": 1500, "initialElo": 1500}})
+    batch.set(db.collection("tournaments").document(tournament_id),
+              {"name": "Bench Cup", "status": "ongoing", "teams": team_entries})
+    batch.commit()
+
+
+def launch(mode, db_path, slow_downstream):
+    procs = []
+    for name, (directory, module, port, worker_class, extra) in SERVICES.items():
+        env = dict(os.environ, STORAGE_BACKEND="sqlite", STORAGE_PATH=db_path, **extra)
+        env["PYTHONPATH"] = os.pathsep.join([os.path.join(HERE, directory), os.path.join(HERE, "common")])
+        env.pop("TRACE_DIR", None)
+        if mode == "dev":
+            env["SERVE_MODE"] = "dev"
+        else:
+            env.pop("SERVE_MODE", None)
+        if slow_downstream and name == "teams-service":
+            env["BENCH_SLEEP"] = str(slow_downstream)
+        cmd = [sys.executable, os.path.join(HERE, "common", "serve.py"), f"{module}:create_app",
+               "--port", str(port), "--host", "127.0.0.1", "--worker-class", worker_class]
+        if slow_downstream and name == "teams-service":
+            cmd = [sys.executable, "-c", SLOW_WRAPPER] + cmd[1:]
+        procs.append(subprocess.Popen(cmd, env=env, cwd=os.path.join(HERE, directory),
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    for _, _, port, _, _ in SERVICES.values():
+        wait_ready(f"http://127.0.0.1:{port}/metrics")
+    return procs
+
+
+# Runs serve.py with a before_request sleep added to the app, for --slow-downstream
+SLOW_WRAPPER = """
+import os, runpy, sys, time
+import flask
+_init = flask.Flask.__init__
+def init(self, *args, **kwargs):
+    _init(self, *args, **kwargs)
+    self.before_request(lambda: time.sleep(float(os.environ["BENCH_SLEEP"])))
+flask.Flask.__init__ = init
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def wait_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def load(url, concurrency, duration, warmup=1.0):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker():
+        session = requests.Session()
+        local, failed = [], 0
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= stop_at:
+                break
+            try:
+                ok = session.get(url, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            t1 = time.perf_counter()
+            if t0 >= measure_from:
+                if ok:
+                    local.append(t1 - t0)
+                else:
+                    failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000 if latencies else float("nan")
+
+    return {"rps": len(latencies) / duration, "p50": pct(0.5), "p99": pct(0.99), "errors": errors[0]}
+
+
+def run(label, args, base_tournament, base_composite):
+    for name, url in [("GET /tournament/<id>", f"{base_tournament}/tournament/{args.tournament}"),
+                      ("GET /composite/tournament_details_with_teams/<id>",
+                       f"{base_composite}/composite/tournament_details_with_teams/{args.tournament}")]:
+        r = load(url, args.concurrency, args.duration)
+        print(f"{label:9} {name:50} {r['rps']:8.0f} req/s  p50 {r['p50']:7.1f}ms  "
+              f"p99 {r['p99']:7.1f}ms  errors {r['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tournament", default="bench-cup")
+    parser.add_argument("--teams", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--base-tournament", default="http://localhost:5002")
+    parser.add_argument("--base-composite", default="http://localhost:5006")
+    parser.add_argument("--launch", nargs="+", choices=["dev", "gunicorn"],
+                        help="start the services locally in these modes, one after another")
+    parser.add_argument("--slow-downstream", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if not args.launch:
+        run("running", args, args.base_tournament, args.base_composite)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path, args.tournament, args.teams)
+        for mode in args.launch:
+            procs = launch(mode, db_path, args.slow_downstream)
+            try:
+                run(mode, args, "http://127.0.0.1:5002", "http://127.0.0.1:5006")
+            finally:
+                for proc in procs:
+                    proc.terminate()
+                for proc in procs:
+                    proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# bench_startup.py
+"""Cold start of every Flask service, checked against startup_budget.json.
+
+    python bench_startup.py                   # measure and compare
+    python bench_startup.py --check           # exit 1 if any service is over budget
+    python bench_startup.py --record          # rewrite the budget from this run
+    python bench_startup.py --only tournament-service --runs 5
+
+For each service, in fresh processes, this measures two things:
+
+- import: how long ``import <module>`` takes.
+- first request: the time from launching ``serve.py <module>:create_app``
+  (one gunicorn worker) until a route that reads storage first answers.
+  The probe reads a document that does not exist, so a 404 counts; it
+  still pays for building the storage client on first use. Composite
+  services have no storage of their own and are probed on ``/metrics``.
+
+Both are the median of --runs runs. A module that talks to Firestore,
+RabbitMQ or another service at import shows up here as a regression.
+
+Runs use STORAGE_BACKEND=memory by default, so no credentials or network
+are needed. To include Firebase and Firestore client setup, run with
+``--backend firestore`` where FIREBASE_CREDENTIALS points at a key.
+
+--record writes each measurement times --headroom, rounded up to 50ms.
+Re-record on purpose, when a slower start is expected, and commit the
+new budget alongside the change.
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(HERE, "startup_budget.json")
+PROBE_ID = "bench-startup"
+SERVICES = {
+    # name: (directory, module, GET path timed as the first request)
+    "player-service": ("services/player-service", "player_service", f"/player/{PROBE_ID}"),
+    "tournament-service": ("services/tournament-service", "tournament_service", f"/tournament/{PROBE_ID}"),
+    "teams-service": ("services/teams-service", "teams_service", f"/team/{PROBE_ID}"),
+    "match-service": ("services/match-service", "match_service", f"/match/{PROBE_ID}"),
+    "schedule-service": ("services/schedule-service", "schedule_service",
+                         f"/schedule/by-tournament/{PROBE_ID}"),
+    "join-team-service": ("composite-services/join_team_service", "join_team_service", "/metrics"),
+    "make-match-service": ("composite-services/make-a-match-service", "make_match", "/metrics"),
+    "handle-dispute-service": ("composite-services/handle-dispute-service", "handle_dispute_service",
+                               "/metrics"),
+    "finalize-match-outcome-service": ("composite-services/finalize-match-outcome-service",
+                                       "finalize_match_outcome_service", "/metrics"),
+}
+
+IMPORT_TIMER = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+
+def service_env(directory, backend):
+    env = dict(os.environ, STORAGE_BACKEND=backend, WEB_WORKERS="1")
+    env["PYTHONPATH"] = os.pathsep.join([os.path.join(HERE, directory), os.path.join(HERE, "common")])
+    for key in ("TRACE_DIR", "SERVE_MODE", "ACCESS_LOG"):
+        env.pop(key, None)
+    return env
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_import(directory, module, backend):
+    out = subprocess.run([sys.executable, "-c", IMPORT_TIMER.format(module=module)],
+                         env=service_env(directory, backend), cwd=os.path.join(HERE, directory),
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_first_request(directory, module, probe, backend, timeout=60):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{probe}"
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "common", "serve.py"), f"{module}:create_app",
+                             "--host", "127.0.0.1", "--port", str(port)],
+                            env=service_env(directory, backend), cwd=os.path.join(HERE, directory),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{module} exited with {proc.returncode}")
+            try:
+                status = requests.get(url, timeout=timeout).status_code
+            except requests.ConnectionError:
+                time.sleep(0.01)
+                continue
+            if status >= 500:
+                raise RuntimeError(f"{module} answered GET {probe} with {status}")
+            return time.perf_counter() - started
+        raise RuntimeError(f"{module} did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def load_budget():
+    try:
+        with open(BUDGET_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(SERVICES))
+    parser.add_argument("--backend", default="memory", choices=["memory", "firestore"])
+    parser.add_argument("--check", action="store_true", help="exit 1 if any service is over budget")
+    parser.add_argument("--record", action="store_true", help="write the budget from this run")
+    parser.add_argument("--headroom", type=float, default=1.5)
+    args = parser.parse_args()
+
+    budget = load_budget()
+    over = []
+    print(f"{'service':32} {'import':>8} {'budget':>7}   {'first request':>13} {'budget':>7}")
+    for name in args.only or SERVICES:
+        directory, module, probe = SERVICES[name]
+        measured = {
+            "import": statistics.median(time_import(directory, module, args.backend) for _ in range(args.runs)),
+            "first_request": statistics.median(time_first_request(directory, module, probe, args.backend)
+                                               for _ in range(args.runs)),
+        }
+        cells = []
+        for key, value in measured.items():
+            limit = budget.get(name, {}).get(key)
+            if limit is not None and value > limit:
+                over.append(f"{name} {key}: {value:.2f}s > {limit:.2f}s")
+            marker = "!" if limit is not None and value > limit else " "
+            cells.append((value, "-" if limit is None else f"{limit:.2f}s", marker))
+        (imp, imp_limit, imp_mark), (first, first_limit, first_mark) = cells
+        print(f"{name:32} {imp:7.2f}s {imp_limit:>7} {imp_mark} {first:12.2f}s {first_limit:>7} {first_mark}")
+        if args.record:
+            budget[name] = {key: math.ceil(value * args.headroom * 20) / 20 for key, value in measured.items()}
+
+    if args.record:
+        with open(BUDGET_FILE, "w") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {BUDGET_FILE}")
+    if over:
+        print("\nOver budget:\n  " + "\n  ".join(over))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
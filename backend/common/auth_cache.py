@@ -0,0 +1,72 @@
+# auth_cache.py
+"""Cache of verified Firebase ID tokens, shared by the services that check them.
+
+``verify_id_token`` is a drop-in for ``firebase_admin.auth.verify_id_token``.
+The first time a token is seen it is verified normally. The decoded claims
+are then kept under the token's SHA-256 until the token's ``exp``, so later
+requests with the same token only pay for a hash and a dict lookup.
+Tokens that fail verification are never cached and raise exactly as before.
+
+Google's signing certificates are held by firebase_admin's verifier, which
+caches them in memory for as long as their Cache-Control allows and fetches
+new ones when they expire. One verifier lives for the whole process, so the
+certificates are downloaded once per refresh, not once per request.
+
+This file lives in backend/common and is copied into each service image
+(see the ``common`` build context in compose.yaml).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from firebase_admin import auth
+
+import storage
+
+
+class TokenCache:
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # sha256(token) -> decoded claims
+        self._lock = threading.Lock()
+
+    def verify(self, id_token):
+        key = hashlib.sha256(id_token.encode()).hexdigest()
+        with self._lock:
+            decoded = self._entries.get(key)
+            if decoded and decoded["exp"] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return decoded
+            if decoded:
+                del self._entries[key]
+            self.misses += 1
+
+        decoded = auth.verify_id_token(id_token, app=storage.firebase_app())
+        with self._lock:
+            self._entries[key] = decoded
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return decoded
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+
+token_cache = TokenCache(int(os.environ.get("TOKEN_CACHE_SIZE", 10000)))
+
+
+def verify_id_token(id_token):
+    return token_cache.verify(id_token)
@@ -0,0 +1,83 @@
+# cache.py
+"""Small thread-safe LRU cache with a per-entry TTL.
+
+A reader takes a version before going to Firestore and passes it to
+``set``. If a write invalidated the key in the meantime, the stale value
+is dropped instead of being cached. Versions come from one counter per
+cache, and ``invalidate`` stamps the key with the next one. Stamps older
+than the TTL are forgotten, so memory stays bounded by the write rate;
+a load that started before the newest forgotten stamp is not cached,
+since it cannot be told apart from a stale one.
+
+Shared by tournament-service and match-service; see the ``common`` build
+context in compose.yaml.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUTTLCache:
+    def __init__(self, maxsize=256, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._clock = 0
+        self._invalidated = OrderedDict()  # key -> (stamp, invalidated_at), oldest first
+        self._floor = 0  # newest stamp forgotten
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def version(self, key):
+        with self._lock:
+            return self._clock
+
+    def set(self, key, value, version):
+        with self._lock:
+            stamp = self._invalidated.get(key, (0,))[0]
+            if stamp > version or self._floor > version:
+                return  # invalidated while the value was being loaded, or may have been
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._clock += 1
+            self._invalidated.pop(key, None)
+            self._invalidated[key] = (self._clock, now)
+            while self._invalidated:
+                stamp, invalidated_at = next(iter(self._invalidated.values()))
+                if invalidated_at > now - self.ttl:
+                    break
+                self._invalidated.popitem(last=False)
+                self._floor = stamp
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl
+            }
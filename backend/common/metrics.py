@@ -0,0 +1,312 @@
+# metrics.py
+"""Request, Firestore and outbound-call metrics in Prometheus text format.
+
+``instrument_flask(app, service)`` (or ``instrument_fastapi``) adds a
+``GET /metrics`` route and records, for every request:
+
+- ``http_request_duration_seconds``: a latency histogram per method, route
+  template and status.
+- ``firestore_reads_per_request`` / ``firestore_writes_per_request``:
+  histograms of how many documents the request read and wrote, plus
+  ``firestore_reads_total`` / ``firestore_writes_total`` counters per route.
+- ``outbound_request_duration_seconds``: a latency histogram for every
+  ``requests`` call the service makes, per target host, method and status
+  (``error`` when no response came back).
+
+Reads and writes are counted where every Firestore call ends up: the
+gapic client's BatchGetDocuments, RunQuery, RunAggregationQuery and Commit
+RPCs. A read is one document returned (a missing document in a get still
+counts, as Firestore bills it), an aggregation is one read, and a write is
+one entry in a commit. The local storage backend reports through
+``storage.io_hook`` instead. Counting uses a thread-local for the current
+request, so a read made on a worker thread is still totalled under the
+route (as route ``-``) but not in the per-request histogram.
+
+Everything is in-process and per worker; Prometheus sums across targets.
+
+This file lives in backend/common and is copied into each service image
+(see the ``common`` build context in compose.yaml).
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{format_number(bound)}"'
+                yield f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {format_number(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request.",
+    ["service", "method", "route", "status"])
+reads_per_request = Histogram(
+    "firestore_reads_per_request", "Firestore documents read while handling a request.",
+    ["service", "route"], COUNT_BUCKETS)
+writes_per_request = Histogram(
+    "firestore_writes_per_request", "Firestore documents written while handling a request.",
+    ["service", "route"], COUNT_BUCKETS)
+reads_total = Counter("firestore_reads_total", "Firestore documents read.", ["service", "route"])
+writes_total = Counter("firestore_writes_total", "Firestore documents written.", ["service", "route"])
+outbound_latency = Histogram(
+    "outbound_request_duration_seconds", "Time spent on outgoing HTTP calls.",
+    ["service", "target", "method", "status"])
+
+REGISTRY = [request_latency, reads_per_request, writes_per_request, reads_total, writes_total, outbound_latency]
+
+_service = "unknown"
+_current = threading.local()  # the request being handled on this thread
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def record_io(kind, count):
+    """Count Firestore documents read or written against the current request."""
+    route = getattr(_current, "route", None)
+    if kind == "reads":
+        reads_total.inc((_service, route or "-"), count)
+    else:
+        writes_total.inc((_service, route or "-"), count)
+    if route is not None:
+        setattr(_current, kind, getattr(_current, kind) + count)
+
+
+def start_request(route):
+    _current.route = route
+    _current.reads = 0
+    _current.writes = 0
+    _current.status = None
+    _current.streaming = False
+    _current.started = time.perf_counter()
+
+
+def finish_request(method, status):
+    route = getattr(_current, "route", None)
+    if route is None:
+        return
+    request_latency.observe((_service, method, route, str(status)), time.perf_counter() - _current.started)
+    reads_per_request.observe((_service, route), _current.reads)
+    writes_per_request.observe((_service, route), _current.writes)
+    _current.route = None
+
+
+def instrument_flask(app, service):
+    from flask import Response, request
+
+    global _service
+    _service = service
+    instrument_requests()
+    instrument_firestore()
+
+    @app.before_request
+    def _start_timer():
+        start_request(request.url_rule.rule if request.url_rule else "unmatched")
+
+    @app.after_request
+    def _note_status(response):
+        _current.status = response.status_code
+        if response.is_streamed:
+            # Teardown can run before the body is sent; the server closes the
+            # response once it is, and reads made while streaming count too
+            _current.streaming = True
+            method = request.method
+            response.call_on_close(lambda: finish_request(method, response.status_code))
+        return response
+
+    # Runs even if the view raised
+    @app.teardown_request
+    def _observe(error):
+        if error is not None:
+            finish_request(request.method, 500)
+        elif not getattr(_current, "streaming", False):
+            finish_request(request.method, getattr(_current, "status", None) or 500)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
+
+
+def instrument_fastapi(app, service):
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    global _service
+    _service = service
+    instrument_requests()
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render(), media_type=CONTENT_TYPE)
+
+    # Requests on the event loop interleave, so time them locally instead of
+    # through the thread-local used for Firestore counts
+    @app.middleware("http")
+    async def observe(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            request_latency.observe((_service, request.method, route, str(status)),
+                                    time.perf_counter() - started)
+
+
+def instrument_requests():
+    """Time every call made through the requests library, by target host."""
+    try:
+        import requests
+    except ImportError:
+        return
+    session = requests.Session
+    if getattr(session.request, "_instrumented", False):
+        return
+    original = session.request
+
+    # wraps() copies the markers of any wrapper underneath (e.g. tracing's),
+    # so a second app in the same process sees both and adds neither again
+    @functools.wraps(original)
+    def request(self, method, url, *args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = original(self, method, url, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            outbound_latency.observe((_service, urlsplit(url).netloc, method.upper(), status),
+                                     time.perf_counter() - started)
+
+    request._instrumented = True
+    session.request = request
+
+
+def instrument_firestore():
+    """Count documents read and written by every Firestore RPC in this process."""
+    try:
+        import storage
+        storage.io_hook = record_io
+    except ImportError:
+        pass
+    try:
+        from google.cloud.firestore_v1.services.firestore.client import FirestoreClient
+    except ImportError:
+        return
+    if getattr(FirestoreClient.commit, "_instrumented", False):
+        return
+
+    def request_field(request, name):
+        return request.get(name) if isinstance(request, dict) else getattr(request, name)
+
+    def counting_stream(responses, is_read):
+        for response in responses:
+            if is_read(response):
+                record_io("reads", 1)
+            yield response
+
+    def wrap(name, after):
+        original = getattr(FirestoreClient, name)
+
+        def call(self, request=None, *args, **kwargs):
+            return after(request, original(self, request, *args, **kwargs))
+
+        call._instrumented = True
+        setattr(FirestoreClient, name, call)
+
+    def commit(request, response):
+        record_io("writes", len(request_field(request, "writes") or []))
+        return response
+
+    def aggregation(request, responses):
+        record_io("reads", 1)
+        return responses
+
+    wrap("commit", commit)
+    wrap("run_aggregation_query", aggregation)
+    wrap("batch_get_documents", lambda request, responses: counting_stream(
+        responses, lambda r: r._pb.WhichOneof("result") is not None))
+    wrap("run_query", lambda request, responses: counting_stream(
+        responses, lambda r: r._pb.HasField("document")))
@@ -0,0 +1,88 @@
+# serve.py
+"""Serve a service's app factory under gunicorn, or the Flask dev server.
+
+    python serve.py tournament_service:create_app --port 5002
+    python serve.py join_team_service:create_app --port 5006 --worker-class gevent
+
+gunicorn pre-forks WEB_WORKERS processes (default 2 x cores + 1). Each one
+serves requests in one of two ways:
+
+- ``gthread`` (default): WEB_THREADS threads per worker. Used by the
+  Firestore services, since gRPC does not cooperate with gevent.
+- ``gevent``: up to WEB_CONNECTIONS concurrent requests per worker, on
+  greenlets. Used by the composites, which mostly wait on other services.
+  A slow downstream call then parks a greenlet instead of a thread.
+
+The factory is imported and called in each worker after the fork; nothing
+is preloaded in the master. So each worker creates its own Firebase app,
+Firestore gRPC channel, thread pools and RabbitMQ connection, and nothing
+is shared across the fork.
+
+SERVE_MODE=dev runs the old single-process dev server instead, with the
+reloader and debugger on.
+
+This file lives in backend/common and is copied into each service image
+(see the ``common`` build context in compose.yaml).
+"""
+import argparse
+import importlib
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+def load_factory(target):
+    module_name, _, factory = target.partition(":")
+    return getattr(importlib.import_module(module_name), factory or "create_app")
+
+
+class FactoryApplication(BaseApplication):
+    def __init__(self, target, options):
+        self.target = target
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    # Called in each worker after fork
+    def load(self):
+        return load_factory(self.target)()
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} started, building the app")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", help="module:factory, e.g. tournament_service:create_app")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--worker-class", default=os.environ.get("WORKER_CLASS", "gthread"),
+                        choices=["gthread", "gevent"])
+    args = parser.parse_args()
+
+    if os.environ.get("SERVE_MODE") == "dev":
+        load_factory(args.target)().run(host=args.host, port=args.port, debug=True)
+        return
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": int(os.environ.get("WEB_WORKERS", 2 * (os.cpu_count() or 1) + 1)),
+        "worker_class": args.worker_class,
+        "threads": int(os.environ.get("WEB_THREADS", 8)),
+        "worker_connections": int(os.environ.get("WEB_CONNECTIONS", 1000)),
+        # Bulk matchmaking can legitimately run for a minute
+        "timeout": int(os.environ.get("WEB_TIMEOUT", 120)),
+        "keepalive": 5,
+        "preload_app": False,
+        "post_fork": post_fork,
+        "accesslog": "-" if os.environ.get("ACCESS_LOG") else None,
+    }
+    FactoryApplication(args.target, options).run()
+
+
+if __name__ == "__main__":
+    main()
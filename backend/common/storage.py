@@ -0,0 +1,673 @@
+# storage.py
+"""Pluggable document storage for the Flask services.
+
+``lazy_client()`` returns the object every service calls ``db``. It
+builds nothing at import; the first attribute access (or ``warm_up()``)
+initializes firebase_admin and creates the client, once per process.
+``client()`` does the same eagerly. Which client is chosen by
+``STORAGE_BACKEND``:
+
+- ``firestore`` (default): the real Firestore client, using the service
+  account key at ``FIREBASE_CREDENTIALS``.
+- ``memory``: a local client on an in-process SQLite database. Nothing
+  leaves the process, so each service has its own data.
+- ``sqlite``: the same local client on the file at ``STORAGE_PATH``. Point
+  every service at one file on a shared volume and they see each other's
+  writes, like they would on Firestore.
+
+The local client implements the subset of the Firestore API these services
+use, with the same names and shapes: collection/document references,
+get/set/update/create/delete, ``add``, where/order_by/select/start_after/
+offset/limit/count queries, ``get_all``, batched writes and transactions.
+The ``firestore`` transforms (Increment, ArrayUnion, ArrayRemove,
+SERVER_TIMESTAMP, DELETE_FIELD) are applied on write. Errors use the
+google.api_core exceptions Firestore raises (AlreadyExists, NotFound,
+InvalidArgument), so call sites do not need to know which backend is
+running. Neither local mode needs credentials or a network.
+
+Transactions run under one lock and an exclusive SQLite transaction, so
+they never conflict and never retry. Decorate transactional functions with
+``storage.transactional`` instead of ``firestore.transactional``; it does
+the right thing for either backend.
+
+This file lives in backend/common and is copied into each service image
+(see the ``common`` build context in compose.yaml).
+"""
+import copy
+import datetime
+import functools
+import json
+import os
+import random
+import sqlite3
+import string
+import threading
+import time
+from contextlib import contextmanager
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from google.api_core.exceptions import AlreadyExists, InvalidArgument, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.field_path import FieldPath
+
+BACKEND = os.environ.get("STORAGE_BACKEND", "firestore")
+STORAGE_PATH = os.environ.get("STORAGE_PATH", "/data/storage/storage.db")
+FIREBASE_CREDENTIALS = os.environ.get("FIREBASE_CREDENTIALS", "/app/serviceAccountKey.json")
+LOCAL_PROJECT_ID = os.environ.get("LOCAL_PROJECT_ID", "local-dev")
+
+# Firestore allows at most 500 writes per batch or transaction
+MAX_WRITES = 500
+AUTO_ID_CHARS = string.ascii_letters + string.digits
+WARM_UP_COLLECTION = "_warm_up"
+
+# Set by metrics.py to count local reads and writes: io_hook("reads" | "writes", count)
+io_hook = None
+
+_init_lock = threading.Lock()
+
+
+def firebase_app(backend=None):
+    """Return the default firebase_admin app, initializing it on first use.
+
+    Pass it as ``app=`` to ``firebase_admin.auth`` calls, which would
+    otherwise fail if nothing has touched ``db`` yet in this process.
+    """
+    backend = backend or BACKEND
+    with _init_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            pass
+        if backend == "firestore":
+            return firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS))
+        # Still initialize the default app (lazily resolved credentials) so
+        # firebase_admin.auth keeps working, e.g. against the auth emulator
+        return firebase_admin.initialize_app(options={"projectId": LOCAL_PROJECT_ID})
+
+
+def client(backend=None):
+    """Initialize firebase_admin and return the configured storage client."""
+    backend = backend or BACKEND
+    if backend not in ("firestore", "memory", "sqlite"):
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}")
+    app = firebase_app(backend)
+    if backend == "firestore":
+        return firestore.client(app)
+    return LocalClient(":memory:" if backend == "memory" else STORAGE_PATH)
+
+
+def lazy_client(backend=None):
+    return LazyClient(backend)
+
+
+class LazyClient:
+    """Forwards to ``client(backend)``, which is only built on first use.
+
+    Built once per process: a worker forked from a process that already
+    built one builds its own, since a gRPC channel must not cross a fork.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = client(self._backend)
+                    self._pid = os.getpid()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    # Services build collection references at module level, so these are
+    # deferred too
+    def collection(self, *path):
+        return LazyCollection(self, path)
+
+    def warm_up(self):
+        """Build the client and open its connection on a background thread."""
+        threading.Thread(target=self._warm_up, name="storage-warm-up", daemon=True).start()
+
+    def _warm_up(self):
+        started = time.perf_counter()
+        try:
+            # Reading a missing document is the cheapest call that opens the
+            # gRPC channel and fetches an access token (billed as one read)
+            self.resolve().collection(WARM_UP_COLLECTION).document("warm-up").get()
+        except Exception as e:
+            print(f"⚠️  Storage warm-up failed: {e}")
+            return
+        print(f"Storage ready in {time.perf_counter() - started:.2f}s")
+
+
+class LazyCollection:
+    """A collection reference on a ``LazyClient``, resolved on first use."""
+
+    def __init__(self, lazy, path):
+        self._lazy = lazy
+        self._path = path
+        self._client = None
+        self._ref = None
+
+    def __getattr__(self, name):
+        client = self._lazy.resolve()
+        if self._client is not client:
+            self._ref = client.collection(*self._path)
+            self._client = client
+        return getattr(self._ref, name)
+
+
+def transactional(fn):
+    """Like ``firestore.transactional``, for Firestore and local transactions."""
+    remote = firestore.transactional(fn)
+
+    @functools.wraps(fn)
+    def wrapper(transaction, *args, **kwargs):
+        if isinstance(transaction, LocalTransaction):
+            return transaction._run(fn, *args, **kwargs)
+        return remote(transaction, *args, **kwargs)
+
+    return wrapper
+
+
+def record_io(kind, count):
+    if io_hook is not None:
+        io_hook(kind, count)
+
+
+# --- Field paths and values ---
+
+def split_path(field_path):
+    if isinstance(field_path, FieldPath):
+        return field_path.parts
+    return FieldPath.from_api_repr(field_path).parts
+
+
+def get_field(data, parts):
+    for part in parts:
+        if not isinstance(data, dict) or part not in data:
+            raise KeyError(".".join(parts))
+        data = data[part]
+    return data
+
+
+def has_field(data, parts):
+    try:
+        get_field(data, parts)
+        return True
+    except KeyError:
+        return False
+
+
+def transform_value(value, current, exists, now):
+    """Resolve a Firestore sentinel or transform against the current value."""
+    if value is transforms.SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, transforms.Increment):
+        if exists and isinstance(current, (int, float)) and not isinstance(current, bool):
+            return current + value.value
+        return value.value
+    if isinstance(value, transforms.ArrayUnion):
+        result = list(current) if exists and isinstance(current, list) else []
+        result.extend(v for v in value.values if v not in result)
+        return result
+    if isinstance(value, transforms.ArrayRemove):
+        if not exists or not isinstance(current, list):
+            return []
+        return [v for v in current if v not in value.values]
+    if isinstance(value, dict):
+        base = current if exists and isinstance(current, dict) else {}
+        return {k: transform_value(v, base.get(k), k in base, now)
+                for k, v in value.items() if v is not transforms.DELETE_FIELD}
+    return value
+
+
+def set_field(data, parts, value, now):
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    last = parts[-1]
+    if value is transforms.DELETE_FIELD:
+        data.pop(last, None)
+    else:
+        data[last] = transform_value(value, data.get(last), last in data, now)
+
+
+def merge_into(data, updates, now):
+    for key, value in updates.items():
+        if isinstance(value, dict) and value and isinstance(data.get(key), dict):
+            merge_into(data[key], value, now)
+        else:
+            set_field(data, [key], value, now)
+
+
+def encode(data):
+    def default(value):
+        if isinstance(value, datetime.datetime):
+            return {"__datetime__": value.isoformat()}
+        raise TypeError(f"Cannot store {type(value).__name__}")
+    return json.dumps(data, default=default, separators=(",", ":"))
+
+
+def decode(text):
+    def hook(obj):
+        if len(obj) == 1 and "__datetime__" in obj:
+            return datetime.datetime.fromisoformat(obj["__datetime__"])
+        return obj
+    return json.loads(text, object_hook=hook)
+
+
+def project(data, field_paths):
+    result = {}
+    for field_path in field_paths:
+        parts = split_path(field_path)
+        if has_field(data, parts):
+            set_field(result, parts, get_field(data, parts), None)
+    return result
+
+
+# --- Query matching ---
+
+def compare_key(value):
+    # Firestore orders values of different types by type first
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime.datetime):
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, list):
+        return (5, [compare_key(v) for v in value])
+    return (6, encode(value))
+
+
+def matches(data, doc_id, parts, op, value):
+    if parts == ("__name__",):
+        exists, current = True, doc_id
+    else:
+        exists = has_field(data, parts)
+        current = get_field(data, parts) if exists else None
+    if op == "==":
+        return exists and current == value
+    if op == "!=":
+        return exists and current is not None and current != value
+    if op == "in":
+        return exists and current in value
+    if op == "not-in":
+        return exists and current is not None and current not in value
+    if op == "array-contains":
+        return exists and isinstance(current, list) and value in current
+    if op == "array-contains-any":
+        return exists and isinstance(current, list) and any(v in current for v in value)
+    if not exists or compare_key(current)[0] != compare_key(value)[0]:
+        return False  # range filters only match values of the same type
+    left, right = compare_key(current), compare_key(value)
+    return {"<": left < right, "<=": left <= right, ">": left > right, ">=": left >= right}[op]
+
+
+def json_path(parts):
+    if not all(part.isidentifier() for part in parts):
+        return None
+    return "$." + ".".join(parts)
+
+
+class LocalClient:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (collection, id))")
+
+    def collection(self, path):
+        return CollectionReference(self, path)
+
+    def document(self, path):
+        collection, _, doc_id = path.rpartition("/")
+        return DocumentReference(self, collection, doc_id)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        with self._lock:
+            snapshots = [ref._snapshot(field_paths) for ref in references]
+        record_io("reads", len(snapshots))
+        return iter(snapshots)
+
+    def batch(self):
+        return LocalWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return LocalTransaction(self)
+
+    # Exclusive for the whole process and, for a file, for every process using it
+    @contextmanager
+    def _atomic(self):
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+
+    def _load(self, collection, doc_id):
+        row = self._conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)).fetchone()
+        return decode(row[0]) if row else None
+
+    def _scan(self, collection, filters):
+        sql = "SELECT id, data FROM documents WHERE collection = ?"
+        params = [collection]
+        # Push simple equality filters into SQLite; everything is re-checked in Python
+        for parts, op, value in filters:
+            path = json_path(parts)
+            if op == "==" and path and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                sql += " AND json_extract(data, ?) = ?"
+                params += [path, value]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for doc_id, text in rows:
+            yield doc_id, decode(text)
+
+    def _commit(self, writes):
+        if len(writes) > MAX_WRITES:
+            raise InvalidArgument(f"maximum {MAX_WRITES} writes allowed per request")
+        record_io("writes", len(writes))
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self._atomic():
+            pending = {}
+            for op, ref, data, merge in writes:
+                key = (ref._collection, ref.id)
+                current = pending[key] if key in pending else self._load(*key)
+                pending[key] = apply_write(op, ref, current, data, merge, now)
+            for (collection, doc_id), data in pending.items():
+                if data is None:
+                    self._conn.execute(
+                        "DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                        (collection, doc_id, encode(data)))
+
+
+def apply_write(op, ref, current, data, merge, now):
+    """Return the document after one write, or None if it is deleted."""
+    if op == "delete":
+        return None
+    if op == "create":
+        if current is not None:
+            raise AlreadyExists(f"Document already exists: {ref.path}")
+        return transform_value(data, None, False, now)
+    if op == "set":
+        if merge and current is not None:
+            merge_into(current, data, now)
+            return current
+        return transform_value(data, None, False, now)
+    if current is None:
+        raise NotFound(f"No document to update: {ref.path}")
+    for field_path, value in data.items():
+        set_field(current, split_path(field_path), value, now)
+    return current
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path):
+        return get_field(self._data or {}, split_path(field_path))
+
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self._collection)
+
+    def collection(self, name):
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None):
+        record_io("reads", 1)
+        with self._client._lock:
+            return self._snapshot(field_paths)
+
+    def set(self, document_data, merge=False):
+        self._client._commit([("set", self, document_data, merge)])
+
+    def update(self, field_updates):
+        self._client._commit([("update", self, field_updates, False)])
+
+    def create(self, document_data):
+        self._client._commit([("create", self, document_data, False)])
+
+    def delete(self):
+        self._client._commit([("delete", self, None, False)])
+
+    def _snapshot(self, field_paths=None):
+        data = self._client._load(self._collection, self.id)
+        if data is not None and field_paths is not None:
+            data = project(data, field_paths)
+        return DocumentSnapshot(self, data)
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and self.path == other.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class Query:
+    ASCENDING = firestore.Query.ASCENDING
+    DESCENDING = firestore.Query.DESCENDING
+
+    def __init__(self, collection, filters=(), orders=(), fields=None, cursor=None, offset=0, limit=None):
+        self._parent = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._fields = fields
+        self._cursor = cursor
+        self._offset = offset
+        self._limit = limit
+
+    def _copy(self, **changes):
+        state = {"filters": self._filters, "orders": self._orders, "fields": self._fields,
+                 "cursor": self._cursor, "offset": self._offset, "limit": self._limit}
+        state.update(changes)
+        return Query(self._parent, **state)
+
+    def where(self, field_path, op_string, value):
+        return self._copy(filters=self._filters + ((split_path(field_path), op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((split_path(field_path), direction),))
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def offset(self, num_to_skip):
+        return self._copy(offset=num_to_skip)
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def count(self, alias=None):
+        return AggregationQuery(self, alias or "field_1")
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction))
+
+    def stream(self, transaction=None):
+        docs = self._page()
+        record_io("reads", len(docs))
+        for doc_id, data in docs:
+            ref = DocumentReference(self._parent._client, self._parent._path, doc_id)
+            yield DocumentSnapshot(ref, project(data, self._fields) if self._fields is not None else data)
+
+    def _page(self):
+        docs = self._matching()
+        if self._offset:
+            docs = docs[self._offset:]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return docs
+
+    def _order_value(self, doc_id, data, parts):
+        if parts == ("__name__",):
+            return compare_key(doc_id)
+        return compare_key(get_field(data, parts))
+
+    def _matching(self):
+        client = self._parent._client
+        docs = [(doc_id, data) for doc_id, data in client._scan(self._parent._path, self._filters)
+                if all(matches(data, doc_id, *f) for f in self._filters)]
+        # Like Firestore, ordering on a field leaves out documents without it
+        orders = self._orders + ((("__name__",), self.ASCENDING),)
+        docs = [(doc_id, data) for doc_id, data in docs
+                if all(parts == ("__name__",) or has_field(data, parts) for parts, _ in orders)]
+        for parts, direction in reversed(orders):
+            docs.sort(key=lambda doc: self._order_value(doc[0], doc[1], parts),
+                      reverse=direction == self.DESCENDING)
+        if self._cursor is not None:
+            docs = docs[self._cursor_position(docs, orders):]
+        return docs
+
+    def _cursor_position(self, docs, orders):
+        cursor = self._cursor
+        if isinstance(cursor, DocumentSnapshot):
+            cursor = dict(cursor._data or {}, __name__=cursor.id)
+        values = []
+        for parts, _ in orders:
+            if parts != ("__name__",):
+                values.append(compare_key(get_field(cursor, parts)))
+            elif "__name__" in cursor:
+                values.append(compare_key(cursor["__name__"]))
+            else:
+                break
+        # docs are sorted, so the first one past the cursor starts the page
+        for position, (doc_id, data) in enumerate(docs):
+            for (parts, direction), value in zip(orders, values):
+                current = self._order_value(doc_id, data, parts)
+                if current != value:
+                    if (current > value) != (direction == self.DESCENDING):
+                        return position
+                    break
+        return len(docs)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+        super().__init__(self)
+
+    @property
+    def id(self):
+        return self._path.rpartition("/")[2]
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = "".join(random.choices(AUTO_ID_CHARS, k=20))
+        return DocumentReference(self._client, self._path, document_id)
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return datetime.datetime.now(datetime.timezone.utc), ref
+
+
+class AggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class AggregationQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias
+
+    def get(self, transaction=None):
+        record_io("reads", 1)
+        return [[AggregationResult(self._alias, len(self._query._page()))]]
+
+
+class LocalWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._writes.append(("update", reference, field_updates, False))
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference, document_data, False))
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference, None, False))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._commit(writes)
+        return writes
+
+    def __len__(self):
+        return len(self._writes)
+
+
+class LocalTransaction(LocalWriteBatch):
+    def _run(self, fn, *args, **kwargs):
+        # Reads inside fn see a stable view: no other writer can get in until commit
+        with self._client._atomic():
+            self._writes = []
+            result = fn(self, *args, **kwargs)
+            self.commit()
+        return result
@@ -0,0 +1,146 @@
+# traces_cli.py
+"""Find slow requests in the span files written by tracing.py.
+
+    python traces_cli.py slowest --limit 10 --name "POST /dispute/resolve"
+    python traces_cli.py show <trace id>
+    python traces_cli.py show --slowest --name "POST /make-match"
+
+slowest lists the slowest root spans (requests that entered the system
+without a traceparent). show prints one trace as a tree and then its
+critical path: the chain of spans that the root was actually waiting on,
+with the time each one contributed on its own. Time a client span spends
+outside the server span it called is network, queueing and connection
+setup.
+
+--dir defaults to TRACE_DIR, the directory the services write to.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import defaultdict
+
+
+def load_spans(directory, trace_id=None):
+    spans = []
+    for path in glob.glob(os.path.join(directory, "*.jsonl")):
+        with open(path) as f:
+            for line in f:
+                if trace_id is not None and trace_id not in line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue  # torn line from a worker that was killed mid-write
+                if trace_id is None or span["traceId"] == trace_id:
+                    spans.append(span)
+    return spans
+
+
+def roots(spans):
+    ids = {span["spanId"] for span in spans}
+    return [span for span in spans if span["parentId"] not in ids]
+
+
+def critical_path(span, children):
+    """Return [(span, self time on the path)] for the spans ``span`` waited on.
+
+    Walk back from the span's end: the child that finished last before that
+    point is what the span was waiting for, then repeat from that child's
+    start. The remaining gaps are the span's own time.
+    """
+    path = []
+    own = span["duration"]
+    span_end = cursor = span["start"] + span["duration"]
+    for child in sorted(children[span["spanId"]], key=lambda c: c["start"] + c["duration"], reverse=True):
+        child_end = child["start"] + child["duration"]
+        if child_end > cursor and cursor < span_end:
+            continue  # ran alongside a child already on the path
+        start, end = max(child["start"], span["start"]), min(child_end, cursor)
+        if end <= start:
+            continue
+        own -= end - start
+        path.extend(critical_path(child, children))
+        cursor = start
+    return [(span, max(own, 0.0))] + path
+
+
+def describe(span):
+    status = span["attrs"].get("status", span["attrs"].get("error", ""))
+    return f"{span['service']}  {span['name']}  [{status}]"
+
+
+def print_tree(span, children, on_path, origin, depth=0):
+    marker = "*" if span["spanId"] in on_path else " "
+    offset = (span["start"] - origin) * 1000
+    print(f"{marker} {span['duration'] * 1000:9.1f}ms  +{offset:8.1f}ms  {'  ' * depth}{describe(span)}")
+    for child in sorted(children[span["spanId"]], key=lambda c: c["start"]):
+        print_tree(child, children, on_path, origin, depth + 1)
+
+
+def show_trace(spans):
+    children = defaultdict(list)
+    for span in spans:
+        children[span["parentId"]].append(span)
+    for root in sorted(roots(spans), key=lambda s: s["start"]):
+        path = critical_path(root, children)
+        on_path = {span["spanId"] for span, _ in path}
+        print(f"trace {root['traceId']}  {root['duration'] * 1000:.1f}ms  ({len(spans)} spans, * = critical path)\n")
+        print_tree(root, children, on_path, root["start"])
+        print("\ncritical path, by time contributed:")
+        for span, own in sorted(path, key=lambda item: item[1], reverse=True):
+            share = own / root["duration"] * 100 if root["duration"] else 0.0
+            print(f"  {own * 1000:9.1f}ms  {share:5.1f}%  {describe(span)}")
+        print()
+
+
+def slowest_roots(args):
+    candidates = [span for span in roots(load_spans(args.dir))
+                  if span["parentId"] is None and (args.name is None or span["name"] == args.name)]
+    return sorted(candidates, key=lambda s: s["duration"], reverse=True)[:args.limit]
+
+
+def slowest(args):
+    for span in slowest_roots(args):
+        print(f"{span['duration'] * 1000:9.1f}ms  {span['traceId']}  {describe(span)}")
+
+
+def show(args):
+    trace_id = args.trace_id
+    if args.slowest:
+        args.limit = 1
+        found = slowest_roots(args)
+        if not found:
+            sys.exit("No matching traces")
+        trace_id = found[0]["traceId"]
+    if not trace_id:
+        sys.exit("Give a trace id or --slowest")
+    spans = load_spans(args.dir, trace_id)
+    if not spans:
+        sys.exit(f"No spans for trace {trace_id}")
+    show_trace(spans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.environ.get("TRACE_DIR", "traces"))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("slowest", help="list the slowest requests")
+    p.add_argument("--name", help='root span name, e.g. "POST /dispute/resolve"')
+    p.add_argument("--limit", type=int, default=10)
+    p.set_defaults(func=slowest)
+
+    p = sub.add_parser("show", help="print a trace and its critical path")
+    p.add_argument("trace_id", nargs="?")
+    p.add_argument("--slowest", action="store_true", help="show the slowest matching trace")
+    p.add_argument("--name")
+    p.set_defaults(func=show)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
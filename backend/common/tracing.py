@@ -0,0 +1,302 @@
+# tracing.py
+"""W3C trace-context propagation and a local JSONL span exporter.
+
+``instrument_flask(app, service)`` (or ``instrument_fastapi``) opens a
+server span for each request. The span continues the trace in the
+incoming ``traceparent`` header, or starts a new one. Every call made
+through ``requests`` gets a client span under it, and the call carries a
+``traceparent`` header naming that span, so the next service's server
+span is its child. Responses carry ``X-Trace-Id`` so a slow request can be
+found again.
+
+The current span lives in a contextvar. Work handed to a thread pool
+must carry it over explicitly; see ``submit``.
+
+When ``TRACE_DIR`` is set, finished spans are appended to
+``<TRACE_DIR>/<service>-<pid>.jsonl`` by a background thread. Point every
+service at one shared directory and ``traces_cli.py`` can rebuild whole
+traces from it. Without ``TRACE_DIR``, headers are still propagated but
+nothing is written. ``TRACE_SAMPLE`` (0 to 1) is the share of new traces
+that are recorded; continued traces follow the caller's sampled flag.
+
+This file lives in backend/common and is copied into each service image
+(see the ``common`` build context in compose.yaml).
+"""
+import atexit
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from queue import Empty, Full, Queue
+from urllib.parse import urlsplit
+
+TRACE_DIR = os.environ.get("TRACE_DIR")
+TRACE_SAMPLE = float(os.environ.get("TRACE_SAMPLE", 1.0))
+MAX_BUFFER = 10000
+
+_service = "unknown"
+_current = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    def __init__(self, name, kind, trace_id=None, parent_id=None, sampled=None):
+        self.trace_id = trace_id or f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = random.random() < TRACE_SAMPLE if sampled is None else sampled
+        self.name = name
+        self.kind = kind
+        self.attrs = {}
+        self.start = time.time()
+        self._started = time.perf_counter()
+
+    @classmethod
+    def child_of(cls, parent, name, kind):
+        if parent is None:
+            return cls(name, kind)
+        return cls(name, kind, parent.trace_id, parent.span_id, parent.sampled)
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def finish(self):
+        duration = time.perf_counter() - self._started
+        if self.sampled:
+            exporter.export({
+                "traceId": self.trace_id,
+                "spanId": self.span_id,
+                "parentId": self.parent_id,
+                "service": _service,
+                "name": self.name,
+                "kind": self.kind,
+                "start": self.start,
+                "duration": duration,
+                "attrs": self.attrs
+            })
+
+
+def parse_traceparent(header):
+    """Return (trace_id, parent_id, sampled) from a traceparent header, or None."""
+    parts = (header or "").strip().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    trace_id, parent_id, flags = parts[1], parts[2], parts[3]
+    if len(trace_id) != 32 or len(parent_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        sampled = bool(int(flags, 16) & 1)
+        int(trace_id, 16), int(parent_id, 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, sampled
+
+
+def start_server_span(name, headers):
+    context = parse_traceparent(headers.get("traceparent"))
+    if context is None:
+        return Span(name, "server")
+    trace_id, parent_id, sampled = context
+    return Span(name, "server", trace_id, parent_id, sampled)
+
+
+def current_span():
+    return _current.get()
+
+
+def submit(executor, fn, *args, **kwargs):
+    """``executor.submit`` that runs ``fn`` inside the caller's trace context."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class JsonlExporter:
+    _STOP = object()
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.dropped = 0
+        self._queue = Queue(maxsize=MAX_BUFFER)
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def export(self, span):
+        if self.directory is None:
+            return
+        self._start()
+        try:
+            self._queue.put_nowait(span)
+        except Full:
+            self.dropped += 1
+
+    # Started on first use, and again in a forked worker, which inherits
+    # the parent's queue but not its writer thread
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = Queue(maxsize=MAX_BUFFER)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self._drain)
+
+    def _path(self):
+        return os.path.join(self.directory, f"{_service}-{os.getpid()}.jsonl")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500 and batch[-1] is not self._STOP:
+                try:
+                    batch.append(self._queue.get(timeout=0.2))
+                except Empty:
+                    break
+            stopping = batch[-1] is self._STOP
+            if stopping:
+                batch.pop()
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    # At exit: let the writer finish the batch it is holding, then write
+    # anything queued after the stop marker
+    def _drain(self):
+        if self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(self._STOP, timeout=1.0)
+            self._thread.join(5.0)
+        except Full:
+            pass
+        batch = []
+        while True:
+            try:
+                span = self._queue.get_nowait()
+            except Empty:
+                break
+            if span is not self._STOP:
+                batch.append(span)
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._write_lock, open(self._path(), "a") as f:
+                f.write("".join(json.dumps(span, separators=(",", ":")) + "\n" for span in batch))
+        except OSError as e:
+            self.dropped += len(batch)
+            print(f"⚠️  Could not write spans to {self.directory}: {e}")
+
+
+exporter = JsonlExporter(TRACE_DIR)
+
+
+def instrument_flask(app, service):
+    from flask import g, request
+
+    global _service
+    _service = service
+    instrument_requests()
+
+    @app.before_request
+    def _start_span():
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        span = start_server_span(f"{request.method} {route}", request.headers)
+        span.attrs["path"] = request.path
+        g.trace_span = span
+        _current.set(span)
+
+    @app.after_request
+    def _tag_response(response):
+        span = g.get("trace_span")
+        if span is not None:
+            span.attrs["status"] = response.status_code
+            response.headers["X-Trace-Id"] = span.trace_id
+            if response.is_streamed:
+                # Teardown can run before the body is sent, so end the span
+                # when the server closes the response instead
+                g.pop("trace_span")
+                response.call_on_close(span.finish)
+        return response
+
+    # Runs even if the view raised
+    @app.teardown_request
+    def _finish_span(error):
+        span = g.pop("trace_span", None)
+        _current.set(None)
+        if span is None:
+            return
+        if error is not None:
+            span.attrs["status"] = 500
+            span.attrs["error"] = str(error)
+        span.finish()
+
+
+def instrument_fastapi(app, service):
+    from fastapi import Request
+
+    global _service
+    _service = service
+    instrument_requests()
+
+    @app.middleware("http")
+    async def trace(request: Request, call_next):
+        span = start_server_span(f"{request.method} {request.url.path}", request.headers)
+        span.attrs["path"] = request.url.path
+        token = _current.set(span)
+        try:
+            response = await call_next(request)
+            span.attrs["status"] = response.status_code
+            response.headers["X-Trace-Id"] = span.trace_id
+            return response
+        except Exception as e:
+            span.attrs["status"] = 500
+            span.attrs["error"] = str(e)
+            raise
+        finally:
+            route = request.scope.get("route")
+            if route is not None:
+                span.name = f"{request.method} {route.path}"
+            span.finish()
+            _current.reset(token)
+
+
+def instrument_requests():
+    """Give every requests call a client span and a traceparent header."""
+    try:
+        import requests
+    except ImportError:
+        return
+    session = requests.Session
+    if getattr(session.request, "_traced", False):
+        return
+    original = session.request
+
+    # Keeps the markers of any wrapper underneath, see metrics.instrument_requests
+    @functools.wraps(original)
+    def request(self, method, url, *args, **kwargs):
+        target = urlsplit(url)
+        span = Span.child_of(_current.get(), f"{method.upper()} {target.netloc}{target.path}", "client")
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["traceparent"] = span.traceparent()
+        try:
+            response = original(self, method, url, *args, headers=headers, **kwargs)
+            span.attrs["status"] = response.status_code
+            return response
+        except Exception as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.finish()
+
+    request._traced = True
+    session.request = request
@@ -1,17 +1,18 @@
 # =============================
 # finalize_match_outcome_service.py
 # =============================
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
 import requests
+import metrics
+import tracing
 
-app = Flask(__name__)
-CORS(app)
+api = Blueprint("finalize_match_outcome", __name__)
 
 MATCH_SERVICE_URL = "http://match-service:5004"
 TOURNAMENT_SERVICE_URL = "http://tournament-service:5002"
 
-@app.route("/finalize-outcome", methods=["POST"])
+@api.route("/finalize-outcome", methods=["POST"])
 def finalize_outcome():
     data = request.get_json()
     if not data:
@@ -19,6 +20,7 @@ def finalize_outcome():
     match_id = data.get("matchId")
     result = data.get("result")  # "teamA won", "teamB won", "draw"
     score = data.get("score", {})
+    rebuild = data.get("rebuild", False)  # True when a result is being corrected (e.g. a dispute)
 
     if not match_id or not result:
         return jsonify({"error": "Missing matchId or result"}), 400
@@ -45,36 +47,31 @@ def finalize_outcome():
     if match_update_res.status_code != 200:
         return jsonify({"error": "Failed to update match"}), 500
 
-    # 3. Get tournament data
-    tourney_res = requests.get(f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}")
-    if tourney_res.status_code != 200:
-        return jsonify({"error": "Failed to retrieve tournament"}), 500
-
-    tournament_data = tourney_res.json()
-    teams = tournament_data.get("teams", [])
-
-    # 4. Update stats in the correct team objects
-    for team in teams:
-        if team["teamId"] == team_a or team["teamId"] == team_b:
-            if result == "teamA won" and team["teamId"] == team_a:
-                team["teamStats"]["wins"] += 1
-                team["teamStats"]["elo"] += 10
-            elif result == "teamB won" and team["teamId"] == team_b:
-                team["teamStats"]["wins"] += 1
-                team["teamStats"]["elo"] += 10
-            elif result == "draw":
-                team["teamStats"]["elo"] += 5
-            else:
-                team["teamStats"]["losses"] += 1
-                team["teamStats"]["elo"] -= 10
-
-    # 5. Push updated teams array back to tournament_service
-    patch_payload = {"teams": teams}
-    patch_res = requests.put(f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}/update_team_stats", json=patch_payload)
-    if patch_res.status_code != 200:
+    # 3. Apply the outcome to both teams' stats in one transactional call, or
+    #    rebuild every rating from match history if an earlier result changed
+    if rebuild:
+        outcome_res = requests.post(f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}/recompute_ratings")
+    else:
+        outcome_payload = {
+            "teamAId": team_a,
+            "teamBId": team_b,
+            "result": result
+        }
+        outcome_res = requests.post(f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}/match_outcome", json=outcome_payload)
+    if outcome_res.status_code != 200:
         return jsonify({"error": "Failed to update team stats"}), 500
 
     return jsonify({"message": "Match finalized and team stats updated"}), 200
 
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    CORS(app)
+    metrics.instrument_flask(app, "finalize-match-outcome-service")  # GET /metrics
+    tracing.instrument_flask(app, "finalize-match-outcome-service")  # traceparent in and out
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", port=5009, debug=True)
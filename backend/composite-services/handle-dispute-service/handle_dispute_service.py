@@ -1,14 +1,14 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
 import requests
+import metrics
+import tracing
 
-app = Flask(__name__)
-# Allow all origins for /dispute/* endpoints
-CORS(app, resources={r"/dispute/*": {"origins": "*"}}, supports_credentials=True)
+api = Blueprint("handle_dispute", __name__)
 
 PLAYER_SERVICE_URL = "http://player-service:5001/player"
 
-@app.route("/dispute", methods=["GET"])
+@api.route("/dispute", methods=["GET"])
 def get_disputes():
     try:
         # Forward to the actual OutSystems endpoint
@@ -20,7 +20,7 @@ def get_disputes():
 
 
 
-@app.route("/dispute/new", methods=["POST"])
+@api.route("/dispute/new", methods=["POST"])
 def dispute_new():
     try:
         # Retrieve JSON payload from the request
@@ -62,7 +62,7 @@ def dispute_new():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/dispute/resolve", methods=["POST"])
+@api.route("/dispute/resolve", methods=["POST"])
 def dispute_resolve():
     try:
         # Retrieve JSON payload from the request
@@ -111,7 +111,8 @@ def dispute_resolve():
         finalize_match_payload = {
             "matchId": match_id,
             "result": result,
-            "score": score
+            "score": score,
+            "rebuild": True  # rebuild ratings from history rather than stacking another adjustment
         }
         finalize_match_res = requests.post(finalize_match_service_url, json=finalize_match_payload)
         if finalize_match_res.status_code != 200:
@@ -125,6 +126,17 @@ def dispute_resolve():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    # Allow all origins for /dispute/* endpoints
+    CORS(app, resources={r"/dispute/*": {"origins": "*"}}, supports_credentials=True)
+    metrics.instrument_flask(app, "handle-dispute-service")  # GET /metrics
+    tracing.instrument_flask(app, "handle-dispute-service")  # traceparent in and out
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     # Listen on all interfaces so Docker can map the port properly
     app.run(host="0.0.0.0", port=5008, debug=True)
@@ -0,0 +1,94 @@
+# bench_publisher.py
+"""Publish throughput: a connection per message, one confirm per message on
+a shared connection, and the EventPublisher with pipelined confirms.
+
+Needs a RabbitMQ broker; a throwaway local one is enough:
+
+    docker run --rm -p 5672:5672 rabbitmq:3
+    python bench_publisher.py --host localhost --messages 5000
+
+All runs publish persistent messages to a scratch queue, which is deleted
+at the end. The connection-per-message baseline is what send_to_queue
+used to do; confirm-per-message is a BlockingConnection with
+confirm_delivery, which waits for each confirm before the next publish.
+"""
+import argparse
+import json
+import time
+import uuid
+
+import pika
+
+from publisher import EventPublisher
+
+
+def publish_per_connection(host, queue_name, message):
+    """The old send_to_queue: connect, declare, publish, close."""
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host))
+    channel = connection.channel()
+    channel.queue_declare(queue=queue_name, durable=True)
+    channel.basic_publish(
+        exchange='',
+        routing_key=queue_name,
+        body=json.dumps(message),
+        properties=pika.BasicProperties(delivery_mode=2)
+    )
+    connection.close()
+
+
+def publish_confirmed_serially(host, queue_name, message, count):
+    """One connection, but each publish waits for its own confirm."""
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host))
+    channel = connection.channel()
+    channel.confirm_delivery()
+    channel.queue_declare(queue=queue_name, durable=True)
+    for _ in range(count):
+        channel.basic_publish(
+            exchange='',
+            routing_key=queue_name,
+            body=json.dumps(message),
+            properties=pika.BasicProperties(delivery_mode=2)
+        )
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare RabbitMQ publish throughput")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--baseline", type=int, default=500,
+                        help="messages for the connection-per-message run (it is slow)")
+    args = parser.parse_args()
+
+    queue_name = f"bench-{uuid.uuid4().hex[:8]}"
+    message = {"event": "player_joined", "player_id": "p", "team_id": "t", "tournament_id": "x"}
+
+    start = time.perf_counter()
+    for _ in range(args.baseline):
+        publish_per_connection(args.host, queue_name, message)
+    before = args.baseline / (time.perf_counter() - start)
+    print(f"connection per message  {before:10.0f} msg/s  ({args.baseline} messages)")
+
+    start = time.perf_counter()
+    publish_confirmed_serially(args.host, queue_name, message, args.messages)
+    serial = args.messages / (time.perf_counter() - start)
+    print(f"confirm per message     {serial:10.0f} msg/s  ({args.messages} messages)")
+
+    publisher = EventPublisher(host=args.host)
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        publisher.publish(queue_name, message)
+    publisher.flush()
+    after = args.messages / (time.perf_counter() - start)
+    print(f"pipelined confirms      {after:10.0f} msg/s  ({args.messages} messages)")
+    print(f"speed-up                {after / before:10.1f}x vs connection per message, "
+          f"{after / serial:.1f}x vs confirm per message")
+    publisher.close()
+
+    connection = pika.BlockingConnection(pika.ConnectionParameters(args.host))
+    connection.channel().queue_delete(queue=queue_name)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,32 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
 import requests
-import pika
-import json
+from publisher import EventPublisher
 from datetime import datetime
+import metrics
+import tracing
 
 
 
-app = Flask(__name__)
+api = Blueprint("join_team", __name__)
 
-CORS(app, resources={r"/composite/*": {"origins": "*"}}, supports_credentials=True)
+# One connection per process, reused across requests (see publisher.py)
+event_publisher = EventPublisher(host="rabbitmq")
 
 def send_to_queue(queue_name, message):
-    try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-        channel = connection.channel()
-        channel.queue_declare(queue=queue_name, durable=True)
-        channel.basic_publish(
-            exchange='',
-            routing_key=queue_name,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(delivery_mode=2)
-        )
-        print("✅ Message sent to RabbitMQ.")
-        connection.close()
-    except Exception as e:
-        print("❌ Failed to send message to RabbitMQ:", str(e))
+    if event_publisher.publish(queue_name, message):
+        print("✅ Message queued for RabbitMQ.")
+    else:
+        print("❌ Failed to queue message for RabbitMQ: publish buffer is full")
+
+# Publisher counters: messages confirmed, still buffered, dropped
+@api.route("/composite/events/stats", methods=["GET"])
+def get_event_stats():
+    return jsonify(event_publisher.stats()), 200
 
 
 
-@app.route("/composite/check_if_already_in_team", methods=["GET"])
+@api.route("/composite/check_if_already_in_team", methods=["GET"])
 def check_if_already_in_team():
     try:
         tournament_id = request.args.get("tournamentId")
@@ -47,7 +44,7 @@ def check_if_already_in_team():
     except Exception as e:
         return jsonify({ "error": str(e) }), 500
     
-@app.route("/composite/tournament_details_with_teams/<tournament_id>", methods=["GET"])
+@api.route("/composite/tournament_details_with_teams/<tournament_id>", methods=["GET"])
 def get_tournament_details_with_teams(tournament_id):
     try:
         # 1. Get tournament details from tournament service
@@ -57,16 +54,22 @@ def get_tournament_details_with_teams(tournament_id):
         tournament_data = tourney_res.json()
 
         raw_teams = tournament_data.get("teams", [])
-        enriched_teams = []
+        team_ids = [team["teamId"] for team in raw_teams if team.get("teamId")]
+
+        # 2. Get enriched data for every team in one call to team service
+        team_details = {}
+        if team_ids:
+            teams_res = requests.post("http://teams-service:5003/teams/batch", json={"ids": team_ids})
+            if teams_res.status_code == 200:
+                team_details = {team["teamId"]: team for team in teams_res.json().get("teams", [])}
 
-        # 2. Get enriched data for each team from team service
+        enriched_teams = []
         for team in raw_teams:
             team_id = team.get("teamId")
             if not team_id:
                 continue
-            team_detail_res = requests.get(f"http://teams-service:5003/team/{team_id}")
-            if team_detail_res.status_code == 200:
-                team_info = team_detail_res.json()
+            team_info = team_details.get(team_id)
+            if team_info:
                 enriched_teams.append({
                     "teamId": team_id,
                     "name": team_info.get("name"),
@@ -85,7 +88,7 @@ def get_tournament_details_with_teams(tournament_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/composite/join_team", methods=["POST"])
+@api.route("/composite/join_team", methods=["POST"])
 def join_team():
     try:
         data = request.get_json()
@@ -155,6 +158,16 @@ def join_team():
 
 
 
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    CORS(app, resources={r"/composite/*": {"origins": "*"}}, supports_credentials=True)
+    metrics.instrument_flask(app, "join-team-service")  # GET /metrics
+    tracing.instrument_flask(app, "join-team-service")  # traceparent in and out
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host='0.0.0.0', port=5006, debug=True)
 
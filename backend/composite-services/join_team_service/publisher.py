@@ -0,0 +1,225 @@
+# publisher.py
+"""Long-lived RabbitMQ publisher with pipelined confirms and a bounded buffer.
+
+``publish`` only puts the message in an in-memory queue and returns. One
+background thread owns the connection, because pika connections are not
+thread-safe. It runs a SelectConnection's I/O loop over a single connection
+and channel that are reused for the life of the process.
+
+Publisher confirms are on, but pipelined: up to ``max_in_flight`` messages
+are sent without waiting, each tracked by its delivery tag, and the broker
+acknowledges them as they land (usually many at once with ``multiple``). A
+message leaves the publisher only once it is acked. Nacked messages are
+sent again. If the connection drops, every unconfirmed message is put back
+at the front, the thread reconnects with backoff, and they are resent in
+order. A broker blip can therefore produce duplicates but loses nothing, as
+long as the buffer does not fill up. When it is full, ``publish`` waits
+briefly and then returns False.
+"""
+import atexit
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from queue import Empty, Full, Queue
+
+import pika
+from pika.spec import Basic
+
+PROPERTIES = pika.BasicProperties(delivery_mode=2, content_type="application/json")
+
+
+class EventPublisher:
+    # Swapped for a fake in tests
+    connection_class = pika.SelectConnection
+
+    def __init__(self, host="rabbitmq", max_buffer=10000, max_in_flight=1000,
+                 flush_interval=0.05, put_timeout=1.0, max_backoff=5.0):
+        self.host = host
+        self.max_in_flight = max_in_flight
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_backoff = max_backoff
+        self.published = 0
+        self.dropped = 0
+        self.connects = 0
+        self._buffer = Queue(maxsize=max_buffer)
+        # Owned by the publisher thread
+        self._pending = deque()  # to send before the buffer: requeued or nacked
+        self._unconfirmed = OrderedDict()  # delivery tag -> (queue, body)
+        self._next_tag = 0
+        self._declared = set()
+        self._declaring = False
+        self._connection = None
+        self._channel = None
+        self._backoff = 0.1
+        self._wake_pending = False
+        self._accepted = 0
+        self._done = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def publish(self, queue_name, message):
+        """Buffer a JSON message for ``queue_name``. False if the buffer is full."""
+        self._start()
+        try:
+            self._buffer.put((queue_name, json.dumps(message)), timeout=self.put_timeout)
+        except Full:
+            with self._done:
+                self.dropped += 1
+            return False
+        with self._done:
+            self._accepted += 1
+        self._wake()
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until everything published so far is confirmed by the broker."""
+        with self._done:
+            return self._done.wait_for(lambda: self.published >= self._accepted, timeout)
+
+    def close(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._stopping = True
+        self._wake()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "buffered": self._buffer.qsize() + len(self._pending) + len(self._unconfirmed),
+            "dropped": self.dropped,
+            "connects": self.connects,
+            "connected": bool(self._channel and self._channel.is_open)
+        }
+
+    # Started on first use, so only processes that publish hold a connection
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    # Ask the I/O loop to send now instead of at its next tick
+    def _wake(self):
+        connection = self._connection
+        if connection is None or self._wake_pending:
+            return
+        self._wake_pending = True
+        try:
+            connection.ioloop.add_callback_threadsafe(self._pump)
+        except Exception:
+            self._wake_pending = False  # loop already gone; the next one pumps on open
+
+    def _run(self):
+        while not self._stopping:
+            self._connection = self.connection_class(
+                pika.ConnectionParameters(self.host, heartbeat=30, blocked_connection_timeout=30),
+                on_open_callback=self._on_open,
+                on_open_error_callback=self._on_open_error,
+                on_close_callback=self._on_closed)
+            # Returns once the connection has closed, for whatever reason
+            self._connection.ioloop.start()
+            self._channel = None
+            self._requeue_unconfirmed()
+            if self._stopping:
+                break  # close() already waited as long as it was allowed to
+            time.sleep(self._backoff)
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+        self._connection = None
+
+    def _on_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_open_error(self, connection, error):
+        print(f"❌ RabbitMQ connect failed, retrying in {self._backoff:.1f}s:", str(error))
+        connection.ioloop.stop()
+
+    def _on_closed(self, connection, reason):
+        if not self._stopping:
+            print(f"❌ RabbitMQ connection lost, retrying in {self._backoff:.1f}s:", str(reason))
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        self._next_tag = 0
+        self._declared = set()
+        self._declaring = False
+        with self._done:
+            self.connects += 1
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm, callback=lambda _frame: self._tick())
+
+    def _on_channel_closed(self, channel, reason):
+        # The broker closed the channel (e.g. a failed declare): start over
+        if self._connection is not None and self._connection.is_open:
+            self._connection.close()
+
+    def _tick(self):
+        self._pump()
+        if self._channel is not None and self._channel.is_open:
+            self._connection.ioloop.call_later(self.flush_interval, self._tick)
+
+    def _pump(self):
+        self._wake_pending = False
+        channel = self._channel
+        if channel is None or not channel.is_open or self._declaring:
+            return
+        while channel.is_open and len(self._unconfirmed) < self.max_in_flight:
+            message = self._next_message()
+            if message is None:
+                break
+            queue_name = message[0]
+            if queue_name not in self._declared:
+                # Publishing resumes once the queue exists
+                self._pending.appendleft(message)
+                self._declaring = True
+                channel.queue_declare(queue=queue_name, durable=True,
+                                      callback=lambda _frame: self._on_declared(queue_name))
+                return
+            channel.basic_publish(exchange='', routing_key=queue_name, body=message[1], properties=PROPERTIES)
+            self._next_tag += 1
+            self._unconfirmed[self._next_tag] = message
+        if self._stopping and not self._unconfirmed and not self._pending and self._buffer.empty():
+            self._connection.close()
+
+    def _next_message(self):
+        if self._pending:
+            return self._pending.popleft()
+        try:
+            return self._buffer.get_nowait()
+        except Empty:
+            return None
+
+    def _on_declared(self, queue_name):
+        self._declared.add(queue_name)
+        self._declaring = False
+        self._pump()
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        if method.multiple:
+            tags = [tag for tag in self._unconfirmed if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._unconfirmed else []
+        messages = [self._unconfirmed.pop(tag) for tag in tags]
+        if isinstance(method, Basic.Nack):
+            # Send again, ahead of anything taken after them
+            self._pending.extendleft(reversed(messages))
+        else:
+            self._backoff = 0.1
+            with self._done:
+                self.published += len(messages)
+                self._done.notify_all()
+        self._pump()
+
+    # Unconfirmed messages were sent before anything still pending
+    def _requeue_unconfirmed(self):
+        self._pending.extendleft(reversed(list(self._unconfirmed.values())))
+        self._unconfirmed.clear()
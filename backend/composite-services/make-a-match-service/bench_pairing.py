@@ -0,0 +1,143 @@
+# bench_pairing.py
+"""Benchmark the pairing engine against the old greedy pairing.
+
+Usage: python bench_pairing.py [--teams 500 1000 5000] [--days 7] [--legacy-max 2000]
+
+For each size this prints how long each implementation took, how many
+teams it paired, and the total rank distance of its pairs (lower means
+closer wins/ELO matchups). It also prints the size of the availability
+payload in the {day: [teamIds]} form and in the compact bitmask form.
+"""
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+
+from pairing import availability_to_masks, create_match_pairs, sort_teams
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# The greedy + random fallback that make_match used before pairing.py.
+def legacy_create_match_pairs(teams, availability):
+    pairs = []
+    team_days = defaultdict(list)
+    for day, day_teams in availability.items():
+        for team_id in day_teams:
+            team_days[team_id].append(day)
+
+    sorted_teams = sort_teams(teams)
+    used = set()
+    for i in range(len(sorted_teams)):
+        t1 = sorted_teams[i]['teamId']
+        if t1 in used:
+            continue
+        for j in range(i + 1, len(sorted_teams)):
+            t2 = sorted_teams[j]['teamId']
+            if t2 in used:
+                continue
+            common_days = set(team_days[t1]) & set(team_days[t2])
+            if common_days:
+                selected_day = sorted(common_days)[0]
+                pairs.append({"teamA": t1, "teamB": t2, "day": selected_day})
+                used.update([t1, t2])
+                break
+
+    remaining = [t for t in teams if t['teamId'] not in used]
+    random.shuffle(remaining)
+    while len(remaining) >= 2:
+        t1 = remaining.pop()
+        t2 = None
+        for i, candidate in enumerate(remaining):
+            common_days = set(team_days[t1['teamId']]) & set(team_days[candidate['teamId']])
+            if common_days:
+                t2 = candidate
+                selected_day = sorted(common_days)[0]
+                pairs.append({"teamA": t1['teamId'], "teamB": t2['teamId'], "day": selected_day})
+                remaining.pop(i)
+                break
+        if not t2:
+            return None
+    return pairs
+
+
+def make_round(n_teams, n_days, rng):
+    days = DAYS[:n_days] if n_days <= len(DAYS) else [f"slot-{i}" for i in range(n_days)]
+    teams = []
+    availability = defaultdict(list)
+    for i in range(n_teams):
+        team_id = f"team-{i}"
+        teams.append({
+            "teamId": team_id,
+            "teamStats": {"wins": rng.randint(0, 5), "elo": rng.randint(1200, 1800), "losses": 0},
+        })
+        for day in rng.sample(days, rng.randint(1, 3)):
+            availability[day].append(team_id)
+    return teams, dict(availability)
+
+
+def check_pairs(teams, availability, pairs):
+    team_days = defaultdict(set)
+    for day, day_teams in availability.items():
+        for team_id in day_teams:
+            team_days[team_id].add(day)
+    seen = set()
+    for p in pairs:
+        assert p["teamA"] not in seen and p["teamB"] not in seen, "team paired twice"
+        assert p["day"] in team_days[p["teamA"]] and p["day"] in team_days[p["teamB"]], "bad day"
+        seen.update([p["teamA"], p["teamB"]])
+
+
+def rank_distance(teams, pairs):
+    rank = {t['teamId']: i for i, t in enumerate(sort_teams(teams))}
+    return sum(abs(rank[p["teamA"]] - rank[p["teamB"]]) for p in pairs)
+
+
+def engine_pairs(teams, availability):
+    return create_match_pairs(teams, *availability_to_masks(availability))
+
+
+def run(name, fn, teams, availability):
+    start = time.perf_counter()
+    pairs = fn(teams, availability)
+    elapsed = time.perf_counter() - start
+    if pairs is None:
+        print(f"  {name:<8} {elapsed * 1000:9.1f} ms   gave up (returned None)")
+        return
+    check_pairs(teams, availability, pairs)
+    print(f"  {name:<8} {elapsed * 1000:9.1f} ms   paired {len(pairs) * 2}/{len(teams)}"
+          f"   rank distance {rank_distance(teams, pairs)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--teams", type=int, nargs="+", default=[100, 500, 2000, 5000])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--legacy-max", type=int, default=2000,
+                        help="skip the greedy baseline above this many teams")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for n_teams in args.teams:
+        rng = random.Random(args.seed + n_teams)
+        teams, availability = make_round(n_teams, args.days, rng)
+        days, masks = availability_to_masks(availability)
+        print(f"{n_teams} teams, {args.days} days   payload {len(json.dumps(availability))} B"
+              f" -> {len(json.dumps({'days': days, 'teams': masks}))} B compact")
+        if n_teams <= args.legacy_max:
+            run("greedy", legacy_create_match_pairs, teams, availability)
+        run("engine", engine_pairs, teams, availability)
+
+    # A round the greedy pass gets wrong: pairing the top two teams on
+    # Monday strands the others, but a full pairing exists.
+    teams = [{"teamId": t, "teamStats": {"wins": 3 - i, "elo": 1500}}
+             for i, t in enumerate(["a", "b", "c", "d"])]
+    availability = {"Monday": ["a", "b", "c"], "Tuesday": ["a", "d"]}
+    print("4 teams, greedy trap")
+    run("greedy", legacy_create_match_pairs, teams, availability)
+    run("engine", engine_pairs, teams, availability)
+
+
+if __name__ == "__main__":
+    main()
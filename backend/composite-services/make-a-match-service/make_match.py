@@ -1,13 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
 import requests
 import logging
-from collections import defaultdict
-import random
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pairing import create_match_pairs
+import metrics
+import tracing
 
 
-app = Flask(__name__)
-CORS(app, origins="*", supports_credentials=True)
+api = Blueprint("make_match", __name__)
 
 
 logging.basicConfig(level=logging.DEBUG)
@@ -16,62 +20,47 @@ logging.basicConfig(level=logging.DEBUG)
 SCHEDULE_SERVICE_URL = "http://schedule-service:5005"
 TOURNAMENT_SERVICE_URL = "http://tournament-service:5002"
 MATCH_SERVICE_URL = "http://match-service:5004"
-
-# Helper: Sort teams by wins then ELO
-def sort_teams(teams):
-    return sorted(teams, key=lambda t: (-t['teamStats']['wins'], -t['teamStats']['elo']))
-
-# Helper: Find best matching pairs given availability
-def create_match_pairs(teams, availability):
-    pairs = []
-    unpaired_teams = {t['teamId']: t for t in teams}
-    team_days = defaultdict(list)
-
-    # Build reverse map of team to available days
-    for day, day_teams in availability.items():
-        for team_id in day_teams:
-            team_days[team_id].append(day)
-
-    # Try pairing teams with common days, sorted by win/ELO
-    sorted_teams = sort_teams(teams)
-
-    used = set()
-    for i in range(len(sorted_teams)):
-        t1 = sorted_teams[i]['teamId']
-        if t1 in used:
-            continue
-        for j in range(i + 1, len(sorted_teams)):
-            t2 = sorted_teams[j]['teamId']
-            if t2 in used:
-                continue
-            common_days = set(team_days[t1]) & set(team_days[t2])
-            if common_days:
-                selected_day = sorted(common_days)[0]
-                pairs.append({"teamA": t1, "teamB": t2, "day": selected_day})
-                used.update([t1, t2])
-                break
-
-    # Fallback: Pair remaining unpaired teams randomly on any available day
-    remaining = [t for t in teams if t['teamId'] not in used]
-    random.shuffle(remaining)
-
-    while len(remaining) >= 2:
-        t1 = remaining.pop()
-        t2 = None
-        for i, candidate in enumerate(remaining):
-            common_days = set(team_days[t1['teamId']]) & set(team_days[candidate['teamId']])
-            if common_days:
-                t2 = candidate
-                selected_day = sorted(common_days)[0]
-                pairs.append({"teamA": t1['teamId'], "teamB": t2['teamId'], "day": selected_day})
-                remaining.pop(i)
-                break
-        if not t2:
-            return None  # Unable to match this team with anyone
-
-    return pairs
-
-@app.route("/make-match", methods=["POST", "OPTIONS"])
+NOTIFICATION_SERVICE_URL = "http://notification-service:8000"
+
+# Independent downstream calls run side by side on this pool, so a request
+# takes about as long as its slowest dependency rather than the sum of all.
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get("MAKE_MATCH_WORKERS", 16)))
+
+# Seconds each downstream call may take
+SCHEDULE_TIMEOUT = float(os.environ.get("SCHEDULE_TIMEOUT", 5))
+TOURNAMENT_TIMEOUT = float(os.environ.get("TOURNAMENT_TIMEOUT", 5))
+MATCH_TIMEOUT = float(os.environ.get("MATCH_TIMEOUT", 10))
+NOTIFY_TIMEOUT = float(os.environ.get("NOTIFY_TIMEOUT", 3))
+
+# Bulk generation: rounds per request, and the deadline for the bulk
+# reads/writes, which carry hundreds of tournaments at once
+BULK_MAX = 1000
+BULK_TIMEOUT = float(os.environ.get("BULK_TIMEOUT", 60))
+
+# Pairing is CPU bound, so bulk requests spread it over processes. The pool
+# is created on first use so single-round requests never pay for it. Every
+# gunicorn worker has its own pool, so by default they split the cores.
+# Processes start from a forkserver: forking a worker that is running
+# request threads can copy a lock some other thread holds.
+PAIRING_PROCESSES = int(os.environ.get(
+    "PAIRING_PROCESSES", max(1, (os.cpu_count() or 1) // int(os.environ.get("WEB_WORKERS", 1)))))
+pairing_pool = None
+pairing_pool_lock = threading.Lock()
+
+def get_pairing_pool():
+    global pairing_pool
+    with pairing_pool_lock:
+        if pairing_pool is None:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["pairing"])
+            pairing_pool = ProcessPoolExecutor(max_workers=PAIRING_PROCESSES, mp_context=context)
+        return pairing_pool
+
+# Start an HTTP call on the pool; .result() returns the response or raises
+def call_async(method, url, timeout, **kwargs):
+    return tracing.submit(executor, requests.request, method, url, timeout=timeout, **kwargs)
+
+@api.route("/make-match", methods=["POST", "OPTIONS"])
 def make_match():
     if request.method == "OPTIONS":
         return jsonify({}), 200  # 👈 handles preflight CORS requests
@@ -89,40 +78,28 @@ def make_match():
         if not tournament_id or round_number is None:
             return jsonify({"error": "Missing tournamentId or roundNumber"}), 400
 
-        # 1. Get availability from schedule service
-        schedule_url = f"{SCHEDULE_SERVICE_URL}/schedule/by-tournament/{tournament_id}"
+        # 1 + 2. Fetch compact availability and the tournament's teams together
+        schedule_future = call_async("GET", f"{SCHEDULE_SERVICE_URL}/schedule/{tournament_id}/{round_number}/compact",
+                                     SCHEDULE_TIMEOUT)
+        tournament_future = call_async("GET", f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}", TOURNAMENT_TIMEOUT)
+
         try:
-            schedule_resp = requests.get(schedule_url)
+            schedule_resp = schedule_future.result()
+            if schedule_resp.status_code == 404:
+                return jsonify({"error": "No schedule found for that round"}), 404
             if schedule_resp.status_code != 200:
                 return jsonify({"error": f"Failed to retrieve schedule: {schedule_resp.text}"}), schedule_resp.status_code
-            all_schedules = schedule_resp.json()
+            availability = schedule_resp.json()
+        except requests.exceptions.Timeout:
+            return jsonify({"error": "Schedule service timed out"}), 504
         except Exception as e:
             logging.error(f"Error calling schedule service: {e}")
             return jsonify({"error": "Schedule service error"}), 500
 
-        # 2. Find matching schedule doc
-        schedule_doc = None
-        for s in all_schedules:
-            logging.debug(f"Checking schedule: {s}")
-            try:
-                s_round = int(s.get("roundNumber"))
-            except (TypeError, ValueError):
-                continue
-            s_tournament = s.get("tournament", {})
-            s_tournament_id = s_tournament.get("tournamentId")
-
-            if s_round == round_number and s_tournament_id == tournament_id:
-                schedule_doc = s
-                logging.debug(f"✅ Found matching schedule: {schedule_doc}")
-                break
-
-        if not schedule_doc:
-            return jsonify({"error": "No schedule found for that round"}), 404
-
-        availability = schedule_doc.get("teamAvailableDays", {})
-
-        # 3. Get teams and stats from tournament service
-        tournament_res = requests.get(f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}")
+        try:
+            tournament_res = tournament_future.result()
+        except requests.exceptions.Timeout:
+            return jsonify({"error": "Tournament service timed out"}), 504
         if tournament_res.status_code != 200:
             return jsonify({"error": "Failed to fetch tournament"}), 500
         tournament_data = tournament_res.json()
@@ -140,59 +117,62 @@ def make_match():
         # if len(teams) % 2 != 0:
         #     return jsonify({"error": "Odd number of teams cannot be paired evenly"}), 400
 
-        # 4. Form matchups
-        pairs = create_match_pairs(teams, availability)
+        # 3. Form matchups
+        pairs = create_match_pairs(teams, availability["days"], availability["teams"])
 
         print("🧠 Total teams:", len(teams))
         print("📅 Availability:", availability)
         print("🔁 Pairs generated:", pairs)
 
 
-        if pairs is None or len(pairs) * 2 != len(teams):
+        if len(pairs) * 2 != len(teams):
             return jsonify({"error": "Unable to pair all teams. Check availability."}), 400
 
-        # 5. Post matches to match service
-        for pair in pairs:
-            match_data = {
-                "tournamentId": tournament_id,
-                "teamAId": pair["teamA"],          # ✅ match what match_service expects
-                "teamBId": pair["teamB"],
-                "scheduledTime": pair["day"],       # ✅ reuse "Monday" for now
-                "status":"ongoing",
-                "roundNumber":round_number
-            }
-
-            # match_data = {
-            #     "tournamentId": tournament_id,
-            #     "roundNumber": round_number,
-            #     "teamA": pair["teamA"],
-            #     "teamB": pair["teamB"],
-            #     # "day": pair["day"],
-            #     "status": "upcoming",
-            #     "scheduledTime": pair["day"]
-            # }
-            match_res = requests.post(f"{MATCH_SERVICE_URL}/match", json=match_data)
-            if match_res.status_code != 201:
-                return jsonify({"error": f"Failed to create match for {pair['teamA']} vs {pair['teamB']}"}), 500
-
-         # ✅ Update curRound in tournament service
-        update_payload = { "curRound": round_number }
-        update_url = f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}/update_round"
-        update_res = requests.put(update_url, json=update_payload)
-
-        #notify in the channel of upcoming scheduled matches
-        notify_url = "http://notification-service:8000/display_match"  
-        notify_payload = {
+        # 4. Post all matches to match service in one batch
+        matches = [{
+            "tournamentId": tournament_id,
+            "teamAId": pair["teamA"],          # ✅ match what match_service expects
+            "teamBId": pair["teamB"],
+            "scheduledTime": pair["day"],       # ✅ reuse "Monday" for now
+            "status": "ongoing",
+            "roundNumber": round_number
+        } for pair in pairs]
+        try:
+            match_res = requests.post(f"{MATCH_SERVICE_URL}/matches/batch", json={"matches": matches},
+                                      timeout=MATCH_TIMEOUT)
+        except requests.exceptions.Timeout:
+            return jsonify({"error": "Match service timed out"}), 504
+        if match_res.status_code != 201:
+            return jsonify({"error": f"Failed to create matches: {match_res.text}"}), 500
+
+        # 5. Update curRound and announce the round; neither waits on the other
+        update_future = call_async("PUT", f"{TOURNAMENT_SERVICE_URL}/tournament/{tournament_id}/update_round",
+                                   TOURNAMENT_TIMEOUT, json={"curRound": round_number})
+        notify_future = call_async("POST", f"{NOTIFICATION_SERVICE_URL}/display_matches", NOTIFY_TIMEOUT, json={
             "tournament_id": tournament_id,
-            "team_a": pair["teamA"],
-            "team_b": pair["teamB"],
-            "scheduled_time": pair["day"]
-        }
-        notify_res = requests.post(notify_url, json=notify_payload)
-        if notify_res.status_code != 200:
+            "round_number": round_number,
+            "matches": [{
+                "team_a": pair["teamA"],
+                "team_b": pair["teamB"],
+                "scheduled_time": pair["day"]
+            } for pair in pairs]
+        })
+
+        try:
+            update_ok = update_future.result().status_code == 200
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error updating curRound: {e}")
+            update_ok = False
+        try:
+            notify_ok = notify_future.result().status_code == 200
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error notifying matches: {e}")
+            notify_ok = False
+
+        if not notify_ok:
             return jsonify({"error": "Failed to display matches"}), 500
 
-        if update_res.status_code != 200:
+        if not update_ok:
             return jsonify({"error": "Matches created but failed to update curRound"}), 500
 
         return jsonify({"message": f"{len(pairs)} matches created and tournament round updated"}), 201
@@ -205,5 +185,150 @@ def make_match():
         return jsonify({"error": str(e)}), 500
 
 
+# Generate rounds for many tournaments at once
+# Body: {"rounds": [{"tournamentId": ..., "roundNumber": ...}, ...]}
+# Returns one report per requested round, in request order.
+@api.route("/make-match/bulk", methods=["POST", "OPTIONS"])
+def make_match_bulk():
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    rounds = (request.json or {}).get("rounds")
+    if not isinstance(rounds, list) or not rounds:
+        return jsonify({"error": "rounds must be a non-empty list"}), 400
+    if len(rounds) > BULK_MAX:
+        return jsonify({"error": f"At most {BULK_MAX} rounds per request"}), 400
+
+    reports = []
+    for r in rounds:
+        r = r if isinstance(r, dict) else {}
+        report = {"tournamentId": r.get("tournamentId"), "roundNumber": r.get("roundNumber")}
+        try:
+            report["roundNumber"] = int(r.get("roundNumber"))
+            if not report["tournamentId"]:
+                raise ValueError
+        except (TypeError, ValueError):
+            report["error"] = "Missing tournamentId or invalid roundNumber"
+        reports.append(report)
+    pending = [report for report in reports if "error" not in report]
+    if not pending:
+        return jsonify({"created": 0, "failed": len(reports), "reports": reports}), 400
+
+    # 1. Prefetch every schedule and tournament with one call each, in parallel
+    schedules_future = call_async("POST", f"{SCHEDULE_SERVICE_URL}/schedules/compact", BULK_TIMEOUT, json={
+        "rounds": [{"tournamentId": p["tournamentId"], "roundNumber": p["roundNumber"]} for p in pending]
+    })
+    tournaments_future = call_async("POST", f"{TOURNAMENT_SERVICE_URL}/tournaments/batch", BULK_TIMEOUT, json={
+        "ids": list(dict.fromkeys(p["tournamentId"] for p in pending)), "fields": ["teams"]
+    })
+    try:
+        schedules_res = schedules_future.result()
+        tournaments_res = tournaments_future.result()
+    except requests.exceptions.Timeout:
+        return jsonify({"error": "Timed out prefetching schedules and tournaments"}), 504
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error prefetching for bulk make-match: {e}")
+        return jsonify({"error": "Failed to prefetch schedules and tournaments"}), 502
+    if schedules_res.status_code != 200 or tournaments_res.status_code != 200:
+        return jsonify({"error": "Failed to prefetch schedules and tournaments"}), 502
+
+    teams_by_tournament = {t["id"]: t.get("teams", []) for t in tournaments_res.json()["tournaments"]}
+    jobs = []
+    for report, schedule in zip(pending, schedules_res.json()["schedules"]):
+        if "error" in schedule:
+            report["error"] = "No schedule found for that round"
+        elif report["tournamentId"] not in teams_by_tournament:
+            report["error"] = "Tournament not found"
+        else:
+            jobs.append((report, teams_by_tournament[report["tournamentId"]], schedule))
+
+    # 2. Pair every round across the process pool
+    chunksize = max(1, len(jobs) // (PAIRING_PROCESSES * 4))
+    all_pairs = get_pairing_pool().map(
+        create_match_pairs,
+        [teams for _, teams, _ in jobs],
+        [schedule["days"] for _, _, schedule in jobs],
+        [schedule["teams"] for _, _, schedule in jobs],
+        chunksize=chunksize
+    )
+
+    matches = []
+    paired = []
+    for (report, teams, _), pairs in zip(jobs, all_pairs):
+        if len(pairs) * 2 != len(teams):
+            report["error"] = "Unable to pair all teams. Check availability."
+            continue
+        report["pairs"] = pairs
+        paired.append(report)
+        matches.extend({
+            "tournamentId": report["tournamentId"],
+            "teamAId": pair["teamA"],
+            "teamBId": pair["teamB"],
+            "scheduledTime": pair["day"],
+            "status": "ongoing",
+            "roundNumber": report["roundNumber"]
+        } for pair in pairs)
+
+    # 3. Write every match through match-service's batched writes
+    if matches:
+        try:
+            match_res = requests.post(f"{MATCH_SERVICE_URL}/matches/batch", json={"matches": matches},
+                                      timeout=BULK_TIMEOUT)
+            match_ok = match_res.status_code == 201
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error creating bulk matches: {e}")
+            match_ok = False
+        if not match_ok:
+            for report in paired:
+                report.pop("pairs")
+                report["error"] = "Failed to create matches"
+            paired = []
+
+    # 4. Update every curRound in one batch and announce each round, all at once
+    if paired:
+        cur_rounds = {}
+        for report in paired:
+            cur_rounds[report["tournamentId"]] = max(report["roundNumber"], cur_rounds.get(report["tournamentId"], 0))
+        update_future = call_async("POST", f"{TOURNAMENT_SERVICE_URL}/tournaments/rounds", BULK_TIMEOUT, json={
+            "rounds": [{"tournamentId": t, "curRound": r} for t, r in cur_rounds.items()]
+        })
+        notify_futures = [call_async("POST", f"{NOTIFICATION_SERVICE_URL}/display_matches", NOTIFY_TIMEOUT, json={
+            "tournament_id": report["tournamentId"],
+            "round_number": report["roundNumber"],
+            "matches": [{
+                "team_a": pair["teamA"],
+                "team_b": pair["teamB"],
+                "scheduled_time": pair["day"]
+            } for pair in report["pairs"]]
+        }) for report in paired]
+
+        try:
+            update_res = update_future.result()
+            updated = set(update_res.json().get("updated", [])) if update_res.status_code == 200 else set()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error updating curRounds: {e}")
+            updated = set()
+        for report, future in zip(paired, notify_futures):
+            try:
+                report["notified"] = future.result().status_code == 200
+            except requests.exceptions.RequestException:
+                report["notified"] = False
+            report["roundUpdated"] = report["tournamentId"] in updated
+            report["matches"] = len(report.pop("pairs"))
+
+    failed = sum(1 for report in reports if "error" in report)
+    return jsonify({"created": len(reports) - failed, "failed": failed, "reports": reports}), 200
+
+
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    CORS(app, origins="*", supports_credentials=True)
+    metrics.instrument_flask(app, "make-match")  # GET /metrics
+    tracing.instrument_flask(app, "make-match")  # traceparent in and out
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", port=5007, debug=True)
@@ -0,0 +1,217 @@
+# pairing.py
+"""Round pairing engine for the make-a-match service.
+
+Two teams can play each other when they share an available day, so the
+compatibility graph is a union of cliques, one clique per day. That
+structure keeps pairing fast and exact:
+
+* Teams with the same set of days are interchangeable. In a maximum
+  matching a team type needs at most ``len(days) + 2`` teams in play against
+  other types; the rest can always play each other. So Edmonds' blossom
+  algorithm only runs on a small compressed graph, whatever the team count.
+* Once every team has a day, all teams on that day can play each other, and
+  pairing neighbours in ``sort_teams`` order gives the smallest total
+  wins/ELO rank distance for that day.
+
+Availability is handled in the compact form schedule-service serves: a
+list of days plus one integer bitmask per team. Compatibility between
+availability types is a single NumPy AND over a type x type matrix.
+
+The result is a maximum matching (perfect whenever one exists). Each team
+plays on the most popular of its days unless the matching needs it
+elsewhere, so the per-day rank pairing runs over buckets that are as large
+as possible.
+"""
+from collections import defaultdict, deque
+
+import numpy as np
+
+
+# Helper: Sort teams by wins then ELO
+def sort_teams(teams):
+    return sorted(teams, key=lambda t: (-t['teamStats']['wins'], -t['teamStats']['elo']))
+
+
+# Helper: Encode {day: [teamIds]} as (days, {teamId: bitmask})
+def availability_to_masks(availability):
+    days = list(availability)
+    masks = defaultdict(int)
+    for bit, day in enumerate(days):
+        for team_id in availability[day]:
+            masks[team_id] |= 1 << bit
+    return days, dict(masks)
+
+
+def _find_augmenting_path(root, adj, mate):
+    """BFS from a free vertex, contracting blossoms as they are found.
+
+    Returns the free vertex at the end of an augmenting path (or -1) and the
+    parent links needed to walk it back to ``root``.
+    """
+    n = len(adj)
+    parent = [-1] * n
+    base = list(range(n))
+    used = [False] * n
+    used[root] = True
+    queue = deque([root])
+
+    def lowest_common_base(a, b):
+        seen = [False] * n
+        while True:
+            a = base[a]
+            seen[a] = True
+            if mate[a] == -1:
+                break
+            a = parent[mate[a]]
+        while True:
+            b = base[b]
+            if seen[b]:
+                return b
+            b = parent[mate[b]]
+
+    def mark_path(v, b, child, blossom):
+        while base[v] != b:
+            blossom[base[v]] = blossom[base[mate[v]]] = True
+            parent[v] = child
+            child = mate[v]
+            v = parent[mate[v]]
+
+    while queue:
+        v = queue.popleft()
+        for to in adj[v]:
+            if base[v] == base[to] or mate[v] == to:
+                continue
+            if to == root or (mate[to] != -1 and parent[mate[to]] != -1):
+                cur_base = lowest_common_base(v, to)
+                blossom = [False] * n
+                mark_path(v, cur_base, to, blossom)
+                mark_path(to, cur_base, v, blossom)
+                for i in range(n):
+                    if blossom[base[i]]:
+                        base[i] = cur_base
+                        if not used[i]:
+                            used[i] = True
+                            queue.append(i)
+            elif parent[to] == -1:
+                parent[to] = v
+                if mate[to] == -1:
+                    return to, parent
+                used[mate[to]] = True
+                queue.append(mate[to])
+    return -1, parent
+
+
+def max_cardinality_matching(adj, mate):
+    """Edmonds' blossom algorithm. Grows ``mate`` (-1 = free) in place.
+
+    ``mate`` may start from any valid matching; only its free vertices are
+    searched, so a good initial matching means very few augmentations.
+    """
+    for root in range(len(adj)):
+        if mate[root] != -1:
+            continue
+        end, parent = _find_augmenting_path(root, adj, mate)
+        while end != -1:
+            prev = parent[end]
+            next_end = mate[prev]
+            mate[end] = prev
+            mate[prev] = end
+            end = next_end
+    return mate
+
+
+def create_match_pairs(teams, days, masks):
+    """Pair teams for a round.
+
+    ``days`` is the round's day/slot universe and ``masks`` maps teamId to a
+    bitmask over it. Returns a list of ``{"teamA", "teamB", "day"}`` dicts
+    forming a maximum matching: every team is paired whenever a full
+    pairing exists.
+    """
+    sorted_teams = sort_teams(teams)
+    rank = {t['teamId']: i for i, t in enumerate(sorted_teams)}
+    dtype = np.uint64 if len(days) <= 64 else object
+
+    types = defaultdict(list)  # bitmask -> teamIds in rank order
+    for t in sorted_teams:
+        mask = masks.get(t['teamId'], 0)
+        if mask:  # no available day means no possible opponent
+            types[mask].append(t['teamId'])
+    if not types:
+        return []
+
+    type_masks = list(types)
+    type_array = np.array(type_masks, dtype=dtype)
+    type_sizes = np.array([len(types[m]) for m in type_masks])
+    compatible = (type_array[:, None] & type_array[None, :]) != 0
+
+    # Teams available per day, and days in the order we prefer to play them
+    bits = (type_array[:, None] >> np.arange(len(days)).astype(dtype)) & 1
+    popularity = (bits.astype(np.int64) * type_sizes[:, None]).sum(axis=0)
+    preference = sorted(range(len(days)), key=lambda b: (-popularity[b], b))
+
+    def best_day(mask):
+        for bit in preference:
+            if mask >> bit & 1:
+                return bit
+
+    # Compressed graph: keep up to popcount + 2 teams of each type (same
+    # parity as the type size) as vertices; the rest pair up on their own.
+    node_types = []
+    node_teams = []
+    nodes_by_type = []
+    assigned_day = {}
+    for mask in type_masks:
+        team_ids = types[mask]
+        width = bin(mask).count("1")
+        live = len(team_ids)
+        if live > width + 2:
+            live = width + 1 + (len(team_ids) - width - 1) % 2
+        nodes_by_type.append(range(len(node_teams), len(node_teams) + live))
+        for team_id in team_ids[:live]:
+            node_types.append(mask)
+            node_teams.append(team_id)
+        for team_id in team_ids[live:]:
+            assigned_day[team_id] = best_day(mask)
+
+    # All vertices of a type share one neighbour list. It includes the vertex
+    # itself, which the blossom search skips (base[v] == base[v]).
+    type_adj = [[j for other in np.flatnonzero(row) for j in nodes_by_type[other]]
+                for row in compatible]
+    type_index = {mask: i for i, mask in enumerate(type_masks)}
+    adj = [type_adj[type_index[mask]] for mask in node_types]
+    n = len(node_teams)
+
+    # Start from "everyone plays on their most popular day", then let the
+    # blossom algorithm repair whatever that leaves unpaired.
+    mate = [-1] * n
+    waiting = {}
+    for i in range(n):
+        day = best_day(node_types[i])
+        if day in waiting:
+            j = waiting.pop(day)
+            mate[i], mate[j] = j, i
+        else:
+            waiting[day] = i
+    max_cardinality_matching(adj, mate)
+
+    for i, j in enumerate(mate):
+        if j > i:
+            day = best_day(node_types[i] & node_types[j])
+            assigned_day[node_teams[i]] = day
+            assigned_day[node_teams[j]] = day
+
+    # Every day bucket now holds an even number of mutually compatible
+    # teams; pairing rank neighbours minimises the wins/ELO distance.
+    buckets = defaultdict(list)
+    for team_id, day in assigned_day.items():
+        buckets[day].append(team_id)
+
+    pairs = []
+    for day, team_ids in buckets.items():
+        team_ids.sort(key=rank.__getitem__)
+        for k in range(0, len(team_ids), 2):
+            pairs.append({"teamA": team_ids[k], "teamB": team_ids[k + 1], "day": days[day]})
+
+    pairs.sort(key=lambda p: rank[p["teamA"]])
+    return pairs
@@ -0,0 +1,205 @@
+# event_log.py
+"""Append-only, size-rotated JSONL log of player events.
+
+Events are appended to a plain ``events-NNNNNN.jsonl`` segment and fsynced
+once per batch. When the segment passes ``max_segment_bytes`` it is
+gzipped to ``events-NNNNNN.jsonl.gz`` and a new segment is started.
+
+index.json holds a summary of every sealed segment: its event count and
+time range, and the same for each tournament in it. A query by tournament
+or time range opens only the segments that can contain a match, and
+inside a segment it skips lines that do not mention the tournament
+before parsing any JSON.
+
+Timestamps are the ISO strings the publisher puts on each event, so time
+ranges compare as strings. After a crash, ``EventLog`` cleans up on open:
+it drops a torn last line and finishes any rotation that was interrupted.
+"""
+import gzip
+import json
+import os
+import shutil
+
+INDEX_FILE = "index.json"
+PREFIX = "events-"
+
+
+def segment_path(directory, seq, sealed):
+    return os.path.join(directory, f"{PREFIX}{seq:06d}.jsonl" + (".gz" if sealed else ""))
+
+
+def list_segments(directory):
+    """Return [(seq, path, sealed)] in append order."""
+    segments = []
+    for name in os.listdir(directory):
+        if not name.startswith(PREFIX) or not name.endswith((".jsonl", ".jsonl.gz")):
+            continue
+        seq = int(name[len(PREFIX):].split(".")[0])
+        segments.append((seq, os.path.join(directory, name), name.endswith(".gz")))
+    return sorted(segments)
+
+
+def load_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"segments": {}}
+
+
+def save_index(directory, index):
+    path = os.path.join(directory, INDEX_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def new_summary():
+    return {"count": 0, "minTs": None, "maxTs": None, "tournaments": {}}
+
+
+def add_to_summary(summary, event):
+    ts = event.get("timestamp") or ""
+    summary["count"] += 1
+    summary["minTs"] = min(summary["minTs"] or ts, ts)
+    summary["maxTs"] = max(summary["maxTs"] or ts, ts)
+    entry = summary["tournaments"].setdefault(str(event.get("tournament_id")), [0, ts, ts])
+    entry[0] += 1
+    entry[1] = min(entry[1], ts)
+    entry[2] = max(entry[2], ts)
+
+
+def summarize(path, sealed):
+    summary = new_summary()
+    opener = gzip.open if sealed else open
+    with opener(path, "rb") as f:
+        for line in f:
+            try:
+                add_to_summary(summary, json.loads(line))
+            except ValueError:
+                continue
+    return summary
+
+
+def may_contain(summary, tournament=None, since=None, until=None):
+    """False when the summary rules the segment out for this query."""
+    if tournament is not None:
+        entry = summary["tournaments"].get(tournament)
+        if not entry:
+            return False
+        low, high = entry[1], entry[2]
+    else:
+        if not summary["count"]:
+            return False
+        low, high = summary["minTs"], summary["maxTs"]
+    if since is not None and high < since:
+        return False
+    if until is not None and low >= until:
+        return False
+    return True
+
+
+def iter_events(directory, tournament=None, since=None, until=None):
+    """Yield stored events in append order, filtered by tournament and [since, until)."""
+    index = load_index(directory)["segments"]
+    needle = json.dumps(tournament).encode() if tournament is not None else None
+    for _, path, sealed in list_segments(directory):
+        summary = index.get(os.path.basename(path)) if sealed else None
+        if summary is not None and not may_contain(summary, tournament, since, until):
+            continue
+        opener = gzip.open if sealed else open
+        with opener(path, "rb") as f:
+            for line in f:
+                if needle is not None and needle not in line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # torn line from a crash mid-write
+                if tournament is not None and event.get("tournament_id") != tournament:
+                    continue
+                ts = event.get("timestamp") or ""
+                if since is not None and ts < since:
+                    continue
+                if until is not None and ts >= until:
+                    continue
+                yield event
+
+
+class EventLog:
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.index = load_index(directory)
+        self._recover()
+
+    def append(self, events):
+        """Append a batch of events and fsync it. Returns once it is on disk."""
+        data = b"".join(json.dumps(event, separators=(",", ":")).encode() + b"\n" for event in events)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        for event in events:
+            add_to_summary(self._summary, event)
+        if self._file.tell() >= self.max_segment_bytes:
+            self._rotate()
+
+    def close(self):
+        self._file.close()
+
+    def _open_active(self, seq):
+        self._seq = seq
+        self._path = segment_path(self.directory, seq, sealed=False)
+        self._summary = summarize(self._path, sealed=False) if os.path.exists(self._path) else new_summary()
+        self._file = open(self._path, "ab")
+
+    def _rotate(self):
+        self._file.close()
+        self._seal(self._seq, self._summary)
+        self._open_active(self._seq + 1)
+
+    def _seal(self, seq, summary):
+        raw = segment_path(self.directory, seq, sealed=False)
+        sealed = segment_path(self.directory, seq, sealed=True)
+        with open(raw, "rb") as src, gzip.open(sealed + ".tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(sealed + ".tmp", sealed)
+        self.index["segments"][os.path.basename(sealed)] = summary
+        save_index(self.directory, self.index)
+        os.remove(raw)
+
+    def _recover(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+
+        segments = list_segments(self.directory)
+        sealed = {seq for seq, _, is_sealed in segments if is_sealed}
+        open_segments = []
+        for seq, path, is_sealed in segments:
+            if is_sealed:
+                name = os.path.basename(path)
+                if name not in self.index["segments"]:
+                    self.index["segments"][name] = summarize(path, sealed=True)
+            elif seq in sealed:
+                os.remove(path)  # rotation finished compressing but not cleaning up
+            else:
+                open_segments.append((seq, path))
+        save_index(self.directory, self.index)
+
+        # Normally at most one segment is open; seal any older ones
+        for seq, path in open_segments[:-1]:
+            self._seal(seq, summarize(path, sealed=False))
+
+        if not open_segments:
+            self._open_active(max([seq for seq, _, _ in segments], default=0) + 1)
+            return
+
+        seq, path = open_segments[-1]
+        with open(path, "rb+") as f:
+            data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)  # drop a torn last line
+        self._open_active(seq)
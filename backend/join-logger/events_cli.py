@@ -0,0 +1,101 @@
+# events_cli.py
+"""Query and replay the stored player event log.
+
+    python events_cli.py query --tournament T1 --since 2025-03-01 --until 2025-04-01
+    python events_cli.py query --tournament T1 --count
+    python events_cli.py replay --tournament T1 --queue player_events_replay
+    python events_cli.py segments
+
+query prints matching events as JSONL. replay republishes them, in their
+original order, to a RabbitMQ queue. --since is inclusive and --until is
+exclusive; both are compared with the events' ISO timestamps, so a date
+prefix such as 2025-03-01 works.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from event_log import iter_events, list_segments, load_index
+
+
+def query(args):
+    events = iter_events(args.dir, args.tournament, args.since, args.until)
+    start = time.perf_counter()
+    count = 0
+    for event in events:
+        count += 1
+        if not args.count:
+            sys.stdout.write(json.dumps(event) + "\n")
+        if args.limit and count >= args.limit:
+            break
+    if args.count:
+        print(count)
+    print(f"{count} events in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+def replay(args):
+    import pika
+
+    connection = pika.BlockingConnection(pika.ConnectionParameters(args.host))
+    channel = connection.channel()
+    channel.confirm_delivery()
+    channel.queue_declare(queue=args.queue, durable=True)
+    count = 0
+    for event in iter_events(args.dir, args.tournament, args.since, args.until):
+        channel.basic_publish(
+            exchange='',
+            routing_key=args.queue,
+            body=json.dumps(event),
+            properties=pika.BasicProperties(delivery_mode=2)
+        )
+        count += 1
+    connection.close()
+    print(f"✅ Replayed {count} events to {args.queue}")
+
+
+def segments(args):
+    index = load_index(args.dir)["segments"]
+    for _, path, sealed in list_segments(args.dir):
+        name = os.path.basename(path)
+        summary = index.get(name)
+        size = os.path.getsize(path)
+        if summary:
+            print(f"{name}  {size:>12} bytes  {summary['count']:>9} events  "
+                  f"{len(summary['tournaments']):>5} tournaments  {summary['minTs']} .. {summary['maxTs']}")
+        else:
+            print(f"{name}  {size:>12} bytes  (active)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and replay stored player events")
+    parser.add_argument("--dir", default=os.environ.get("EVENT_LOG_DIR", "/data/events"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(command):
+        command.add_argument("--tournament")
+        command.add_argument("--since", help="inclusive ISO timestamp or prefix")
+        command.add_argument("--until", help="exclusive ISO timestamp or prefix")
+
+    query_parser = commands.add_parser("query", help="print matching events as JSONL")
+    add_filters(query_parser)
+    query_parser.add_argument("--limit", type=int, default=0)
+    query_parser.add_argument("--count", action="store_true", help="only print how many match")
+    query_parser.set_defaults(func=query)
+
+    replay_parser = commands.add_parser("replay", help="republish matching events to a queue")
+    add_filters(replay_parser)
+    replay_parser.add_argument("--queue", required=True)
+    replay_parser.add_argument("--host", default="rabbitmq")
+    replay_parser.set_defaults(func=replay)
+
+    segments_parser = commands.add_parser("segments", help="list log segments and their index entries")
+    segments_parser.set_defaults(func=segments)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
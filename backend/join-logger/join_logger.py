@@ -1,14 +1,61 @@
-import pika
 import json
+import os
+import time
+
+import pika
+from pika.exceptions import AMQPError
+
+from event_log import EventLog
+
+QUEUE = "player_events"
+PREFETCH = int(os.environ.get("PREFETCH", 500))        # unacked messages the broker may send us
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", 200))    # events per append + ack
+BATCH_WAIT = float(os.environ.get("BATCH_WAIT", 1.0))  # seconds before a partial batch is flushed
+EVENT_LOG_DIR = os.environ.get("EVENT_LOG_DIR", "/data/events")
+SEGMENT_BYTES = int(os.environ.get("EVENT_LOG_SEGMENT_MB", 64)) * 1024 * 1024
+
+
+def consume(channel, event_log):
+    # Messages are acked only after their batch is fsynced, so a crash means
+    # redelivery (possible duplicates in the log), never a lost event.
+    batch = []
+    last_tag = None
+    first_at = None
+    for method, properties, body in channel.consume(QUEUE, inactivity_timeout=BATCH_WAIT):
+        if method is not None:
+            try:
+                batch.append(json.loads(body))
+            except ValueError:
+                print(f"⚠️  Skipping malformed event: {body[:200]!r}")
+            last_tag = method.delivery_tag
+            first_at = first_at or time.monotonic()
+
+        if last_tag is None:
+            continue
+        if len(batch) >= BATCH_SIZE or method is None or time.monotonic() - first_at >= BATCH_WAIT:
+            if batch:
+                event_log.append(batch)
+                print(f"📥 LOG: stored {len(batch)} player events")
+            channel.basic_ack(delivery_tag=last_tag, multiple=True)
+            batch, last_tag, first_at = [], None, None
+
+
+def main():
+    event_log = EventLog(EVENT_LOG_DIR, SEGMENT_BYTES)
+    while True:
+        try:
+            connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq', heartbeat=30))
+            channel = connection.channel()
+            channel.queue_declare(queue=QUEUE, durable=True)
+            channel.basic_qos(prefetch_count=PREFETCH)
 
-def callback(ch, method, properties, body):
-    message = json.loads(body)
-    print(f"📥 LOG: Player {message['player_id']} joined Team {message['team_id']} in Tournament {message['tournament_id']} at {message['timestamp']}")
+            print("🔁 join_logger is listening for player events...")
+            consume(channel, event_log)
+        except AMQPError as e:
+            # Unacked messages go back to the queue and are redelivered
+            print("❌ RabbitMQ connection lost, reconnecting in 5s:", str(e))
+            time.sleep(5)
 
-connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-channel = connection.channel()
-channel.queue_declare(queue='player_events', durable=True)
-channel.basic_consume(queue='player_events', on_message_callback=callback, auto_ack=True)
 
-print("🔁 join_logger is listening for player events...")
-channel.start_consuming()
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,71 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, Response, request, jsonify, current_app
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
+from google.api_core.exceptions import GoogleAPICallError
+from cache import LRUTTLCache
+import storage
+import hashlib
+import os
+import metrics
+import tracing
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
+api = Blueprint("match", __name__)
 
-# Initialize Firebase
-cred = credentials.Certificate("/app/serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Firestore, or a local store when STORAGE_BACKEND is set (see storage.py).
+# Built on first use in each worker; create_app() starts it warming up.
+db = storage.lazy_client()
 
 match_ref = db.collection("matches")
 
 tournament_ref = db.collection("tournaments")
 team_ref = db.collection("teams")
 
-# Create a new match
-@app.route("/match", methods=["POST"])
-def create_match():
-    data = request.json
+# Firestore allows at most 500 writes per batch
+BATCH_LIMIT = 500
+
+# matchVersions/<tournamentId> is bumped in the same write as every match
+# change, so it says whether a tournament's cached match list is current.
+match_versions_ref = db.collection("matchVersions")
+
+MATCHES_PAGE_MAX = 200
+
+# Entries are keyed by match version, so a write makes the old pages
+# unreachable right away; the TTL only bounds how long dead pages linger.
+matches_cache = LRUTTLCache(
+    maxsize=int(os.environ.get("MATCHES_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("MATCHES_CACHE_TTL", 300))
+)
+
+# Helper: Record that a tournament's matches changed (write batch or transaction)
+def bump_match_version(writer, tournament_id):
+    writer.set(match_versions_ref.document(tournament_id), {
+        "version": firestore.Increment(1),
+        "updatedAt": firestore.SERVER_TIMESTAMP
+    }, merge=True)
+
+def match_version(tournament_id):
+    snapshot = match_versions_ref.document(tournament_id).get()
+    return snapshot.to_dict().get("version", 0) if snapshot.exists else 0
+
+# Helper: Validate a create-match payload, returns (match document, error)
+def build_match_doc(data):
     tournament_id = data.get("tournamentId")
     team_a = data.get("teamAId")
     team_b = data.get("teamBId")
     scheduled_time = data.get("scheduledTime")
     status = data.get("status")
     roundNumber = data.get("roundNumber")
-    
 
     if not all([tournament_id, team_a, team_b, scheduled_time, status, roundNumber]):
-        return jsonify({"error": "Missing required fields"}), 400
+        return None, "Missing required fields"
 
-    match_doc = match_ref.add({
+    # Stored as an int so round filters and ordering see one type
+    try:
+        roundNumber = int(roundNumber)
+    except (TypeError, ValueError):
+        return None, "roundNumber must be an integer"
+
+    return {
         "tournamentId": tournament_id,
         "teamAId": team_a,
         "teamBId": team_b,
@@ -41,12 +74,74 @@ def create_match():
         "score": {"teamA": 0, "teamB": 0},
         "status": status,
         "roundNumber": roundNumber
-    })
+    }, None
+
+# Create a new match
+@api.route("/match", methods=["POST"])
+def create_match():
+    match_data, error = build_match_doc(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+
+    doc_ref = match_ref.document()
+    batch = db.batch()
+    batch.set(doc_ref, match_data)
+    bump_match_version(batch, match_data["tournamentId"])
+    batch.commit()
 
-    return jsonify({"message": "Match created successfully", "matchId": match_doc[1].id}), 201
+    return jsonify({"message": "Match created successfully", "matchId": doc_ref.id}), 201
+
+# Create many matches at once (e.g. a whole round) with batched writes
+@api.route("/matches/batch", methods=["POST"])
+def create_matches_batch():
+    data = request.json or {}
+    matches = data.get("matches")
+    if not isinstance(matches, list) or not matches:
+        return jsonify({"error": "matches must be a non-empty list"}), 400
+
+    match_docs = []
+    for i, match in enumerate(matches):
+        match_data, error = build_match_doc(match if isinstance(match, dict) else {})
+        if error:
+            return jsonify({"error": f"Match {i}: {error}"}), 400
+        match_docs.append(match_data)
+
+    match_ids = []
+    written = set()  # tournaments with at least one match committed
+    error = None
+    try:
+        for start in range(0, len(match_docs), BATCH_LIMIT):
+            chunk = match_docs[start:start + BATCH_LIMIT]
+            batch = db.batch()
+            chunk_ids = []
+            for match_data in chunk:
+                doc_ref = match_ref.document()
+                batch.set(doc_ref, match_data)
+                chunk_ids.append(doc_ref.id)
+            batch.commit()
+            match_ids.extend(chunk_ids)
+            written.update(match_data["tournamentId"] for match_data in chunk)
+    except GoogleAPICallError as e:
+        error = f"Stopped after {len(match_ids)} of {len(match_docs)} matches: {e}"
+
+    # Bump versions only after the matches are written, including after a
+    # partial failure, so cached match lists never hide committed matches
+    tournament_ids = sorted(written)
+    try:
+        for start in range(0, len(tournament_ids), BATCH_LIMIT):
+            batch = db.batch()
+            for tournament_id in tournament_ids[start:start + BATCH_LIMIT]:
+                bump_match_version(batch, tournament_id)
+            batch.commit()
+    except GoogleAPICallError as e:
+        error = error or f"Matches written but match versions not updated: {e}"
+
+    if error:
+        return jsonify({"error": error, "matchIds": match_ids}), 500
+    return jsonify({"message": f"{len(match_ids)} matches created successfully", "matchIds": match_ids}), 201
 
 # Get match details
-@app.route("/match/<match_id>", methods=["GET"])
+@api.route("/match/<match_id>", methods=["GET"])
 def get_match(match_id):
     match_doc = match_ref.document(match_id).get()
     if match_doc.exists:
@@ -54,7 +149,7 @@ def get_match(match_id):
     return jsonify({"error": "Match not found"}), 404
 
 # Update match result
-@app.route("/match/<match_id>/result", methods=["PUT"])
+@api.route("/match/<match_id>/result", methods=["PUT"])
 def update_match_result(match_id):
     data = request.json
     result = data.get("result")  # "teamA won", "teamB won", "draw"
@@ -68,7 +163,10 @@ def update_match_result(match_id):
     if not match_data:
         return jsonify({"error": "Match not found"}), 404
 
-    match_doc.update({"result": result, "score": score, "status": "completed"})
+    batch = db.batch()
+    batch.update(match_doc, {"result": result, "score": score, "status": "completed"})
+    bump_match_version(batch, match_data["tournamentId"])
+    batch.commit()
 
     # Update team stats
     # update_team_stats(match_data["tournamentId"], match_data["teamAId"], match_data["teamBId"], result)
@@ -76,7 +174,7 @@ def update_match_result(match_id):
     return jsonify({"message": "Match result updated successfully"}), 200
 
 
-@app.route("/match/<match_id>/finalize", methods=["PUT"])
+@api.route("/match/<match_id>/finalize", methods=["PUT"])
 def finalize_match(match_id):
     data = request.json
     result = data.get("result")
@@ -86,17 +184,100 @@ def finalize_match(match_id):
         return jsonify({"error": "Missing result or score"}), 400
 
     match_doc = match_ref.document(match_id)
-    if not match_doc.get().exists:
+    snapshot = match_doc.get()
+    if not snapshot.exists:
         return jsonify({"error": "Match not found"}), 404
 
-    match_doc.update({
+    batch = db.batch()
+    batch.update(match_doc, {
         "result": result,
         "score": score,
         "status": "completed"
     })
+    bump_match_version(batch, snapshot.to_dict()["tournamentId"])
+    batch.commit()
 
     return jsonify({"message": "Match updated successfully"}), 200
 
 
+# Helper: One page of a tournament's matches, with team names from one batched read
+def load_tournament_matches(tournament_id, round_number, offset, limit):
+    query = match_ref.where("tournamentId", "==", tournament_id)
+    if round_number is not None:
+        query = query.where("roundNumber", "==", round_number)
+    total = query.count().get()[0][0].value
+    ordered = query.order_by("roundNumber").order_by("scheduledTime")
+    page = [dict(doc.to_dict(), id=doc.id) for doc in ordered.offset(offset).limit(limit).stream()]
+
+    team_ids = {m[side] for m in page for side in ("teamAId", "teamBId") if m.get(side)}
+    refs = [tournament_ref.document(tournament_id)] + [team_ref.document(team_id) for team_id in team_ids]
+    tournament_name = ""
+    team_names = {}
+    for doc in db.get_all(refs, field_paths=["name", "tournamentName"]):
+        if not doc.exists:
+            continue
+        data = doc.to_dict()
+        if doc.reference.parent.id == "tournaments":
+            tournament_name = data.get("tournamentName") or data.get("name", "")
+        else:
+            team_names[doc.id] = data.get("name")
+
+    for match in page:
+        match["teamAName"] = team_names.get(match.get("teamAId")) or match.get("teamAId")
+        match["teamBName"] = team_names.get(match.get("teamBId")) or match.get("teamBId")
+
+    next_offset = offset + limit if offset + limit < total else None
+    return {
+        "tournamentId": tournament_id,
+        "tournamentName": tournament_name,
+        "matches": page,
+        "total": total,
+        "nextOffset": next_offset
+    }
+
+# Get a tournament's matches with team names, optionally for one round
+@api.route("/tournament/<tournament_id>/matches", methods=["GET"])
+def get_tournament_matches(tournament_id):
+    try:
+        round_param = request.args.get("round")
+        round_number = int(round_param) if round_param else None
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = min(max(int(request.args.get("limit", MATCHES_PAGE_MAX)), 1), MATCHES_PAGE_MAX)
+    except ValueError:
+        return jsonify({"error": "round, offset and limit must be integers"}), 400
+
+    version = match_version(tournament_id)
+    key = (tournament_id, round_number, offset, limit, version)
+    cached = matches_cache.get(key)
+    if cached is None:
+        body = current_app.json.dumps(load_tournament_matches(tournament_id, round_number, offset, limit))
+        cached = (body, hashlib.sha1(body.encode()).hexdigest())
+        matches_cache.set(key, cached, matches_cache.version(key))
+
+    body, etag = cached
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+# Cache hit/miss counters for the tournament match lists
+@api.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(matches_cache.stats()), 200
+
+
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    CORS(app)
+    metrics.instrument_flask(app, "match-service")  # GET /metrics
+    tracing.instrument_flask(app, "match-service")  # traceparent in and out
+    db.warm_up()  # open the Firestore channel in the background
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", port=5004, debug=True)
@@ -1,12 +1,33 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import asyncio
+from typing import List, Optional
+import os
 from bot_functions import team_assignment
 from bot_functions import new_dispute
-from bot_functions import match_making
 from bot_functions import resolution_result
+from bot_functions import match_line, send_channel_message
+from notifier import Notifier
+import metrics
+import tracing
 
 app = FastAPI()
+metrics.instrument_fastapi(app, "notification-service")  # GET /metrics
+tracing.instrument_fastapi(app, "notification-service")  # traceparent in and out
+
+# Every notification goes through one bounded queue. Limits are
+# (requests, seconds) per route, kept under Discord's per-route limits.
+notifier = Notifier(
+    limits={
+        "channel": (int(os.getenv("NOTIFY_CHANNEL_LIMIT", 5)), 5.0),
+        "dm": (int(os.getenv("NOTIFY_DM_LIMIT", 5)), 5.0),
+    },
+    max_queue=int(os.getenv("NOTIFY_QUEUE_SIZE", 1000)),
+    workers=int(os.getenv("NOTIFY_WORKERS", 4)),
+)
+
+def queue_full():
+    return JSONResponse(status_code=503, content={"error": "Notification queue is full, try again later"})
 
 #notify player request
 class TeamAssignRequest(BaseModel):
@@ -15,11 +36,9 @@ class TeamAssignRequest(BaseModel):
 
 @app.post("/assign_team")
 async def assign_team(request: TeamAssignRequest):
-    try:
-        asyncio.create_task(team_assignment(request.player_name, request.team_id))
-        return {"message": "Player notification scheduled"}
-    except Exception as e:
-        return {"error": str(e)}    
+    if not notifier.submit("dm", team_assignment, request.player_name, request.team_id):
+        return queue_full()
+    return {"message": "Player notification scheduled"}
 
 # Notify Moderator Request doing by Ranen
 class NotifyModeratorRequest(BaseModel):
@@ -28,13 +47,9 @@ class NotifyModeratorRequest(BaseModel):
 
 @app.post("/notify_moderator")
 async def notify_moderator(request: NotifyModeratorRequest):
-    try:
-        # Schedule the async task to notify the moderator.
-        # You could also await new_dispute(req.matchId, req.raisedBy) if you want to block until complete.
-        asyncio.create_task(new_dispute(request.matchId, request.raisedBy))
-        return {"message": "Moderator notification scheduled."}
-    except Exception as e:
-        return {"error": str(e)}
+    if not notifier.submit("dm", new_dispute, request.matchId, request.raisedBy):
+        return queue_full()
+    return {"message": "Moderator notification scheduled."}
 
 # display match schedule   
 class displayMatchRequest(BaseModel):
@@ -45,11 +60,35 @@ class displayMatchRequest(BaseModel):
 
 @app.post("/display_match")
 async def display_match(request: displayMatchRequest):
-    try:
-        asyncio.create_task(match_making(request.tournament_id, request.team_a, request.team_b, request.scheduled_time))
-        return {"message": "Display Match scheduled"}
-    except Exception as e:
-        return {"error": str(e)}
+    # Coalesces with other matches of the tournament still waiting to be sent
+    line = match_line(request.team_a, request.team_b, request.scheduled_time)
+    if not notifier.submit_lines("channel", ("matches", request.tournament_id, None),
+                                 f"📅 Upcoming matches for Tournament {request.tournament_id}:",
+                                 [line], send_channel_message):
+        return queue_full()
+    return {"message": "Display Match scheduled"}
+
+# display every match of a round at once
+class MatchEntry(BaseModel):
+    team_a: str
+    team_b: str
+    scheduled_time: str
+
+class displayMatchesRequest(BaseModel):
+    tournament_id: str
+    round_number: Optional[int] = None
+    matches: List[MatchEntry]
+
+@app.post("/display_matches")
+async def display_matches(request: displayMatchesRequest):
+    header = f"📅 Upcoming matches for Tournament {request.tournament_id}"
+    if request.round_number is not None:
+        header += f", round {request.round_number}"
+    lines = [match_line(m.team_a, m.team_b, m.scheduled_time) for m in request.matches]
+    if not notifier.submit_lines("channel", ("matches", request.tournament_id, request.round_number),
+                                 header + ":", lines, send_channel_message):
+        return queue_full()
+    return {"message": f"{len(lines)} matches scheduled for display"}
 
 # notify dispute outcome   
 class disputeOutcomeRequest(BaseModel):
@@ -59,10 +98,11 @@ class disputeOutcomeRequest(BaseModel):
 
 @app.post("/dispute_outcome")
 async def dispute_outcome(request: disputeOutcomeRequest):
-    try:
-        asyncio.create_task(resolution_result(request.player_name, request.match_id, request.result))
-        return {"message": "Dispute Outcome scheduled"}
-    except Exception as e:
-        return {"error": str(e)}
-
+    if not notifier.submit("dm", resolution_result, request.player_name, request.match_id, request.result):
+        return queue_full()
+    return {"message": "Dispute Outcome scheduled"}
 
+# Queue depth, delivery counters and submit-to-send latency
+@app.get("/notifications/stats")
+async def notification_stats():
+    return notifier.stats()
@@ -1,6 +1,7 @@
 import discord
 import os
 from dotenv import load_dotenv
+from member_index import MemberIndex
 
 load_dotenv()
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
@@ -13,23 +14,56 @@ intents.guilds = True
 client = discord.Client(intents=intents)
 ready_event = False
 
+member_index = MemberIndex()
+
+async def build_member_index():
+    guild = client.get_guild(GUILD_ID)
+    if not guild:
+        print("Guild not found")
+        return
+    if not guild.chunked:
+        await guild.chunk()
+    member_index.build(guild.members)
+    print(f"📇 Indexed {len(member_index)} guild members")
+
 @client.event
 async def on_ready():
     global ready_event
     print(f"✅ Bot is ready. Logged in as {client.user}")
+    await build_member_index()
     ready_event = True
 
-async def get_user_id_from_username(username):
+# Keep the member index current instead of re-chunking the guild per DM
+@client.event
+async def on_member_join(member):
+    if member.guild.id == GUILD_ID:
+        member_index.add(member)
+
+@client.event
+async def on_member_update(before, after):
+    if after.guild.id == GUILD_ID:
+        member_index.add(after)
+
+@client.event
+async def on_user_update(before, after):
+    # Username / global display name changes arrive as user events
     guild = client.get_guild(GUILD_ID)
-    if not guild:
-        print("Guild not found")
-        return None
-    await guild.chunk()
-    for member in guild.members:
-        if member.name == username or member.display_name == username:
-            return member.id
-    print(f"User {username} not found in guild")
-    return None
+    member = guild.get_member(after.id) if guild else None
+    if member:
+        member_index.add(member)
+
+@client.event
+async def on_member_remove(member):
+    if member.guild.id == GUILD_ID:
+        member_index.remove(member.id)
+
+async def get_user_id_from_username(username):
+    if not member_index.ready:
+        await build_member_index()
+    user_id = member_index.lookup(username)
+    if user_id is None:
+        print(f"User {username} not found in guild")
+    return user_id
 
 async def send_private_message_by_username(username, message):
     user_id = await get_user_id_from_username(username)
@@ -47,14 +81,16 @@ async def team_assignment(player_name, team_id):
     await send_private_message_by_username(username, message)
 
 # Secnario 2: Match making
-async def match_making(tournament_id, team_a, team_b, scheduled_time):
-    print(f'Logged in as {client.user}')
-    channel_id = int(os.getenv('CHANNEL_ID'))  
+def match_line(team_a, team_b, scheduled_time):
+    return f"• Team {team_a} vs Team {team_b} on {scheduled_time}"
+
+async def send_channel_message(message):
+    channel_id = int(os.getenv('CHANNEL_ID'))
     channel = client.get_channel(channel_id)
-    # Send a message to the channel in Scenario 2: Match making
-    if channel:
-        message = f"The upcoming match for Team {team_a} and Team {team_b} for Tournament {tournament_id} is on {scheduled_time}."
-        await channel.send(message)
+    if not channel:
+        # Usually the bot is not ready yet; raising lets the notifier retry
+        raise RuntimeError(f"Channel {channel_id} not available")
+    await channel.send(message)
 
 #scenario 3: notify moderator
 async def new_dispute(match_id, raised_by):
@@ -0,0 +1,54 @@
+# member_index.py
+"""In-memory username -> Discord member ID index for one guild.
+
+Built once from the member list when the bot is ready, then kept current
+from member join, update and remove events, so a DM lookup is a dict hit
+instead of a guild chunk plus a walk over every member. ``name`` (the
+account username) is unique; ``display_name`` is not, so it maps to a set
+and is only consulted when no username matches.
+"""
+
+
+class MemberIndex:
+    def __init__(self):
+        self.ready = False
+        self._by_name = {}
+        self._by_display_name = {}
+        self._keys = {}  # member id -> (name, display_name) currently indexed
+
+    def build(self, members):
+        self._by_name.clear()
+        self._by_display_name.clear()
+        self._keys.clear()
+        for member in members:
+            self.add(member)
+        self.ready = True
+
+    def add(self, member):
+        self.remove(member.id)
+        self._keys[member.id] = (member.name, member.display_name)
+        self._by_name[member.name] = member.id
+        self._by_display_name.setdefault(member.display_name, set()).add(member.id)
+
+    def remove(self, member_id):
+        keys = self._keys.pop(member_id, None)
+        if keys is None:
+            return
+        name, display_name = keys
+        if self._by_name.get(name) == member_id:
+            del self._by_name[name]
+        ids = self._by_display_name.get(display_name)
+        if ids is not None:
+            ids.discard(member_id)
+            if not ids:
+                del self._by_display_name[display_name]
+
+    def lookup(self, username):
+        member_id = self._by_name.get(username)
+        if member_id is not None:
+            return member_id
+        ids = self._by_display_name.get(username)
+        return next(iter(ids)) if ids else None
+
+    def __len__(self):
+        return len(self._keys)
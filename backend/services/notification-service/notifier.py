@@ -0,0 +1,169 @@
+# notifier.py
+"""Bounded, rate-limited queue for outgoing Discord notifications.
+
+Endpoints submit jobs instead of firing untracked tasks. A fixed pool of
+workers drains the queue, waits on a sliding-window limiter for the job's
+route ("channel", "dm") so a burst never exceeds what Discord allows, and
+retries failed sends with backoff (never sooner than a 429's retry_after). When the queue is full, ``submit``
+returns False and the caller can answer 503.
+
+Channel announcements coalesce: lines submitted under the same key (e.g.
+one tournament round) are appended to the message that is still waiting
+in the queue, up to Discord's 2000 character limit, so a 200-match round
+goes out as a handful of messages.
+"""
+import asyncio
+import time
+from collections import deque
+
+MAX_MESSAGE_CHARS = 2000
+MAX_ATTEMPTS = 3
+
+
+class RateLimiter:
+    """Allow at most ``limit`` calls in any ``period`` second window."""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self._calls = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._calls and self._calls[0] <= now - self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.limit:
+                    self._calls.append(now)
+                    return
+                await asyncio.sleep(self._calls[0] + self.period - now)
+
+
+class Job:
+    def __init__(self, route, run, key=None, header=None, lines=None):
+        self.route = route
+        self.run = run  # async callable; coalesced jobs get the rendered text
+        self.key = key
+        self.header = header
+        self.lines = lines
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+    def text(self):
+        return "\n".join([self.header] + self.lines if self.header else self.lines)
+
+
+class Notifier:
+    def __init__(self, limits, max_queue=1000, workers=4, retry_delay=1.0):
+        self.retry_delay = retry_delay
+        self.limiters = {route: RateLimiter(limit, period) for route, (limit, period) in limits.items()}
+        self.max_queue = max_queue
+        self.workers = workers
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._latencies = deque(maxlen=1000)  # seconds from submit to sent
+        self._queue = None
+        self._open = {}  # coalescing key -> queued job that can still take lines
+        self._retries_pending = 0
+        self._tasks = []
+
+    def submit(self, route, fn, *args):
+        """Queue ``fn(*args)``. False if the queue is full."""
+        return self._put(Job(route, lambda: fn(*args)))
+
+    def submit_lines(self, route, key, header, lines, send):
+        """Queue lines for ``send(text)``, merged into pending messages for ``key``."""
+        lines = [line[:MAX_MESSAGE_CHARS - len(header or "") - 1] for line in lines]
+        job = self._open.get(key)
+        for line in lines:
+            if job is not None and len(job.text()) + 1 + len(line) <= MAX_MESSAGE_CHARS:
+                job.lines.append(line)
+                self.coalesced += 1
+                continue
+            job = Job(route, send, key=key, header=header, lines=[line])
+            if not self._put(job):
+                self._open.pop(key, None)
+                return False
+            self._open[key] = job
+        return True
+
+    async def drain(self):
+        """Wait until every queued job, including scheduled retries, is done."""
+        self._start()
+        while True:
+            await self._queue.join()
+            if not self._retries_pending:
+                return
+            await asyncio.sleep(0.05)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000, 1) if latencies else None
+
+        return {
+            "queueDepth": self._queue.qsize() if self._queue else 0,
+            "maxQueue": self.max_queue,
+            "workers": self.workers,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "latencyMs": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)}
+        }
+
+    # Workers start on first use, inside the running event loop
+    def _start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _put(self, job):
+        self._start()
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.limiters[job.route].acquire()
+                if job.lines is None:
+                    await job.run()
+                else:
+                    if self._open.get(job.key) is job:
+                        del self._open[job.key]  # no more lines once it is being sent
+                    await job.run(job.text())
+                self.sent += 1
+                self._latencies.append(time.monotonic() - job.enqueued_at)
+            except Exception as e:
+                job.attempts += 1
+                if job.attempts < MAX_ATTEMPTS:
+                    self.retried += 1
+                    self._retries_pending += 1
+                    delay = self.retry_delay * 2 ** (job.attempts - 1)
+                    # discord.RateLimited carries how long Discord wants us to wait
+                    delay = max(delay, getattr(e, "retry_after", None) or 0)
+                    print(f"⚠️  Notification failed ({e}), retrying in {delay}s")
+                    asyncio.get_running_loop().call_later(delay, self._retry, job)
+                else:
+                    self.failed += 1
+                    print(f"❌ Notification failed after {job.attempts} attempts: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _retry(self, job):
+        self._retries_pending -= 1
+        self._put(job)
@@ -1,19 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import auth
+import auth_cache
+import storage
+import metrics
+import tracing
 
-# Initialize Flask App
-app = Flask(__name__)
-CORS(app)
+api = Blueprint("player", __name__)
 
-# Load Firebase credentials
-cred = credentials.Certificate("/app/serviceAccountKey.json")  # Ensure correct path 
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Firestore, or a local store when STORAGE_BACKEND is set (see storage.py).
+# Built on first use in each worker; create_app() starts it warming up.
+db = storage.lazy_client()
 
 # Route: Register a Player (Auto-registration included)
-@app.route("/register", methods=["POST"])
+@api.route("/register", methods=["POST"])
 def register():
     try:
         data = request.get_json()
@@ -28,7 +28,8 @@ def register():
         # Create the user in Firebase Authentication
         user = auth.create_user(
             email=email,
-            password=password
+            password=password,
+            app=storage.firebase_app()
         )
 
         # Add new player data to Firestore
@@ -47,7 +48,7 @@ def register():
         return jsonify({"error": str(e)}), 400
 
 # Route: Login Player
-@app.route("/login", methods=["POST"])
+@api.route("/login", methods=["POST"])
 def login():
     try:
         data = request.get_json()
@@ -55,7 +56,7 @@ def login():
         password = data["password"]
 
         # Authenticate user with Firebase Authentication
-        user = auth.get_user_by_email(email)
+        user = auth.get_user_by_email(email, app=storage.firebase_app())
 
         # Check if player exists in Firestore
         player_ref = db.collection("players").document(user.uid)
@@ -74,7 +75,7 @@ def login():
         return jsonify({"error": str(e)}), 400
 
 # Route: Get Player Profile
-@app.route("/player/<playerId>", methods=["GET"])
+@api.route("/player/<playerId>", methods=["GET"])
 def get_player(playerId):
     try:
         player_ref = db.collection("players").document(playerId)
@@ -87,7 +88,7 @@ def get_player(playerId):
         return jsonify({"error": str(e)}), 400
 
 # Decodes the token, returns userId and username
-@app.route("/player/profile", methods=["GET"])
+@api.route("/player/profile", methods=["GET"])
 def get_player_profile():
     try:
         # Get token from header
@@ -97,7 +98,7 @@ def get_player_profile():
         id_token = auth_header.split(" ")[1]
 
         # Decode token
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = auth_cache.verify_id_token(id_token)
         uid = decoded_token["uid"]
 
         # Look up player in Firestore
@@ -117,8 +118,13 @@ def get_player_profile():
         return jsonify({"error": str(e)}), 400
 
 
+# Hit/miss counters for the verified-token cache
+@api.route("/auth/cache/stats", methods=["GET"])
+def get_auth_cache_stats():
+    return jsonify(auth_cache.token_cache.stats()), 200
+
 # Checks if this player is already in a team for that tournament
-@app.route("/player/my_teams", methods=["GET"])
+@api.route("/player/my_teams", methods=["GET"])
 def get_user_teams_for_tournament():
     try:
         tournament_id = request.args.get("tournamentId")
@@ -130,7 +136,7 @@ def get_user_teams_for_tournament():
             return jsonify({"error": "Missing or invalid Authorization header"}), 401
         id_token = auth_header.split(" ")[1]
 
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = auth_cache.verify_id_token(id_token)
         uid = decoded_token["uid"]
 
         # Look in Firestore for any teams containing this player
@@ -152,5 +158,16 @@ def get_user_teams_for_tournament():
         return jsonify({"error": str(e)}), 400
     
 # Run Flask App
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    CORS(app)
+    metrics.instrument_flask(app, "player-service")  # GET /metrics
+    tracing.instrument_flask(app, "player-service")  # traceparent in and out
+    db.warm_up()  # open the Firestore channel in the background
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", debug=True, port=5001)
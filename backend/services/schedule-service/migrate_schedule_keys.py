@@ -0,0 +1,99 @@
+# migrate_schedule_keys.py
+"""Move schedule documents to deterministic "{tournamentId}_{round}" keys.
+
+Older schedules were created with auto-generated IDs, sometimes with the
+tournament stored as {tournamentId: name} instead of
+{"tournamentId": ..., "name": ...}. This copies each one to its new key,
+merging availability if a schedule for that round already exists there,
+and deletes the old document.
+
+Usage (inside the schedule-service container):
+    python migrate_schedule_keys.py            # dry run, prints the plan
+    python migrate_schedule_keys.py --apply    # perform the migration
+"""
+import argparse
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+BATCH_LIMIT = 500
+
+
+def tournament_info(schedule):
+    tournament = schedule.get("tournament") or {}
+    if "tournamentId" in tournament:
+        return tournament["tournamentId"], tournament.get("name", "")
+    if len(tournament) == 1:  # old {tournamentId: name} layout
+        return next(iter(tournament.items()))
+    return None, None
+
+
+def merge_availability(current, incoming):
+    merged = {day: list(team_ids) for day, team_ids in current.items()}
+    for day, team_ids in incoming.items():
+        day_teams = merged.setdefault(day, [])
+        day_teams.extend(t for t in team_ids if t not in day_teams)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-key schedule documents as {tournamentId}_{round}")
+    parser.add_argument("--apply", action="store_true", help="write changes (default is a dry run)")
+    parser.add_argument("--credentials", default="/app/serviceAccountKey.json")
+    args = parser.parse_args()
+
+    firebase_admin.initialize_app(credentials.Certificate(args.credentials))
+    db = firestore.client()
+    schedule_ref = db.collection("schedules")
+
+    # Collect everything first so duplicates for the same round get merged
+    targets = {}
+    old_ids = []
+    skipped = 0
+    for doc in schedule_ref.stream():
+        schedule = doc.to_dict()
+        tournament_id, name = tournament_info(schedule)
+        try:
+            round_number = int(schedule.get("roundNumber"))
+        except (TypeError, ValueError):
+            tournament_id = None
+        if not tournament_id:
+            print(f"⚠️  Skipping {doc.id}: no tournament or round")
+            skipped += 1
+            continue
+
+        key = f"{tournament_id}_{round_number}"
+        target = targets.setdefault(key, {
+            "tournament": {"tournamentId": tournament_id, "name": name},
+            "roundNumber": round_number,
+            "dateTime": schedule.get("dateTime", ""),
+            "teamAvailableDays": {},
+        })
+        target["teamAvailableDays"] = merge_availability(
+            target["teamAvailableDays"], schedule.get("teamAvailableDays", {}))
+        if doc.id != key:
+            old_ids.append(doc.id)
+            print(f"🔁 {doc.id} -> {key}")
+
+    print(f"{len(old_ids)} documents to move into {len(targets)} keys, {skipped} skipped")
+    if not args.apply:
+        print("Dry run only, re-run with --apply to migrate")
+        return
+
+    # Write every target before deleting anything, so a failure part way
+    # through never loses availability.
+    writes = [("set", key, data) for key, data in targets.items()]
+    writes += [("delete", doc_id, None) for doc_id in old_ids if doc_id not in targets]
+    for start in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        for op, doc_id, data in writes[start:start + BATCH_LIMIT]:
+            if op == "set":
+                batch.set(schedule_ref.document(doc_id), data)
+            else:
+                batch.delete(schedule_ref.document(doc_id))
+        batch.commit()
+    print("✅ Migration complete")
+
+
+if __name__ == "__main__":
+    main()
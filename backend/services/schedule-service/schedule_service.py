@@ -1,24 +1,46 @@
 # schedule_service.py
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1.field_path import FieldPath
+import storage
 import logging
+import metrics
+import tracing
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False  # Allow trailing slash variations
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+api = Blueprint("schedule", __name__)
 logging.basicConfig(level=logging.INFO)
 
-# Initialize Firebase – update the path accordingly
-cred = credentials.Certificate("/app/serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Firestore, or a local store when STORAGE_BACKEND is set (see storage.py).
+# Built on first use in each worker; create_app() starts it warming up.
+db = storage.lazy_client()
 
 schedule_ref = db.collection("schedules")
 
+WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Helper: Schedule documents are keyed "{tournamentId}_{round}"
+def schedule_key(tournament_id, round_number):
+    return f"{tournament_id}_{int(round_number)}"
+
+# Helper: Point-read the schedule document for one tournament round
+def find_schedule(tournament_id, round_number):
+    doc = schedule_ref.document(schedule_key(tournament_id, round_number)).get()
+    return doc if doc.exists else None
+
+# Helper: Encode {day: [teamIds]} as one bitmask per team over the round's days
+def compact_availability(team_availability):
+    days = [d for d in WEEK_DAYS if d in team_availability]
+    days += sorted(d for d in team_availability if d not in WEEK_DAYS)
+    masks = {}
+    for bit, day in enumerate(days):
+        for team_id in team_availability[day]:
+            masks[team_id] = masks.get(team_id, 0) | (1 << bit)
+    return {"days": days, "teams": masks}
+
 # --- Create Schedule Document ---
-@app.route("/schedule", methods=["POST", "OPTIONS"])
+@api.route("/schedule", methods=["POST", "OPTIONS"])
 def create_schedule():
     if request.method == "OPTIONS":
         return jsonify({}), 200
@@ -29,32 +51,32 @@ def create_schedule():
     tournament_name = data.get("tournamentName")
     if not tournament_id or round_number is None or not tournament_name:
         return jsonify({"error": "tournamentId, roundNumber, and tournamentName are required"}), 400
-
-    # Check if schedule already exists.
-    for doc in schedule_ref.where("roundNumber", "==", round_number).stream():
-        d = doc.to_dict()
-        if d.get("tournament") and tournament_id in d["tournament"]:
-            return jsonify({"error": "Schedule for this tournament and round already exists"}), 400
+    try:
+        round_number = int(round_number)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid roundNumber"}), 400
 
     schedule_doc = {
-        # "tournament": { tournament_id: tournament_name },
-
         "tournament": {
         "tournamentId": tournament_id,
         "name": tournament_name
         },
-
-
         "roundNumber": round_number,
         "dateTime": data.get("dateTime", ""),
         "teamAvailableDays": {}
     }
-    schedule_ref.add(schedule_doc)
+
+    # create() fails if the key is taken, so duplicates are rejected atomically
+    try:
+        schedule_ref.document(schedule_key(tournament_id, round_number)).create(schedule_doc)
+    except AlreadyExists:
+        return jsonify({"error": "Schedule for this tournament and round already exists"}), 400
+
     logging.info(f"Created schedule for tournament {tournament_id}, round {round_number}")
     return jsonify({"message": "Schedule created successfully"}), 201
 
 # --- Get Schedules for a Tournament ---
-# @app.route("/schedule/<tournament_id>", methods=["GET", "OPTIONS"])
+# @api.route("/schedule/<tournament_id>", methods=["GET", "OPTIONS"])
 # def get_schedules(tournament_id):
 #     if request.method == "OPTIONS":
 #         return jsonify({}), 200
@@ -68,24 +90,14 @@ def create_schedule():
 #         return jsonify({"error": "No schedules found for this tournament"}), 404
 #     return jsonify(schedules), 200
 
-@app.route("/schedule/by-tournament/<tournament_id>", methods=["GET"])
+@api.route("/schedule/by-tournament/<tournament_id>", methods=["GET"])
 def get_schedules_by_tournament_id(tournament_id):
     try:
-        schedules_ref = db.collection("schedules").stream()
         matching = []
-
-        for doc in schedules_ref:
+        for doc in schedule_ref.where("tournament.tournamentId", "==", tournament_id).stream():
             schedule = doc.to_dict()
             schedule["id"] = doc.id  # include document ID
-            logging.debug(f"Checking schedule: {schedule}")
-
-            # Updated structure with tournamentId inside a field
-            tournament_info = schedule.get("tournament", {})
-            found_id = tournament_info.get("tournamentId")
-
-            logging.debug(f"Comparing against: {found_id}")
-            if found_id == tournament_id:
-                matching.append(schedule)
+            matching.append(schedule)
 
         if not matching:
             return jsonify({"error": "No schedules found for this tournament"}), 404
@@ -96,8 +108,95 @@ def get_schedules_by_tournament_id(tournament_id):
         logging.error(f"Error fetching schedule: {e}")
         return jsonify({"error": "Internal error"}), 500
 
+# --- Get the Schedule for One Round ---
+@api.route("/schedule/<tournament_id>/<int:round_number>", methods=["GET"])
+def get_schedule(tournament_id, round_number):
+    try:
+        doc = find_schedule(tournament_id, round_number)
+        if not doc:
+            return jsonify({"error": "Schedule for that round not found"}), 404
+
+        schedule = doc.to_dict()
+        schedule["id"] = doc.id
+        return jsonify(schedule), 200
+
+    except Exception as e:
+        logging.error(f"Error fetching schedule: {e}")
+        return jsonify({"error": "Internal error"}), 500
+
+# --- Compact Availability for a Round ---
+# {"days": [...], "teams": {teamId: bitmask}} where bit i means days[i]
+@api.route("/schedule/<tournament_id>/<int:round_number>/compact", methods=["GET"])
+def get_compact_availability(tournament_id, round_number):
+    try:
+        doc = find_schedule(tournament_id, round_number)
+        if not doc:
+            return jsonify({"error": "Schedule for that round not found"}), 404
+
+        return jsonify(compact_availability(doc.to_dict().get("teamAvailableDays", {}))), 200
+
+    except Exception as e:
+        logging.error(f"Error fetching compact availability: {e}")
+        return jsonify({"error": "Internal error"}), 500
+
+# Compact availability for many rounds in one read, e.g. for bulk matchmaking.
+# Body: {"rounds": [{"tournamentId": ..., "roundNumber": ...}, ...]}
+@api.route("/schedules/compact", methods=["POST"])
+def get_compact_availability_batch():
+    try:
+        rounds = (request.get_json() or {}).get("rounds")
+        if not isinstance(rounds, list) or not rounds:
+            return jsonify({"error": "rounds must be a non-empty list"}), 400
+        try:
+            keys = [schedule_key(r["tournamentId"], r["roundNumber"]) for r in rounds]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Each round needs a tournamentId and an integer roundNumber"}), 400
+
+        found = {doc.id: doc.to_dict() for doc in db.get_all([schedule_ref.document(k) for k in set(keys)])
+                 if doc.exists}
+
+        schedules = []
+        for r, key in zip(rounds, keys):
+            entry = {"tournamentId": r["tournamentId"], "roundNumber": int(r["roundNumber"])}
+            if key in found:
+                entry.update(compact_availability(found[key].get("teamAvailableDays", {})))
+            else:
+                entry["error"] = "Schedule for that round not found"
+            schedules.append(entry)
+        return jsonify({"schedules": schedules}), 200
+
+    except Exception as e:
+        logging.error(f"Error fetching compact availability batch: {e}")
+        return jsonify({"error": "Internal error"}), 500
+
+# Helper: Field updates that add teams to days without reading the document.
+# ArrayUnion is applied server side, so concurrent submissions never overwrite
+# each other and each write only carries the days being changed.
+def availability_updates(team_days):
+    day_teams = {}
+    for team_id, days in team_days.items():
+        for day in days:
+            day_teams.setdefault(day, []).append(team_id)
+    return {
+        FieldPath("teamAvailableDays", day).to_api_repr(): firestore.ArrayUnion(team_ids)
+        for day, team_ids in day_teams.items()
+    }
+
+# Helper: Apply availability updates to a round, returns an error response or None
+def apply_availability(tournament_id, round_number, team_days):
+    try:
+        doc_ref = schedule_ref.document(schedule_key(tournament_id, round_number))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid roundNumber"}), 400
+
+    try:
+        doc_ref.update(availability_updates(team_days))
+    except NotFound:
+        return jsonify({"error": "Schedule for that round not found"}), 404
+    return None
+
 # --- Submit Availability ---
-@app.route("/schedule/<tournament_id>/availability", methods=["POST", "OPTIONS"])
+@api.route("/schedule/<tournament_id>/availability", methods=["POST", "OPTIONS"])
 def submit_availability(tournament_id):
     if request.method == "OPTIONS":
         return jsonify({}), 200
@@ -110,32 +209,55 @@ def submit_availability(tournament_id):
     if not team_id or not available_days or round_number is None:
         return jsonify({"error": "Missing teamId, availableDays, or roundNumber"}), 400
 
-    selected_doc = None
-    for doc in schedule_ref.where("roundNumber", "==", round_number).stream():
-        d = doc.to_dict()
-        if d.get("tournament") and tournament_id in d["tournament"]:
-            selected_doc = doc
-            break
+    error = apply_availability(tournament_id, round_number, {team_id: available_days})
+    if error:
+        return error
 
-    if not selected_doc:
-        return jsonify({"error": "Schedule for that round not found"}), 404
+    logging.info(f"Added team {team_id} to {available_days}")
+    return jsonify({"message": "Availability submitted"}), 200
 
-    schedule_data = selected_doc.to_dict()
-    team_availability = schedule_data.get("teamAvailableDays", {})
-    logging.info(f"Before update, teamAvailableDays: {team_availability}")
+# --- Submit Availability for Many Teams ---
+# Body: {"roundNumber": 1, "teams": [{"teamId": "...", "availableDays": [...]}, ...]}
+@api.route("/schedule/<tournament_id>/availability/bulk", methods=["POST", "OPTIONS"])
+def submit_availability_bulk(tournament_id):
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    data = request.json or {}
+    round_number = data.get("roundNumber")
+    teams = data.get("teams")
+    if round_number is None or not isinstance(teams, list) or not teams:
+        return jsonify({"error": "Missing roundNumber or teams"}), 400
 
-    for day in available_days:
-        if day not in team_availability:
-            team_availability[day] = []
-        if team_id not in team_availability[day]:
-            team_availability[day].append(team_id)
+    team_days = {}
+    for i, entry in enumerate(teams):
+        team_id = entry.get("teamId") if isinstance(entry, dict) else None
+        available_days = entry.get("availableDays") if team_id else None
+        if not team_id or not available_days:
+            return jsonify({"error": f"Team {i}: missing teamId or availableDays"}), 400
+        team_days.setdefault(team_id, []).extend(available_days)
 
-    schedule_ref.document(selected_doc.id).update({"teamAvailableDays": team_availability})
-    logging.info(f"After update, teamAvailableDays: {team_availability}")
-    return jsonify({"message": "Availability submitted"}), 200
+    # One document update for the whole request, still applied atomically
+    error = apply_availability(tournament_id, round_number, team_days)
+    if error:
+        return error
+
+    logging.info(f"Bulk availability for {len(team_days)} teams, round {round_number}")
+    return jsonify({"message": f"Availability submitted for {len(team_days)} teams"}), 200
 
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False  # Allow trailing slash variations
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+    metrics.instrument_flask(app, "schedule-service")  # GET /metrics
+    tracing.instrument_flask(app, "schedule-service")  # traceparent in and out
+    db.warm_up()  # open the Firestore channel in the background
+    app.register_blueprint(api)
+    return app
 
 if __name__ == "__main__":
+    app = create_app()
     print("HELLO FROM schedule_service.py - LOADING ROUTES...")
     with app.test_request_context():
         for rule in app.url_map.iter_rules():
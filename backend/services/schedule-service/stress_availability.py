@@ -0,0 +1,98 @@
+# stress_availability.py
+"""Concurrency stress test for availability submission.
+
+Fires many concurrent single-team and bulk submissions at a running
+schedule-service for one fresh round, then reads the round back and checks
+that every (team, day) submitted is present. Exits non-zero if anything was
+lost.
+
+Run the service against the Firestore emulator so no real data is touched:
+start the emulator (``firebase emulators:start --only firestore``), set
+FIRESTORE_EMULATOR_HOST=<emulator host:port> in schedule-service's
+environment, then
+
+    python stress_availability.py --url http://localhost:5005 --teams 500 --workers 64
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that concurrent availability submissions are never lost")
+    parser.add_argument("--url", default="http://localhost:5005")
+    parser.add_argument("--teams", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--bulk-size", type=int, default=25,
+                        help="teams per bulk request; every other chunk is sent one team at a time")
+    args = parser.parse_args()
+
+    tournament_id = f"stress-{uuid.uuid4().hex[:8]}"
+    round_number = 1
+    res = requests.post(f"{args.url}/schedule", json={
+        "tournamentId": tournament_id,
+        "roundNumber": round_number,
+        "tournamentName": "Availability stress test",
+    })
+    res.raise_for_status()
+
+    rng = random.Random(7)
+    expected = {f"team-{i}": rng.sample(DAYS, rng.randint(1, 4)) for i in range(args.teams)}
+    team_ids = list(expected)
+
+    # Mix single submissions and bulk chunks so both paths race each other
+    jobs = []
+    for n, start in enumerate(range(0, len(team_ids), args.bulk_size)):
+        chunk = team_ids[start:start + args.bulk_size]
+        if n % 2:
+            jobs.append(("bulk", chunk))
+        else:
+            jobs.extend(("single", [team_id]) for team_id in chunk)
+    rng.shuffle(jobs)
+
+    def submit(job):
+        kind, chunk = job
+        if kind == "bulk":
+            res = requests.post(f"{args.url}/schedule/{tournament_id}/availability/bulk", json={
+                "roundNumber": round_number,
+                "teams": [{"teamId": t, "availableDays": expected[t]} for t in chunk],
+            })
+        else:
+            res = requests.post(f"{args.url}/schedule/{tournament_id}/availability", json={
+                "teamId": chunk[0],
+                "availableDays": expected[chunk[0]],
+                "roundNumber": round_number,
+            })
+        return res.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        statuses = list(pool.map(submit, jobs))
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for status in statuses if status != 200)
+
+    res = requests.get(f"{args.url}/schedule/{tournament_id}/{round_number}")
+    res.raise_for_status()
+    stored = res.json().get("teamAvailableDays", {})
+
+    lost = [(team_id, day) for team_id, days in expected.items()
+            for day in days if team_id not in stored.get(day, [])]
+    submitted = sum(len(days) for days in expected.values())
+
+    print(f"{len(jobs)} requests ({args.teams} teams) with {args.workers} workers in {elapsed:.2f}s"
+          f" ({len(jobs) / elapsed:.0f} req/s), {failed} failed")
+    print(f"{submitted - len(lost)}/{submitted} team-days stored, {len(lost)} lost")
+    for team_id, day in lost[:10]:
+        print(f"  lost: {team_id} on {day}")
+    sys.exit(1 if lost or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# backfill_team_index.py
+"""Build the player -> teams membership index from existing teams.
+
+Teams joined before the index existed are only listed in the team's
+``players`` map. This scans the teams collection once and adds every team
+to its players' ``teams`` arrays. The writes use ArrayUnion, so the job is
+safe to re-run and does not undo joins that happen while it runs.
+
+Usage (inside the teams-service container):
+    python backfill_team_index.py            # dry run, prints counts
+    python backfill_team_index.py --apply    # write the index
+"""
+import argparse
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+import team_index
+
+BATCH_LIMIT = 500
+
+
+def collect_memberships(db):
+    """Scan the teams collection; returns (team count, {uid: [teamIds]})."""
+    player_teams = {}
+    team_count = 0
+    for doc in db.collection("teams").select(["players"]).stream():
+        team_count += 1
+        for user_id in doc.to_dict().get("players") or {}:
+            player_teams.setdefault(user_id, []).append(doc.id)
+    return team_count, player_teams
+
+
+def write_index(db, player_teams):
+    # One write per player, whatever number of teams they are in
+    entries = list(player_teams.items())
+    for start in range(0, len(entries), BATCH_LIMIT):
+        batch = db.batch()
+        for user_id, team_ids in entries[start:start + BATCH_LIMIT]:
+            batch.set(team_index.player_ref(db, user_id), {"teams": firestore.ArrayUnion(team_ids)}, merge=True)
+        batch.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill players/{uid}.teams from the teams collection")
+    parser.add_argument("--apply", action="store_true", help="write changes (default is a dry run)")
+    parser.add_argument("--credentials", default="/app/serviceAccountKey.json")
+    args = parser.parse_args()
+
+    firebase_admin.initialize_app(credentials.Certificate(args.credentials))
+    db = firestore.client()
+
+    team_count, player_teams = collect_memberships(db)
+    memberships = sum(len(team_ids) for team_ids in player_teams.values())
+    print(f"{team_count} teams, {memberships} memberships for {len(player_teams)} players")
+    if not args.apply:
+        print("Dry run only, re-run with --apply to write the index")
+        return
+
+    write_index(db, player_teams)
+    print("✅ Backfill complete")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench_team_index.py
+"""Compare GET /teams lookups: full collection scan vs the membership index.
+
+Seeds the teams collection in stages, each team having five random
+players, and times both lookups for one player who is in three teams.
+The scan grows with the collection; the index lookup should stay flat.
+
+Seeding writes real documents, so this refuses to run unless
+FIRESTORE_EMULATOR_HOST points at the Firestore emulator:
+
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python bench_team_index.py --sizes 1000,10000,100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+import team_index
+
+BATCH_LIMIT = 500
+PLAYER = "bench-player"
+
+
+def scan_teams(db, user_id):
+    """What GET /teams did before the index."""
+    return [doc for doc in db.collection("teams").stream() if user_id in doc.to_dict().get("players", {})]
+
+
+def seed(db, start, end, pool, rng):
+    player_teams = {}
+    for batch_start in range(start, end, BATCH_LIMIT):
+        batch = db.batch()
+        for i in range(batch_start, min(batch_start + BATCH_LIMIT, end)):
+            team_id = f"bench-team-{i}"
+            members = rng.sample(pool, 5)
+            batch.set(db.collection("teams").document(team_id), {
+                "name": f"Team {i}",
+                "team_id": team_id,
+                "captain_id": members[0],
+                "captain_name": members[0],
+                "players": {uid: uid for uid in members},
+                "tournaments": {},
+            })
+            for uid in members:
+                player_teams.setdefault(uid, []).append(team_id)
+        batch.commit()
+
+    entries = list(player_teams.items())
+    for batch_start in range(0, len(entries), BATCH_LIMIT):
+        batch = db.batch()
+        for uid, team_ids in entries[batch_start:batch_start + BATCH_LIMIT]:
+            batch.set(team_index.player_ref(db, uid), {"teams": firestore.ArrayUnion(team_ids)}, merge=True)
+        batch.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time GET /teams lookups as the teams collection grows")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated team counts")
+    parser.add_argument("--players", type=int, default=20000, help="size of the random player pool")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--credentials", default="/app/serviceAccountKey.json")
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("FIRESTORE_EMULATOR_HOST is not set; refusing to seed a real database")
+
+    firebase_admin.initialize_app(credentials.Certificate(args.credentials))
+    db = firestore.client()
+    rng = random.Random(11)
+    pool = [f"bench-user-{i}" for i in range(args.players)]
+
+    # The measured player is in three fixed teams; the rest are random
+    seeded = 0
+    print(f"{'teams':>8} {'scan ms':>10} {'index ms':>10}")
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        seed(db, seeded, size, pool, rng)
+        if seeded == 0:
+            batch = db.batch()
+            for i in range(3):
+                team_ref = db.collection("teams").document(f"bench-team-{i}")
+                batch.update(team_ref, {FieldPath("players", PLAYER).to_api_repr(): PLAYER})
+                team_index.add_team(batch, db, PLAYER, team_ref.id)
+            batch.commit()
+        seeded = size
+
+        scan_ms, scanned = timed(lambda: scan_teams(db, PLAYER), args.repeat)
+        index_ms, indexed = timed(lambda: team_index.teams_for_player(db, PLAYER), args.repeat)
+        if sorted(d.id for d in scanned) != sorted(d.id for d in indexed):
+            sys.exit(f"Mismatch at {size} teams: scan {len(scanned)} vs index {len(indexed)}")
+        print(f"{size:>8} {scan_ms:>10.1f} {index_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# team_index.py
+"""Reverse membership index: the teams each player belongs to.
+
+Each players/{uid} document keeps a ``teams`` array of team IDs, written
+in the same transaction or batch that changes a team's ``players`` map.
+GET /teams is then one point read plus one batched read of the listed
+teams, however large the teams collection gets. Entries are checked
+against the team documents on read, so a team that was deleted or edited
+outside this service drops out instead of being served stale.
+
+Only join_team in this service writes the ``players`` map GET /teams
+reads, and it keeps the index in step. Memberships from before the index
+existed, or written to Firestore directly, are added by running
+backfill_team_index.py.
+"""
+from firebase_admin import firestore
+
+
+def player_ref(db, user_id):
+    return db.collection("players").document(user_id)
+
+
+def add_team(writer, db, user_id, team_id):
+    """Record membership using a transaction or write batch."""
+    writer.set(player_ref(db, user_id), {"teams": firestore.ArrayUnion([team_id])}, merge=True)
+
+
+def team_ids_for_player(db, user_id):
+    snapshot = player_ref(db, user_id).get(["teams"])
+    if not snapshot.exists:
+        return []
+    return snapshot.to_dict().get("teams") or []
+
+
+def teams_for_player(db, user_id):
+    """Return the player's team snapshots, in the order they were joined."""
+    team_ids = team_ids_for_player(db, user_id)
+    if not team_ids:
+        return []
+    refs = [db.collection("teams").document(team_id) for team_id in team_ids]
+    found = {
+        doc.id: doc for doc in db.get_all(refs)
+        if doc.exists and user_id in doc.to_dict().get("players", {})
+    }
+    return [found[team_id] for team_id in team_ids if team_id in found]
+
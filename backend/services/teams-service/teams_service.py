@@ -1,51 +1,102 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from google.cloud.firestore_v1.field_path import FieldPath
+import team_index
+import auth_cache
+import storage
+import metrics
+import tracing
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app, origins=["http://localhost:5173"])
+api = Blueprint("teams", __name__)
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate("/app/serviceAccountKey.json")  # Ensure the correct path
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Firestore, or a local store when STORAGE_BACKEND is set (see storage.py).
+# Built on first use in each worker; create_app() starts it warming up.
+db = storage.lazy_client()
+
+BATCH_MAX = 500
 
 # Helper function to get the user ID from the Firebase ID token
 def get_user_id_from_token(id_token):
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = auth_cache.verify_id_token(id_token)
         return decoded_token['uid']
     except Exception as e:
         return None
 
+# Hit/miss counters for the verified-token cache
+@api.route("/auth/cache/stats", methods=["GET"])
+def get_auth_cache_stats():
+    return jsonify(auth_cache.token_cache.stats()), 200
+
+def team_info(team_id, team_data):
+    return {
+        "teamId": team_id,
+        "name": team_data.get("name"),
+        "captain_id": team_data.get("captain_id"),
+        "captain_name": team_data.get("captain_name"),
+        "players": team_data.get("players", {}),
+        "player_ids": list(team_data.get("players", {}).keys()),
+        "player_names": list(team_data.get("players", {}).values())
+    }
+
 # New endpoint to fetch team info by team ID
-@app.route("/team/<team_id>", methods=["GET"])
+@api.route("/team/<team_id>", methods=["GET"])
 def get_team_by_id(team_id):
     try:
         team_doc = db.collection("teams").document(team_id).get()
         if not team_doc.exists:
             return jsonify({"error": "Team not found"}), 404
 
-        team_data = team_doc.to_dict()
+        return jsonify(team_info(team_id, team_doc.to_dict())), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Fetch several teams in one read: GET ?ids=a,b,c or POST {"ids": [...]}
+@api.route("/teams/batch", methods=["GET", "POST"])
+def get_teams_batch():
+    try:
+        if request.method == "POST":
+            team_ids = (request.get_json() or {}).get("ids") or []
+        else:
+            team_ids = [i for i in request.args.get("ids", "").split(",") if i]
+        team_ids = list(dict.fromkeys(team_ids))  # drop duplicates, keep order
+
+        if len(team_ids) > BATCH_MAX:
+            return jsonify({"error": f"At most {BATCH_MAX} ids per request"}), 400
+
+        refs = [db.collection("teams").document(team_id) for team_id in team_ids]
+        found = {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists} if refs else {}
 
         return jsonify({
-            "teamId": team_id,
-            "name": team_data.get("name"),
-            "captain_id": team_data.get("captain_id"),
-            "captain_name": team_data.get("captain_name"),
-            "players": team_data.get("players", {}),
-            "player_ids": list(team_data.get("players", {}).keys()),
-            "player_names": list(team_data.get("players", {}).values())
+            "teams": [team_info(team_id, found[team_id]) for team_id in team_ids if team_id in found],
+            "missing": [team_id for team_id in team_ids if team_id not in found]
         }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def team_summary(team_id, team_data):
+    players_map = team_data.get("players", {})
+    tournaments_map = team_data.get("tournaments", {})
+    return {
+        'id': team_id,
+        'name': team_data['name'],
+        'captain_id': team_data['captain_id'],
+        'captain_name': team_data['captain_name'],
+        'players': players_map,
+        'player_ids': list(players_map.keys()),         # optional: if you still need the IDs
+        'player_names': list(players_map.values()),      # optional: if you want just names
+        'team_id': team_data['team_id'],
+        # 'wins': team_data.get('wins', 0),
+        # 'losses': team_data.get('losses', 0),
+        'tournament_id': list(tournaments_map.keys()),
+        'tournament_names': list(tournaments_map.values())
+    }
+
 # Route to get the teams the user is part of
-@app.route("/teams", methods=["GET"])
+@api.route("/teams", methods=["GET"])
 def get_teams_for_player():
     try:
         # Get the Firebase ID token from the Authorization header
@@ -71,34 +122,8 @@ def get_teams_for_player():
         if not user_id:
             return jsonify({"error": "Invalid token or user not authenticated"}), 400
 
-        # Fetch all teams from Firestore
-        teams_ref = db.collection("teams")
-        teams_snapshot = teams_ref.stream()
-
-        user_teams = []
-
-
-        # Loop through teams and check if the player is part of the team
-        for team_doc in teams_snapshot:
-            team_data = team_doc.to_dict()
-            if user_id in team_data.get("players", []):  # Default to an empty list if "players_id" is missing
-                players_map = team_data.get("players", {})
-                tournaments_map = team_data.get("tournaments", {})
-                user_teams.append({
-                    'id': team_doc.id,
-                    'name': team_data['name'],
-                    'captain_id': team_data['captain_id'],
-                    'captain_name': team_data['captain_name'],
-                    'players': players_map,
-                    'player_ids': list(players_map.keys()),         # optional: if you still need the IDs
-                    'player_names': list(players_map.values()),      # optional: if you want just names
-                    'team_id': team_data['team_id'],
-                    # 'wins': team_data.get('wins', 0),
-                    # 'losses': team_data.get('losses', 0),
-                    'tournament_id': list(tournaments_map.keys()),
-                    'tournament_names': list(tournaments_map.values())
-                })
-
+        # Look up the player's teams through the membership index
+        user_teams = [team_summary(doc.id, doc.to_dict()) for doc in team_index.teams_for_player(db, user_id)]
 
         print("Authorization header:", request.headers.get('Authorization'))
 
@@ -107,7 +132,28 @@ def get_teams_for_player():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     
-@app.route("/team/<team_id>/join", methods=["POST"])
+# The size check and both writes happen in one transaction, so concurrent
+# joins can neither overfill a team nor leave the index out of step.
+@storage.transactional
+def join_team_in_transaction(transaction, team_ref, user_id, name):
+    snapshot = team_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return "not found"
+
+    players = snapshot.to_dict().get("players", {})
+    if user_id in players:
+        # Also repairs the index for members who joined before it existed
+        team_index.add_team(transaction, db, user_id, team_ref.id)
+        return "already joined"
+
+    if len(players) >= 5:
+        return "full"
+
+    transaction.update(team_ref, {FieldPath("players", user_id).to_api_repr(): name})
+    team_index.add_team(transaction, db, user_id, team_ref.id)
+    return "joined"
+
+@api.route("/team/<team_id>/join", methods=["POST"])
 def join_team(team_id):
     try:
         # Get the Firebase ID token from the Authorization header
@@ -125,25 +171,19 @@ def join_team(team_id):
         data = request.get_json()
         name = data.get("name", "Unnamed Player")
 
-        # Fetch the team
+        # Add the player to the team and to their membership index together
         team_ref = db.collection("teams").document(team_id)
-        team_doc = team_ref.get()
+        outcome = join_team_in_transaction(db.transaction(), team_ref, user_id, name)
 
-        if not team_doc.exists:
+        if outcome == "not found":
             return jsonify({"error": "Team not found"}), 404
 
-        team_data = team_doc.to_dict()
-        players = team_data.get("players", {})
-
-        if user_id in players:
+        if outcome == "already joined":
             return jsonify({"message": "User already in this team"}), 200
 
-        if len(players) >= 5:
+        if outcome == "full":
             return jsonify({"error": "Team is already full"}), 400
 
-        players[user_id] = name
-        team_ref.update({"players": players})
-
         return jsonify({"message": "User successfully added to team"}), 200
 
     except Exception as e:
@@ -152,5 +192,16 @@ def join_team(team_id):
     
 
 # Run Flask App
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    CORS(app, origins=["http://localhost:5173"])
+    metrics.instrument_flask(app, "teams-service")  # GET /metrics
+    tracing.instrument_flask(app, "teams-service")  # traceparent in and out
+    db.warm_up()  # open the Firestore channel in the background
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", debug=True, port=5003)
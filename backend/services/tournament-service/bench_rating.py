@@ -0,0 +1,64 @@
+# bench_rating.py
+"""Benchmark rating.recompute against replaying matches one at a time.
+
+Usage: python bench_rating.py [--teams 256] [--rounds 200]
+
+Builds a synthetic history (every team plays once per round) and times a
+full rebuild both ways. It also checks that both give the same ratings.
+"""
+import argparse
+import random
+import time
+
+import rating
+
+
+def make_history(n_teams, n_rounds, rng):
+    team_ids = [f"team-{i}" for i in range(n_teams)]
+    matches = []
+    for round_number in range(1, n_rounds + 1):
+        order = team_ids[:]
+        rng.shuffle(order)
+        for a, b in zip(order[::2], order[1::2]):
+            matches.append({
+                "teamAId": a,
+                "teamBId": b,
+                "roundNumber": round_number,
+                "result": rng.choice(["teamA won", "teamB won", "draw"]),
+            })
+    rng.shuffle(matches)  # Firestore returns them in no particular order
+    return team_ids, matches
+
+
+def replay(team_ids, matches):
+    ratings = {t: rating.DEFAULT_RATING for t in team_ids}
+    for m in sorted(matches, key=lambda m: m["roundNumber"]):
+        a, b = m["teamAId"], m["teamBId"]
+        ratings[a], ratings[b] = rating.update(ratings[a], ratings[b], m["result"])
+    return ratings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a full rating rebuild")
+    parser.add_argument("--teams", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    team_ids, matches = make_history(args.teams, args.rounds, random.Random(args.seed))
+    print(f"{len(matches)} matches, {args.teams} teams, {args.rounds} rounds")
+
+    start = time.perf_counter()
+    expected = replay(team_ids, matches)
+    print(f"  one at a time  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    start = time.perf_counter()
+    rebuilt = rating.recompute(team_ids, matches)
+    print(f"  recompute      {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    drift = max(abs(rebuilt[t]["elo"] - expected[t]) for t in team_ids)
+    print(f"  max difference {drift:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# rating.py
+"""Elo ratings for tournament teams.
+
+``update`` applies one result as it is finalized. ``recompute`` rebuilds
+every team's rating from a tournament's full match history, for example
+after a dispute reverses a result. Matches are processed in round order,
+and each run of matches with no team in common is updated together as
+NumPy arrays. A round where every team plays once is a single run; a team
+playing twice in a round splits it. Rebuilds give the same ratings as
+finalizing the same results one at a time in that order.
+"""
+import os
+
+import numpy as np
+
+DEFAULT_RATING = 1500
+K_FACTOR = float(os.environ.get("ELO_K_FACTOR", 32))
+
+# Score for team A; team B scores 1 - this
+RESULT_SCORES = {"teamA won": 1.0, "teamB won": 0.0, "draw": 0.5}
+
+
+def expected_score(rating_a, rating_b):
+    """Probability that A beats B. Works on scalars or NumPy arrays."""
+    return 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+
+
+def update(rating_a, rating_b, result, k=K_FACTOR):
+    """Return the new (rating_a, rating_b) after one match."""
+    delta = k * (RESULT_SCORES[result] - expected_score(rating_a, rating_b))
+    return rating_a + delta, rating_b - delta
+
+
+def disjoint_runs(team_a, team_b, start, end):
+    """Split matches[start:end] into consecutive runs where no team repeats.
+
+    Updates inside a run don't depend on each other, so applying a run at
+    once is the same as applying its matches one by one.
+    """
+    teams = np.concatenate((team_a[start:end], team_b[start:end]))
+    if len(np.unique(teams)) == len(teams):
+        return [(start, end)]
+
+    runs = []
+    seen = set()
+    for i in range(start, end):
+        a, b = int(team_a[i]), int(team_b[i])
+        if a in seen or b in seen:
+            runs.append((start, i))
+            start, seen = i, set()
+        seen.update((a, b))
+    runs.append((start, end))
+    return runs
+
+
+def recompute(team_ids, matches, initial=None, k=K_FACTOR):
+    """Rebuild ratings and win/loss records from a match history.
+
+    ``matches`` are match documents (teamAId, teamBId, result, roundNumber).
+    Pending matches, matches against teams not in ``team_ids`` and
+    matches of a team against itself are ignored. Matches in the same
+    round keep their order in ``matches``. ``initial`` maps teamId to a starting rating (default 1500).
+    Returns ``{teamId: {"elo", "wins", "losses"}}``.
+    """
+    initial = initial or {}
+    index = {team_id: i for i, team_id in enumerate(team_ids)}
+    n = len(team_ids)
+    ratings = np.array([initial.get(t, DEFAULT_RATING) for t in team_ids], dtype=float)
+
+    # Pull each field out as a column, then drop unplayed / unknown matches
+    lookup = index.get
+    team_a = np.array([lookup(m.get("teamAId"), -1) for m in matches], dtype=int)
+    team_b = np.array([lookup(m.get("teamBId"), -1) for m in matches], dtype=int)
+    score = np.array([RESULT_SCORES.get(m.get("result"), -1.0) for m in matches], dtype=float)
+    rounds = np.array([m.get("roundNumber") or 0 for m in matches], dtype=float)
+
+    played = (team_a >= 0) & (team_b >= 0) & (team_a != team_b) & (score >= 0)
+    order = np.argsort(rounds[played], kind="stable")
+    team_a, team_b = team_a[played][order], team_b[played][order]
+    score, rounds = score[played][order], rounds[played][order]
+
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(rounds)) + 1, [len(rounds)]))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        for run_start, run_end in disjoint_runs(team_a, team_b, start, end):
+            a, b = team_a[run_start:run_end], team_b[run_start:run_end]
+            delta = k * (score[run_start:run_end] - expected_score(ratings[a], ratings[b]))
+            ratings += np.bincount(a, delta, n) - np.bincount(b, delta, n)
+
+    wins = np.bincount(team_a, score == 1, n) + np.bincount(team_b, score == 0, n)
+    losses = np.bincount(team_a, score == 0, n) + np.bincount(team_b, score == 1, n)
+
+    return {
+        team_id: {"elo": float(ratings[i]), "wins": int(wins[i]), "losses": int(losses[i])}
+        for team_id, i in index.items()
+    }
@@ -1,21 +1,84 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, Response, request, jsonify, stream_with_context, current_app
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
+from cache import LRUTTLCache
+import storage
+import hashlib
+import os
+import rating
+import metrics
+import tracing
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
+api = Blueprint("tournament", __name__)
 
-# Initialize Firebase
-cred = credentials.Certificate("/app/serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Firestore, or a local store when STORAGE_BACKEND is set (see storage.py).
+# Built on first use in each worker; create_app() starts it warming up.
+db = storage.lazy_client()
 
 tournament_ref = db.collection("tournaments")
+match_ref = db.collection("matches")
+
+# GET /tournament/<id> is the hottest read in the system; serve it from an
+# in-process cache that every write route below invalidates
+tournament_cache = LRUTTLCache(
+    maxsize=int(os.environ.get("TOURNAMENT_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("TOURNAMENT_CACHE_TTL", 30))
+)
+
+# Standings live in tournaments/<id>/standings, one document per team. A
+# single sortKey orders them by (wins, elo), so the leaderboard is one
+# indexed query and a rank lookup is one count aggregation.
+SORT_KEY_WINS = 100000  # elo never gets near this, so wins always dominate
+STANDINGS_PAGE_MAX = 100
+BATCH_LIMIT = 500
+
+def standings_ref(tournament_id):
+    return tournament_ref.document(tournament_id).collection("standings")
+
+def standing_doc(team):
+    # Teams written by older clients may lack some stats; rank them as new
+    stats = team.get("teamStats") or {}
+    wins = stats.get("wins", 0)
+    elo = stats.get("elo", rating.DEFAULT_RATING)
+    return {
+        "teamId": team["teamId"],
+        "wins": wins,
+        "losses": stats.get("losses", 0),
+        "elo": elo,
+        "sortKey": wins * SORT_KEY_WINS + elo
+    }
+
+# Helper: Queue standings writes for some teams on a transaction or batch
+def write_standings(writer, tournament_id, teams):
+    for team in teams:
+        writer.set(standings_ref(tournament_id).document(team["teamId"]), standing_doc(team))
+
+# Helper: The teams a write must cover to keep standings complete. A
+# tournament created before standings existed has none yet, so the first
+# write after that builds them for every team, not just the changed ones
+def standings_to_write(tournament_id, teams, changed, transaction=None):
+    if standings_ref(tournament_id).limit(1).get(transaction=transaction):
+        return [team for team in teams if team["teamId"] in changed]
+    return teams
+
+# Helper: Rewrite standings for every team, in chunked batches, and delete
+# the standings of teams no longer in the tournament
+def write_all_standings(tournament_id, teams):
+    current = {team["teamId"] for team in teams}
+    dropped = [doc.reference for doc in standings_ref(tournament_id).select([]).stream()
+               if doc.id not in current]
+    writes = [("set", team) for team in teams] + [("delete", ref) for ref in dropped]
+    for start in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        for op, target in writes[start:start + BATCH_LIMIT]:
+            if op == "set":
+                write_standings(batch, tournament_id, [target])
+            else:
+                batch.delete(target)
+        batch.commit()
 
 # Create a new tournament
-@app.route("/tournament", methods=["POST"])
+@api.route("/tournament", methods=["POST"])
 def create_tournament():
     data = request.json
     if not data.get("name") or not data.get("tournament_id"):
@@ -33,48 +96,131 @@ def create_tournament():
         # "teamStats": data.get("teamStats", [])  # Adding teamStats field
         "teams": [],  # Changed from players
     })
+    tournament_cache.invalidate(data["tournament_id"])
     return jsonify({"message": "Tournament created successfully"}), 201
 
+TOURNAMENTS_PAGE_MAX = 500
+
+# Helper: Yield tournaments one document at a time from a Firestore stream
+def iter_tournaments(query):
+    for doc in query.stream():
+        data = doc.to_dict()
+        data["id"] = doc.id  # include document ID
+        yield data
+
+# Helper: Stream a JSON array without building the list in memory
+def stream_json_array(items):
+    yield "["
+    for i, item in enumerate(items):
+        yield ("," if i else "") + current_app.json.dumps(item)
+    yield "]"
+
 # Get all tournaments or filter by status
-@app.route("/tournaments", methods=["GET"])
+#   ?status=ongoing      filter by status
+#   ?fields=name,status  only return these fields (plus id)
+#   ?limit=50            page size; the response then carries nextCursor
+#   ?start_after=<id>    continue after this tournament id
+#   ?format=ndjson       one JSON object per line
+@api.route("/tournaments", methods=["GET"])
 def get_all_tournaments():
     try:
         status = request.args.get("status")  # Optional query param
+        fields = [f for f in request.args.get("fields", "").split(",") if f]
+        start_after = request.args.get("start_after")
+        ndjson = request.args.get("format") == "ndjson" or \
+            "application/x-ndjson" in request.headers.get("Accept", "")
+        limit = request.args.get("limit")
+        if limit is not None:
+            try:
+                limit = min(max(int(limit), 1), TOURNAMENTS_PAGE_MAX)
+            except ValueError:
+                return jsonify({"error": "limit must be an integer"}), 400
+
+        # Ordered by document ID so start_after is a stable cursor
         tournaments_query = tournament_ref
-
         if status:
-            tournaments_query = tournament_ref.where("status", "==", status)
-
-        snapshot = tournaments_query.stream()
-        tournaments = []
-
-        for doc in snapshot:
-            data = doc.to_dict()
-            data["id"] = doc.id  # include document ID
-            tournaments.append(data)
-
-        return jsonify(tournaments), 200
+            tournaments_query = tournaments_query.where("status", "==", status)
+        tournaments_query = tournaments_query.order_by("__name__")
+        if fields:
+            tournaments_query = tournaments_query.select(fields)
+        if start_after:
+            tournaments_query = tournaments_query.start_after({"__name__": start_after})
+        if limit:
+            tournaments_query = tournaments_query.limit(limit)
+
+        tournaments = iter_tournaments(tournaments_query)
+
+        if ndjson:
+            lines = (current_app.json.dumps(t) + "\n" for t in tournaments)
+            return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+        if limit:
+            page = list(tournaments)  # bounded by TOURNAMENTS_PAGE_MAX
+            next_cursor = page[-1]["id"] if len(page) == limit else None
+            return jsonify({"tournaments": page, "nextCursor": next_cursor}), 200
+
+        return Response(stream_with_context(stream_json_array(tournaments)), mimetype="application/json")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-# Get tournament details
-@app.route("/tournament/<tournament_id>", methods=["GET"])
+# Get many tournaments by ID in one read
+# Body: {"ids": [...], "fields": ["teams", ...]} (fields optional)
+@api.route("/tournaments/batch", methods=["POST"])
+def get_tournaments_batch():
+    data = request.get_json() or {}
+    ids = data.get("ids")
+    fields = data.get("fields") or None
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids must be a non-empty list"}), 400
+
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    for doc in db.get_all([tournament_ref.document(i) for i in ids], field_paths=fields):
+        if doc.exists:
+            found[doc.id] = {"id": doc.id, **doc.to_dict()}
+
+    return jsonify({
+        "tournaments": [found[i] for i in ids if i in found],
+        "missing": [i for i in ids if i not in found]
+    }), 200
+
+# Get tournament details (cached, with ETag / If-None-Match support)
+@api.route("/tournament/<tournament_id>", methods=["GET"])
 def get_tournament(tournament_id):
-    tournament = tournament_ref.document(tournament_id).get()
-    if tournament.exists:
-        return jsonify(tournament.to_dict()), 200
-    return jsonify({"error": "Tournament not found"}), 404
+    cached = tournament_cache.get(tournament_id)
+    if cached is None:
+        version = tournament_cache.version(tournament_id)
+        tournament = tournament_ref.document(tournament_id).get()
+        if not tournament.exists:
+            return jsonify({"error": "Tournament not found"}), 404
+        body = current_app.json.dumps(tournament.to_dict())
+        cached = (body, hashlib.sha1(body.encode()).hexdigest())
+        tournament_cache.set(tournament_id, cached, version)
+
+    body, etag = cached
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+# Cache hit/miss counters (misses are Firestore reads)
+@api.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(tournament_cache.stats()), 200
 
 # Update tournament status
-@app.route("/tournament/<tournament_id>", methods=["PUT"])
+@api.route("/tournament/<tournament_id>", methods=["PUT"])
 def update_tournament(tournament_id):
     data = request.json
     tournament_ref.document(tournament_id).update({"status": data.get("status", "upcoming")})
+    tournament_cache.invalidate(tournament_id)
     return jsonify({"message": "Tournament updated successfully"}), 200
 
 # Add a player to a tournament (via composite service)
-@app.route("/tournament/<tournament_id>/add_player", methods=["PUT"])
+@api.route("/tournament/<tournament_id>/add_player", methods=["PUT"])
 def add_player_to_tournament(tournament_id):
     data = request.get_json()
     player_id = data.get("player_id")  # use snake_case to match your composite payload
@@ -94,10 +240,11 @@ def add_player_to_tournament(tournament_id):
 
     players.append(player_id)
     tournament_ref.document(tournament_id).update({"players": players})
+    tournament_cache.invalidate(tournament_id)
 
     return jsonify({"message": "Player added to tournament"}), 200
 
-@app.route("/tournament/<tournament_id>/remove_player", methods=["PUT"])
+@api.route("/tournament/<tournament_id>/remove_player", methods=["PUT"])
 def remove_player_from_tournament(tournament_id):
     data = request.get_json()
     player_id = data.get("player_id")
@@ -117,12 +264,13 @@ def remove_player_from_tournament(tournament_id):
 
     players.remove(player_id)
     tournament_ref.document(tournament_id).update({"players": players})
+    tournament_cache.invalidate(tournament_id)
 
     return jsonify({"message": "Player removed from tournament"}), 200
 
 
 # # Add a player to a tournament
-# @app.route("/tournament/<tournament_id>/add_player", methods=["POST"])
+# @api.route("/tournament/<tournament_id>/add_player", methods=["POST"])
 # def add_player(tournament_id):
 #     data = request.json
 #     player_id = data.get("player_id")
@@ -146,7 +294,7 @@ def remove_player_from_tournament(tournament_id):
 #     return jsonify({"message": "Player added successfully"}), 200
 
 # Add a team to a tournament
-@app.route("/tournament/<tournament_id>/add_team", methods=["POST"])
+@api.route("/tournament/<tournament_id>/add_team", methods=["POST"])
 def add_team(tournament_id):
     data = request.json
     team_id = data.get("teamId")
@@ -179,17 +327,22 @@ def add_team(tournament_id):
         "teamId": team_id,
         "players": player_ids,
         "teamStats": {
-            "elo": data.get("elo", 1500),
+            "elo": data.get("elo", rating.DEFAULT_RATING),
+            "initialElo": data.get("elo", rating.DEFAULT_RATING),  # starting point for rating rebuilds
             "wins": 0,
             "losses": 0
         }
     })
     
-    tournament_ref.document(tournament_id).update({"teams": teams})
+    batch = db.batch()
+    batch.update(tournament_ref.document(tournament_id), {"teams": teams})
+    write_standings(batch, tournament_id, standings_to_write(tournament_id, teams, {team_id}))
+    batch.commit()
+    tournament_cache.invalidate(tournament_id)
     return jsonify({"message": "Team added successfully"}), 200
 
 # # Update team stats in a tournament
-# @app.route("/tournament/<tournament_id>/update_team_stats", methods=["PUT"])
+# @api.route("/tournament/<tournament_id>/update_team_stats", methods=["PUT"])
 # def update_team_stats(tournament_id):
 #     data = request.json
 #     team_stats = data.get("teamStats")
@@ -204,7 +357,7 @@ def add_team(tournament_id):
 #     return jsonify({"message": "Team stats updated successfully"}), 200
 
 # # Update team stats after a match
-# @app.route("/tournament/<tournament_id>/update_match/<match_id>", methods=["POST"])
+# @api.route("/tournament/<tournament_id>/update_match/<match_id>", methods=["POST"])
 # def update_match(tournament_id, match_id):
 #     match = match_ref.document(match_id).get()
 #     if not match.exists:
@@ -245,7 +398,7 @@ def add_team(tournament_id):
 #     tournament_ref.document(tournament_id).update({"teams": teams})
 #     return jsonify({"message": "Match results updated successfully"}), 200
 
-@app.route("/tournament/<tournament_id>/update_team_stats", methods=["PUT"])
+@api.route("/tournament/<tournament_id>/update_team_stats", methods=["PUT"])
 def update_team_stats(tournament_id):
     data = request.json
     updated_teams = data.get("teams", [])
@@ -258,11 +411,155 @@ def update_team_stats(tournament_id):
         return jsonify({"error": "Tournament not found"}), 404
 
     tournament_doc.update({ "teams": updated_teams })
+    tournament_cache.invalidate(tournament_id)
+    write_all_standings(tournament_id, updated_teams)
 
     return jsonify({ "message": "Team stats updated successfully" }), 200
 
+# Helper: Apply one match result to the two teams' stats in place
+def apply_match_outcome(teams, team_a, team_b, result):
+    stats = {team["teamId"]: team["teamStats"] for team in teams}
+    stats_a, stats_b = stats[team_a], stats[team_b]
+    stats_a["elo"], stats_b["elo"] = rating.update(stats_a["elo"], stats_b["elo"], result)
+    if result == "teamA won":
+        stats_a["wins"] += 1
+        stats_b["losses"] += 1
+    elif result == "teamB won":
+        stats_b["wins"] += 1
+        stats_a["losses"] += 1
+
+# Read-modify-write inside a transaction: if another outcome for this
+# tournament commits first, Firestore retries this one on the new data.
+@storage.transactional
+def record_outcome_in_transaction(transaction, doc_ref, team_a, team_b, result):
+    snapshot = doc_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return "Tournament not found"
+
+    teams = snapshot.to_dict().get("teams", [])
+    team_ids = {team["teamId"] for team in teams}
+    if team_a not in team_ids or team_b not in team_ids:
+        return "Team not found in tournament"
+
+    # Transactions need every read before the first write
+    apply_match_outcome(teams, team_a, team_b, result)
+    changed = standings_to_write(doc_ref.id, teams, {team_a, team_b}, transaction)
+    transaction.update(doc_ref, {"teams": teams})
+    write_standings(transaction, doc_ref.id, changed)
+    return None
+
+# Record a single match outcome against the two teams involved
+@api.route("/tournament/<tournament_id>/match_outcome", methods=["POST"])
+def record_match_outcome(tournament_id):
+    data = request.get_json() or {}
+    team_a = data.get("teamAId")
+    team_b = data.get("teamBId")
+    result = data.get("result")  # "teamA won", "teamB won", "draw"
+
+    if not team_a or not team_b:
+        return jsonify({"error": "Missing teamAId or teamBId"}), 400
+    if result not in ["teamA won", "teamB won", "draw"]:
+        return jsonify({"error": "Invalid result"}), 400
+
+    error = record_outcome_in_transaction(
+        db.transaction(), tournament_ref.document(tournament_id), team_a, team_b, result)
+    if error:
+        return jsonify({"error": error}), 404
+    tournament_cache.invalidate(tournament_id)
+
+    return jsonify({"message": "Match outcome recorded"}), 200
+
+@storage.transactional
+def recompute_ratings_in_transaction(transaction, doc_ref, matches):
+    snapshot = doc_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+
+    teams = snapshot.to_dict().get("teams", [])
+    initial = {t["teamId"]: t["teamStats"].get("initialElo", rating.DEFAULT_RATING) for t in teams}
+    rebuilt = rating.recompute([t["teamId"] for t in teams], matches, initial)
+    for team in teams:
+        team["teamStats"].update(rebuilt[team["teamId"]])
+
+    transaction.update(doc_ref, {"teams": teams})
+    return teams
+
+# Rebuild every team's rating and record from the tournament's match history
+@api.route("/tournament/<tournament_id>/recompute_ratings", methods=["POST"])
+def recompute_ratings(tournament_id):
+    matches = [doc.to_dict() for doc in match_ref.where("tournamentId", "==", tournament_id).stream()]
+
+    teams = recompute_ratings_in_transaction(db.transaction(), tournament_ref.document(tournament_id), matches)
+    if teams is None:
+        return jsonify({"error": "Tournament not found"}), 404
+    tournament_cache.invalidate(tournament_id)
+    write_all_standings(tournament_id, teams)
+
+    return jsonify({"message": f"Ratings rebuilt from {len(matches)} matches", "teams": teams}), 200
+
+# Helper: Competition rank (1 + teams strictly ahead) for a sortKey
+def rank_for(tournament_id, sort_key):
+    ahead = standings_ref(tournament_id).where("sortKey", ">", sort_key).count().get()
+    return ahead[0][0].value + 1
+
+# Helper: Page through standings, best first
+def standings_page(tournament_id, offset, limit):
+    query = standings_ref(tournament_id).order_by("sortKey", direction=firestore.Query.DESCENDING)
+    return [doc.to_dict() for doc in query.offset(offset).limit(limit).stream()]
+
+# Paginated leaderboard: /tournament/<id>/standings?offset=0&limit=20
+@api.route("/tournament/<tournament_id>/standings", methods=["GET"])
+def get_standings(tournament_id):
+    try:
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = min(max(int(request.args.get("limit", 20)), 1), STANDINGS_PAGE_MAX)
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+
+    page = standings_page(tournament_id, offset, limit)
+
+    # Tournaments created before standings existed: build them once from the
+    # embedded teams array, then serve from the index as usual
+    if not page and offset == 0:
+        tournament = tournament_ref.document(tournament_id).get()
+        if not tournament.exists:
+            return jsonify({"error": "Tournament not found"}), 404
+        teams = tournament.to_dict().get("teams", [])
+        write_all_standings(tournament_id, teams)
+        page = standings_page(tournament_id, offset, limit) if teams else []
+
+    # Tied teams share a rank, so only the first entry needs a count query
+    rank = previous_key = None
+    for i, entry in enumerate(page):
+        sort_key = entry.pop("sortKey")
+        if i == 0:
+            rank = rank_for(tournament_id, sort_key)
+        elif sort_key != previous_key:
+            rank = offset + i + 1
+        entry["rank"] = rank
+        previous_key = sort_key
+
+    return jsonify({"standings": page, "offset": offset, "limit": limit}), 200
+
+# Rank lookup for one team
+@api.route("/tournament/<tournament_id>/standings/<team_id>", methods=["GET"])
+def get_team_standing(tournament_id, team_id):
+    standing = standings_ref(tournament_id).document(team_id).get()
+    if not standing.exists and not standings_ref(tournament_id).limit(1).get():
+        # Same one-off build as the leaderboard, for tournaments without standings
+        tournament = tournament_ref.document(tournament_id).get()
+        if tournament.exists:
+            write_all_standings(tournament_id, tournament.to_dict().get("teams", []))
+            standing = standings_ref(tournament_id).document(team_id).get()
+    if not standing.exists:
+        return jsonify({"error": "Team not found in standings"}), 404
+
+    entry = standing.to_dict()
+    entry["rank"] = rank_for(tournament_id, entry.pop("sortKey"))
+    return jsonify(entry), 200
+
 # Update current round of the tournament
-@app.route("/tournament/<tournament_id>/update_round", methods=["PUT"])
+@api.route("/tournament/<tournament_id>/update_round", methods=["PUT"])
 def update_tournament_round(tournament_id):
     data = request.get_json()
     cur_round = data.get("curRound")
@@ -275,7 +572,46 @@ def update_tournament_round(tournament_id):
         return jsonify({"error": "Tournament not found"}), 404
 
     tournament_doc.update({ "curRound": cur_round })
+    tournament_cache.invalidate(tournament_id)
     return jsonify({"message": f"curRound updated to {cur_round}"}), 200
 
+# Update curRound for many tournaments with batched writes
+# Body: {"rounds": [{"tournamentId": ..., "curRound": ...}, ...]}
+@api.route("/tournaments/rounds", methods=["POST"])
+def update_tournament_rounds():
+    rounds = (request.get_json() or {}).get("rounds")
+    if not isinstance(rounds, list) or not rounds:
+        return jsonify({"error": "rounds must be a non-empty list"}), 400
+    if any(not isinstance(r, dict) or not r.get("tournamentId") or r.get("curRound") is None for r in rounds):
+        return jsonify({"error": "Each round needs a tournamentId and a curRound"}), 400
+
+    cur_rounds = {r["tournamentId"]: r["curRound"] for r in rounds}
+    refs = [tournament_ref.document(tournament_id) for tournament_id in cur_rounds]
+    existing = [doc.id for doc in db.get_all(refs, field_paths=["curRound"]) if doc.exists]
+
+    for start in range(0, len(existing), BATCH_LIMIT):
+        batch = db.batch()
+        for tournament_id in existing[start:start + BATCH_LIMIT]:
+            batch.update(tournament_ref.document(tournament_id), {"curRound": cur_rounds[tournament_id]})
+        batch.commit()
+    for tournament_id in existing:
+        tournament_cache.invalidate(tournament_id)
+
+    return jsonify({
+        "updated": existing,
+        "missing": [tournament_id for tournament_id in cur_rounds if tournament_id not in existing]
+    }), 200
+
+# App factory: serve.py builds one app per worker, the dev server below one in-process
+def create_app():
+    app = Flask(__name__)
+    CORS(app)
+    metrics.instrument_flask(app, "tournament-service")  # GET /metrics
+    tracing.instrument_flask(app, "tournament-service")  # traceparent in and out
+    db.warm_up()  # open the Firestore channel in the background
+    app.register_blueprint(api)
+    return app
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", port=5002, debug=True)
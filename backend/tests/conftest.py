@@ -0,0 +1,88 @@
+import os
+from urllib.parse import urlsplit
+
+# Services read STORAGE_BACKEND when storage.py is imported; the memory
+# backend needs no credentials or network
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.pop("TRACE_DIR", None)
+
+import pytest
+import requests
+from flask import Flask
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+@pytest.fixture
+def fake_auth(monkeypatch):
+    """Accept any bearer token, with the token itself as the uid."""
+    import auth_cache
+
+    monkeypatch.setattr(auth_cache, "verify_id_token", lambda id_token: {"uid": id_token})
+
+
+class AppAdapter(BaseAdapter):
+    """Answer requests calls from in-process Flask apps, keyed by host:port."""
+
+    def __init__(self, apps):
+        super().__init__()
+        self.apps = apps
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        if url.netloc not in self.apps:
+            raise requests.ConnectionError(f"No app for {url.netloc} in this test")
+        path = url.path + (f"?{url.query}" if url.query else "")
+        answer = self.apps[url.netloc].test_client().open(
+            path, method=request.method, headers=dict(request.headers), data=request.body)
+        response = requests.Response()
+        response.status_code = answer.status_code
+        response.headers = CaseInsensitiveDict(answer.headers)
+        response._content = answer.get_data()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def services(monkeypatch):
+    """Route every outgoing requests call to the apps put in this dict."""
+    apps = {}
+    adapter = AppAdapter(apps)
+    monkeypatch.setattr(requests.Session, "get_adapter", lambda self, url: adapter)
+    return apps
+
+
+@pytest.fixture
+def notifications(services):
+    """Stand in for notification-service; returns the paths posted to it."""
+    sent = []
+    app = Flask("notification-service")
+
+    @app.route("/<path:path>", methods=["POST"])
+    def notify(path):
+        sent.append(path)
+        return {"ok": True}
+
+    services["notification-service:8000"] = app
+    return sent
+
+
+@pytest.fixture
+def shared_store(monkeypatch):
+    """One memory store behind every service, as when they share a project."""
+    import storage
+    import match_service
+    import player_service
+    import schedule_service
+    import teams_service
+    import tournament_service
+
+    store = storage.client("memory")
+    for module in (match_service, player_service, schedule_service, teams_service, tournament_service):
+        monkeypatch.setattr(module.db, "_client", store)
+        monkeypatch.setattr(module.db, "_pid", os.getpid())
+    return store
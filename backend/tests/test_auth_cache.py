@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+import auth_cache
+
+
+@pytest.fixture
+def verified(monkeypatch):
+    """Stand in for firebase_admin's verifier; returns the tokens it was asked to check."""
+    calls = []
+
+    def verify_id_token(id_token, app=None):
+        calls.append(id_token)
+        if id_token == "bad":
+            raise ValueError("invalid token")
+        return {"uid": id_token, "exp": time.time() + (-1 if id_token == "expired" else 3600)}
+
+    monkeypatch.setattr(auth_cache.auth, "verify_id_token", verify_id_token)
+    return calls
+
+
+def test_verified_tokens_are_reused_until_they_expire(verified):
+    cache = auth_cache.TokenCache(maxsize=2)
+
+    assert cache.verify("ann")["uid"] == "ann"
+    assert cache.verify("ann")["uid"] == "ann"
+    cache.verify("expired")
+    cache.verify("expired")
+    assert verified == ["ann", "expired", "expired"]
+    assert cache.stats()["hits"] == 1
+
+    cache.verify("bob")
+    cache.verify("cy")  # evicts the least recently used token
+    cache.verify("ann")
+    assert verified[-1] == "ann" and cache.stats()["size"] == 2
+
+
+def test_failed_verification_is_not_cached(verified):
+    cache = auth_cache.TokenCache()
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.verify("bad")
+    assert verified == ["bad", "bad"] and cache.stats()["size"] == 0
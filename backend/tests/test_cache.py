@@ -0,0 +1,30 @@
+from cache import LRUTTLCache
+
+
+def test_value_loaded_across_an_invalidation_is_not_cached():
+    cache = LRUTTLCache(ttl=30)
+    version = cache.version("t1")
+    cache.invalidate("t1")
+    cache.set("t1", "stale", version)
+    assert cache.get("t1") is None
+
+    cache.set("t1", "fresh", cache.version("t1"))
+    assert cache.get("t1") == "fresh"
+
+
+def test_invalidations_older_than_the_ttl_are_forgotten(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = LRUTTLCache(ttl=10)
+    slow_load = cache.version("t0")
+    cache.invalidate("t0")
+    for i in range(1000):
+        now[0] += 1
+        cache.invalidate(f"t{i}")
+
+    assert len(cache._invalidated) <= 11
+    # t0's stamp is gone, but a load that started before it still can't land
+    cache.set("t0", "stale", slow_load)
+    assert cache.get("t0") is None
+    cache.set("t0", "fresh", cache.version("t0"))
+    assert cache.get("t0") == "fresh"
@@ -0,0 +1,26 @@
+import finalize_match_outcome_service
+import match_service
+import tournament_service
+
+
+def test_finalize_updates_the_match_and_the_team_stats(services):
+    services["match-service:5004"] = match_app = match_service.create_app()
+    services["tournament-service:5002"] = tournament_app = tournament_service.create_app()
+    matches, tournament = match_app.test_client(), tournament_app.test_client()
+    tournament.post("/tournament", json={"tournament_id": "fm-cup", "name": "Cup"})
+    for team_id, player in (("red", "ann"), ("blue", "bob")):
+        tournament.post("/tournament/fm-cup/add_team", json={"teamId": team_id, "players": [player]})
+    match_id = matches.post("/match", json={
+        "tournamentId": "fm-cup", "teamAId": "red", "teamBId": "blue", "scheduledTime": "Monday",
+        "status": "ongoing", "roundNumber": 1}).get_json()["matchId"]
+    client = finalize_match_outcome_service.create_app().test_client()
+
+    response = client.post("/finalize-outcome", json={"matchId": match_id, "result": "teamB won",
+                                                      "score": {"teamA": 0, "teamB": 2}})
+    assert response.status_code == 200, response.get_json()
+
+    assert matches.get(f"/match/{match_id}").get_json()["status"] == "completed"
+    teams = tournament.get("/tournament/fm-cup").get_json()["teams"]
+    assert [(t["teamId"], t["teamStats"]["wins"], t["teamStats"]["losses"]) for t in teams] == [
+        ("red", 0, 1), ("blue", 1, 0)]
+    assert client.post("/finalize-outcome", json={"matchId": "fm-missing", "result": "draw"}).status_code == 404
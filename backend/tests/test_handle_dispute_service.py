@@ -0,0 +1,66 @@
+import pytest
+from flask import Flask, request
+
+import finalize_match_outcome_service
+import handle_dispute_service
+import match_service
+import player_service
+import rating
+import tournament_service
+
+OUTSYSTEMS = "personal-xxidmbev.outsystemscloud.com"
+
+
+def outsystems_stub(disputes):
+    app = Flask("outsystems")
+
+    @app.route("/disputeAPI/rest/v1/disputes", methods=["GET", "POST", "PUT"])
+    def disputes_api():
+        if request.method != "GET":
+            disputes.append((request.method, request.get_json()))
+        return {"disputes": [body for _, body in disputes]}
+
+    return app
+
+
+def test_resolving_a_dispute_rebuilds_ratings_from_match_history(services, notifications, shared_store):
+    disputes = []
+    services.update({
+        OUTSYSTEMS: outsystems_stub(disputes),
+        "player-service:5001": player_service.create_app(),
+        "finalize-match-outcome-service:5009": finalize_match_outcome_service.create_app(),
+        "match-service:5004": match_service.create_app(),
+        "tournament-service:5002": tournament_service.create_app(),
+    })
+    player_service.db.collection("players").document("hdAnn").set({"username": "Ann"})
+    tournament = services["tournament-service:5002"].test_client()
+    tournament.post("/tournament", json={"tournament_id": "hd-cup", "name": "Cup"})
+    for team_id, player in (("red", "hdAnn"), ("blue", "bob")):
+        tournament.post("/tournament/hd-cup/add_team", json={"teamId": team_id, "players": [player]})
+    matches = services["match-service:5004"].test_client()
+    match_id = matches.post("/match", json={
+        "tournamentId": "hd-cup", "teamAId": "red", "teamBId": "blue", "scheduledTime": "Monday",
+        "status": "ongoing", "roundNumber": 1}).get_json()["matchId"]
+    finalize = services["finalize-match-outcome-service:5009"].test_client()
+    assert finalize.post("/finalize-outcome", json={"matchId": match_id, "result": "teamB won"}).status_code == 200
+    client = handle_dispute_service.create_app().test_client()
+
+    raised = {"matchId": match_id, "status": "open", "raisedBy": "hdAnn", "teamId": "red",
+              "reason": "Wrong score", "evidenceUrl": "https://example.com/clip"}
+    assert client.post("/dispute/new", json=raised).status_code == 200
+    assert client.post("/dispute/new", json={"matchId": match_id}).status_code == 400
+    assert client.get("/dispute").get_json() == {"disputes": [raised]}
+
+    response = client.post("/dispute/resolve", json={"matchId": match_id, "status": "resolved", "result": "teamA won",
+                                                     "score": {"teamA": 1, "teamB": 0}, "raisedBy": "hdAnn"})
+    assert response.status_code == 200, response.get_json()
+    assert notifications == ["notify_moderator", "dispute_outcome"]
+    assert disputes[-1] == ("PUT", {"matchId": match_id, "status": "resolved"})
+    match = matches.get(f"/match/{match_id}").get_json()
+    assert (match["result"], match["status"]) == ("teamA won", "completed")
+
+    # The overturned result is replaced, not stacked on top of the first one
+    teams = tournament.get("/tournament/hd-cup").get_json()["teams"]
+    expected = rating.update(1500, 1500, "teamA won")
+    assert [t["teamStats"]["elo"] for t in teams] == pytest.approx(expected)
+    assert [(t["teamStats"]["wins"], t["teamStats"]["losses"]) for t in teams] == [(1, 0), (0, 1)]
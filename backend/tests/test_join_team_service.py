@@ -0,0 +1,56 @@
+import join_team_service
+import player_service
+import teams_service
+import tournament_service
+
+
+def test_tournament_details_enrich_teams_from_one_batch_lookup(services):
+    services.update({
+        "teams-service:5003": teams_service.create_app(),
+        "tournament-service:5002": tournament_service.create_app(),
+    })
+    for team_id, name, players in (("jd-red", "Red", {"jdAnn": "Ann"}), ("jd-blue", "Blue", {})):
+        teams_service.db.collection("teams").document(team_id).set({
+            "name": name, "team_id": team_id, "captain_id": "cap", "captain_name": "Cap", "players": players})
+    tournament = services["tournament-service:5002"].test_client()
+    tournament.post("/tournament", json={"tournament_id": "jd-cup", "name": "Cup"})
+    for team_id, player in (("jd-red", "jdAnn"), ("jd-blue", "jdBob"), ("jd-gone", "jdCy")):
+        tournament.post("/tournament/jd-cup/add_team", json={"teamId": team_id, "players": [player]})
+    client = join_team_service.create_app().test_client()
+
+    details = client.get("/composite/tournament_details_with_teams/jd-cup").get_json()
+
+    assert details["tournamentName"] == "Cup"
+    red, blue, gone = details["enrichedTeams"]
+    assert red == {"teamId": "jd-red", "name": "Red", "players": {"jdAnn": "Ann"}}
+    assert blue == {"teamId": "jd-blue", "name": "Blue", "players": {}}
+    # Teams missing from teams-service are passed through as the tournament has them
+    assert gone["teamId"] == "jd-gone" and gone["players"] == ["jdCy"]
+    assert client.get("/composite/tournament_details_with_teams/jd-none").status_code == 404
+
+
+def test_join_team_through_the_services(services, notifications, fake_auth, monkeypatch):
+    queued = []
+    monkeypatch.setattr(join_team_service.event_publisher, "publish",
+                        lambda queue_name, message: queued.append(queue_name) or True)
+    services.update({
+        "player-service:5001": player_service.create_app(),
+        "teams-service:5003": teams_service.create_app(),
+        "tournament-service:5002": tournament_service.create_app(),
+    })
+    player_service.db.collection("players").document("jtAnn").set({"username": "Ann"})
+    teams_service.db.collection("teams").document("jt-red").set({
+        "name": "Red", "team_id": "jt-red", "captain_id": "cap", "captain_name": "Cap", "players": {}})
+    tournament = services["tournament-service:5002"].test_client()
+    tournament.post("/tournament", json={"tournament_id": "jt-cup", "name": "Cup"})
+    tournament.post("/tournament/jt-cup/add_team", json={"teamId": "jt-red", "players": ["cap"]})
+    client = join_team_service.create_app().test_client()
+
+    response = client.post("/composite/join_team", json={"teamId": "jt-red", "tournamentId": "jt-cup"},
+                           headers={"Authorization": "Bearer jtAnn"})
+    assert response.status_code == 200, response.get_json()
+    assert notifications == ["assign_team"] and queued == ["player_events"]
+    assert teams_service.db.collection("teams").document("jt-red").get().to_dict()["players"] == {"jtAnn": "Ann"}
+    teams = services["teams-service:5003"].test_client().get("/teams", headers={"Authorization": "Bearer jtAnn"})
+    assert [team["id"] for team in teams.get_json()["teams"]] == ["jt-red"]
+
@@ -0,0 +1,77 @@
+import pytest
+
+import make_match
+import match_service
+import schedule_service
+import tournament_service
+
+
+@pytest.fixture
+def client(services, notifications):
+    services.update({
+        "schedule-service:5005": schedule_service.create_app(),
+        "tournament-service:5002": tournament_service.create_app(),
+        "match-service:5004": match_service.create_app(),
+    })
+    return make_match.create_app().test_client()
+
+
+def set_up_round(services, tournament_id, team_days):
+    tournament = services["tournament-service:5002"].test_client()
+    tournament.post("/tournament", json={"tournament_id": tournament_id, "name": tournament_id})
+    schedule = services["schedule-service:5005"].test_client()
+    schedule.post("/schedule", json={"tournamentId": tournament_id, "roundNumber": 1, "tournamentName": tournament_id})
+    for team_id, days in team_days.items():
+        tournament.post(f"/tournament/{tournament_id}/add_team", json={"teamId": team_id, "players": [f"{team_id}-p"]})
+        schedule.post(f"/schedule/{tournament_id}/availability",
+                      json={"teamId": team_id, "availableDays": days, "roundNumber": 1})
+
+
+def round_matches(services, tournament_id):
+    matches = services["match-service:5004"].test_client()
+    return matches.get(f"/tournament/{tournament_id}/matches?round=1").get_json()["matches"]
+
+
+def test_make_match_pairs_a_round(client, services, notifications):
+    set_up_round(services, "mm-cup", {"a": ["Monday"], "b": ["Monday"], "c": ["Friday"], "d": ["Friday"]})
+
+    response = client.post("/make-match", json={"tournamentId": "mm-cup", "roundNumber": 1})
+    assert response.status_code == 201, response.get_json()
+
+    pairs = {(m["teamAId"], m["teamBId"], m["scheduledTime"]) for m in round_matches(services, "mm-cup")}
+    assert {frozenset(p[:2]) for p in pairs} == {frozenset("ab"), frozenset("cd")}
+    assert notifications == ["display_matches"]
+    assert services["tournament-service:5002"].test_client().get("/tournament/mm-cup").get_json()["curRound"] == 1
+    assert client.post("/make-match", json={"tournamentId": "mm-none", "roundNumber": 1}).status_code == 404
+
+
+
+def test_round_update_does_not_wait_on_a_failed_announcement(client, services):
+    set_up_round(services, "mm-quiet", {"a": ["Monday"], "b": ["Monday"]})
+    del services["notification-service:8000"]  # unreachable
+
+    response = client.post("/make-match", json={"tournamentId": "mm-quiet", "roundNumber": 1})
+
+    assert response.status_code == 500 and response.get_json()["error"] == "Failed to display matches"
+    assert len(round_matches(services, "mm-quiet")) == 1
+    assert services["tournament-service:5002"].test_client().get("/tournament/mm-quiet").get_json()["curRound"] == 1
+
+
+def test_bulk_make_match_reports_each_round(client, services):
+    set_up_round(services, "mm-b1", {"a": ["Monday"], "b": ["Monday"]})
+    set_up_round(services, "mm-b2", {"a": ["Monday"], "b": ["Tuesday"], "c": ["Monday"]})
+
+    response = client.post("/make-match/bulk", json={"rounds": [
+        {"tournamentId": "mm-b1", "roundNumber": 1},
+        {"tournamentId": "mm-b2", "roundNumber": 1},
+        {"tournamentId": "mm-none", "roundNumber": 1},
+        {"roundNumber": "x"}]})
+    body = response.get_json()
+    assert response.status_code == 200 and body["created"] == 1
+    first, *failed = body["reports"]
+    assert first["matches"] == 1 and first["notified"] and first["roundUpdated"]
+    assert [report["error"] for report in failed] == [
+        "Unable to pair all teams. Check availability.",
+        "No schedule found for that round",
+        "Missing tournamentId or invalid roundNumber"]
+    assert len(round_matches(services, "mm-b1")) == 1
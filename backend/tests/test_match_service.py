@@ -0,0 +1,80 @@
+import pytest
+
+import match_service
+
+
+@pytest.fixture
+def client():
+    return match_service.create_app().test_client()
+
+
+def match(tournament_id, round_number, time, team_a="red", team_b="blue"):
+    return {"tournamentId": tournament_id, "teamAId": team_a, "teamBId": team_b,
+            "scheduledTime": time, "status": "scheduled", "roundNumber": round_number}
+
+
+def test_batch_create_writes_every_match_across_chunks(client, monkeypatch):
+    monkeypatch.setattr(match_service, "BATCH_LIMIT", 2)
+    matches = [match("ms-batch", 1, f"{10 + i}:00", team_a=f"t{2 * i}", team_b=f"t{2 * i + 1}") for i in range(5)]
+
+    response = client.post("/matches/batch", json={"matches": matches})
+
+    assert response.status_code == 201
+    match_ids = response.get_json()["matchIds"]
+    assert len(set(match_ids)) == 5
+    created = [client.get(f"/match/{match_id}").get_json() for match_id in match_ids]
+    assert [m["teamAId"] for m in created] == ["t0", "t2", "t4", "t6", "t8"]
+    assert all(m["result"] == "pending" and m["roundNumber"] == 1 for m in created)
+
+
+def test_batch_create_rejects_the_whole_batch_on_a_bad_match(client):
+    response = client.post("/matches/batch", json={"matches": [
+        match("ms-bad", 1, "10:00"), {"tournamentId": "ms-bad"}]})
+
+    assert response.status_code == 400
+    assert "Match 1" in response.get_json()["error"]
+    assert not list(match_service.match_ref.where("tournamentId", "==", "ms-bad").stream())
+    assert client.post("/matches/batch", json={"matches": []}).status_code == 400
+
+
+
+def test_single_create_shares_the_batch_validation(client):
+    response = client.post("/match", json=match("ms-single", "1", "10:00"))
+    assert response.status_code == 201
+
+    created = client.get(f"/match/{response.get_json()['matchId']}").get_json()
+    assert (created["roundNumber"], created["result"]) == (1, "pending")
+    assert client.post("/match", json=match("ms-single", "first", "10:00")).status_code == 400
+    assert client.get("/match/ms-missing").status_code == 404
+
+def test_tournament_matches_are_paged_with_team_names(client):
+    match_service.tournament_ref.document("ms-league").set({"name": "League"})
+    match_service.team_ref.document("red").set({"name": "Red Wolves"})
+    matches = [match("ms-league", 2, "09:00"), match("ms-league", "1", "11:00"), match("ms-league", 1, "10:00")]
+    response = client.post("/matches/batch", json={"matches": matches})
+    assert response.status_code == 201
+
+    page = client.get("/tournament/ms-league/matches?limit=2").get_json()
+    assert [(m["roundNumber"], m["scheduledTime"]) for m in page["matches"]] == [(1, "10:00"), (1, "11:00")]
+    assert page["total"] == 3 and page["nextOffset"] == 2
+    assert page["tournamentName"] == "League"
+    # Teams without a document fall back to their ID
+    assert (page["matches"][0]["teamAName"], page["matches"][0]["teamBName"]) == ("Red Wolves", "blue")
+    last = client.get("/tournament/ms-league/matches?limit=2&offset=2").get_json()
+    assert [m["roundNumber"] for m in last["matches"]] == [2] and last["nextOffset"] is None
+    assert client.get("/tournament/ms-league/matches?round=2").get_json()["total"] == 1
+    assert client.get("/tournament/ms-league/matches?round=last").status_code == 400
+
+
+def test_tournament_matches_are_cached_until_a_match_changes(client):
+    client.post("/matches/batch", json={"matches": [match("ms-cached", 1, "10:00")]})
+    first = client.get("/tournament/ms-cached/matches")
+    hits = match_service.matches_cache.stats()["hits"]
+    assert client.get("/tournament/ms-cached/matches", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert match_service.matches_cache.stats()["hits"] == hits + 1
+
+    match_id = client.post("/match", json=match("ms-cached", 2, "12:00")).get_json()["matchId"]
+    assert client.get("/tournament/ms-cached/matches").get_json()["total"] == 2
+    client.put(f"/match/{match_id}/finalize", json={"result": "teamA won", "score": {"teamA": 2}})
+    listed = client.get("/tournament/ms-cached/matches").get_json()["matches"]
+    assert [(m["status"], m["result"]) for m in listed][-1] == ("completed", "teamA won")
@@ -0,0 +1,60 @@
+import requests
+from requests.adapters import BaseAdapter
+
+import metrics
+import tournament_service
+
+
+def latency_count(route):
+    return sum(sum(series[:-1]) for labels, series in metrics.request_latency._series.items()
+               if labels[2] == route)
+
+
+def reads_count(route):
+    return metrics.reads_total._values.get((metrics._service, route), 0)
+
+
+def outbound_count(target):
+    return sum(sum(series[:-1]) for labels, series in metrics.outbound_latency._series.items()
+               if labels[1] == target)
+
+
+class OkAdapter(BaseAdapter):
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_streamed_response_is_counted_once_the_body_is_sent():
+    client = tournament_service.create_app().test_client()
+    for i in range(3):
+        client.post("/tournament", json={"tournament_id": f"metrics-{i}", "name": f"Cup {i}"})
+    before = latency_count("/tournaments"), reads_count("/tournaments")
+
+    response = client.get("/tournaments")
+    assert response.status_code == 200
+    assert len(response.get_json()) >= 3
+    response.close()
+
+    # The documents are read while the body streams, after the view returned
+    assert latency_count("/tournaments") == before[0] + 1
+    assert reads_count("/tournaments") >= before[1] + 3
+
+
+def test_outbound_calls_are_timed_once_however_many_apps_are_built():
+    # Each create_app() instruments requests for metrics and tracing
+    tournament_service.create_app()
+    tournament_service.create_app()
+    session = requests.Session()
+    session.mount("http://metrics-test/", OkAdapter())
+    before = outbound_count("metrics-test")
+
+    session.get("http://metrics-test/ping")
+
+    assert outbound_count("metrics-test") == before + 1
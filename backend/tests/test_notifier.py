@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from notifier import MAX_MESSAGE_CHARS, Notifier
+
+LIMIT, PERIOD = 5, 0.2
+HEADER = "📅 Upcoming matches for Tournament T1, round 1:"
+
+
+class RateLimited(Exception):
+    """Shaped like discord.RateLimited: a 429 with the wait Discord asks for."""
+
+    status = 429
+
+    def __init__(self, retry_after):
+        super().__init__(f"429, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class FakeDiscord:
+    def __init__(self, failures=()):
+        self.sent = []  # (route, time the send started, text)
+        self.attempts = []
+        self.failures = list(failures)  # raised by the first sends, in order
+
+    async def send(self, route, text):
+        started = time.monotonic()
+        self.attempts.append(started)
+        if self.failures:
+            raise self.failures.pop(0)
+        await asyncio.sleep(0.001)
+        self.sent.append((route, started, text))
+
+    async def channel_send(self, text):
+        await self.send("channel", text)
+
+    async def dm(self, username, text):
+        await self.send("dm", f"{username}: {text}")
+
+
+def notifier(**kwargs):
+    return Notifier({"channel": (LIMIT, PERIOD), "dm": (LIMIT, PERIOD)}, **kwargs)
+
+
+def test_a_200_match_round_is_coalesced_into_5_messages():
+    async def run():
+        discord = FakeDiscord()
+        queue = notifier(max_queue=10, retry_delay=0.01)
+        lines = [f"• Team team-{2 * i} vs Team team-{2 * i + 1} on Monday" for i in range(200)]
+        assert queue.submit_lines("channel", ("matches", "T1", 1), HEADER, lines[:150], discord.channel_send)
+        for line in lines[150:]:  # the rest arrive one request at a time
+            assert queue.submit_lines("channel", ("matches", "T1", 1), HEADER, [line], discord.channel_send)
+        await queue.drain()
+        return discord, queue, lines
+
+    discord, queue, lines = asyncio.run(run())
+
+    texts = [text for _, _, text in discord.sent]
+    assert len(texts) == 5 and queue.stats()["coalesced"] == 195
+    assert all(text.startswith(HEADER) and len(text) <= MAX_MESSAGE_CHARS for text in texts)
+    assert [line for text in texts for line in text.split("\n")[1:]] == lines
+
+
+def test_each_route_is_held_to_its_own_rate_limit():
+    async def run():
+        discord = FakeDiscord()
+        queue = notifier(workers=4)
+        started = time.monotonic()
+        for i in range(12):
+            assert queue.submit("dm", discord.dm, f"player{i}", "you have joined a team")
+            assert queue.submit("channel", discord.channel_send, f"match {i}")
+        await queue.drain()
+        return discord, started
+
+    discord, started = asyncio.run(run())
+
+    for route in ("channel", "dm"):
+        times = sorted(t for r, t, _ in discord.sent if r == route)
+        assert len(times) == 12
+        # No LIMIT + 1 sends inside one PERIOD, so 12 sends need two full periods
+        assert all(times[i] - times[i - LIMIT] >= PERIOD - 1e-3 for i in range(LIMIT, len(times)))
+        assert times[-1] - started >= 2 * PERIOD - 1e-3
+
+
+def test_a_rate_limited_send_is_retried_after_retry_after():
+    async def run():
+        discord = FakeDiscord(failures=[RateLimited(retry_after=0.3)])
+        queue = notifier(retry_delay=0.01)
+        assert queue.submit("dm", discord.dm, "ann", "your dispute was resolved")
+        await queue.drain()
+        return discord, queue
+
+    discord, queue = asyncio.run(run())
+
+    assert [text for _, _, text in discord.sent] == ["ann: your dispute was resolved"]
+    assert discord.attempts[1] - discord.attempts[0] >= 0.3
+    stats = queue.stats()
+    assert (stats["sent"], stats["retried"], stats["failed"]) == (1, 1, 0)
+
+
+def test_a_full_queue_rejects_new_jobs():
+    async def run():
+        discord = FakeDiscord()
+        queue = notifier(max_queue=2, workers=1)
+        accepted = [queue.submit("dm", discord.dm, f"player{i}", "hello") for i in range(3)]
+        line_accepted = queue.submit_lines("channel", "round", HEADER, ["• a vs b"], discord.channel_send)
+        dropped = queue.stats()["dropped"]
+        await queue.drain()
+        return discord, accepted, line_accepted, dropped
+
+    discord, accepted, line_accepted, dropped = asyncio.run(run())
+
+    assert accepted == [True, True, False] and line_accepted is False and dropped == 2
+    assert [text for _, _, text in discord.sent] == ["player0: hello", "player1: hello"]
@@ -0,0 +1,100 @@
+import random
+from functools import lru_cache
+
+from pairing import availability_to_masks, create_match_pairs
+
+
+def make_teams(n):
+    # t0 ranks highest: most wins, then highest ELO
+    return [{"teamId": f"t{i}", "teamStats": {"wins": n - i, "elo": 1500}} for i in range(n)]
+
+
+def best_pair_count(team_ids, masks):
+    """Exhaustive maximum matching size, for small cases only."""
+    ids = [t for t in team_ids if masks.get(t, 0)]
+
+    @lru_cache(maxsize=None)
+    def solve(left):
+        if not left:
+            return 0
+        first = (left & -left).bit_length() - 1
+        rest = left & ~(1 << first)
+        best = solve(rest)
+        for j in range(first + 1, len(ids)):
+            if rest >> j & 1 and masks[ids[first]] & masks[ids[j]]:
+                best = max(best, 1 + solve(rest & ~(1 << j)))
+        return best
+
+    return solve((1 << len(ids)) - 1)
+
+
+def assert_valid(pairs, days, masks):
+    seen = []
+    for pair in pairs:
+        bit = 1 << days.index(pair["day"])
+        assert masks[pair["teamA"]] & bit and masks[pair["teamB"]] & bit, pair
+        seen += [pair["teamA"], pair["teamB"]]
+    assert len(seen) == len(set(seen)), "a team was paired twice"
+
+
+def test_full_pairing_found_where_greedy_fails():
+    # t0 and t1 both prefer Monday; pairing them leaves t2 (Mon) and t3 (Tue)
+    # without an opponent
+    days = ["Mon", "Tue"]
+    masks = {"t0": 0b11, "t1": 0b11, "t2": 0b01, "t3": 0b10}
+
+    pairs = create_match_pairs(make_teams(4), days, masks)
+
+    assert len(pairs) == 2
+    assert_valid(pairs, days, masks)
+
+
+def test_matches_an_exhaustive_search_on_random_availability():
+    rng = random.Random(7)
+    for _ in range(300):
+        n = rng.randint(2, 12)
+        days = ["Mon", "Tue", "Wed", "Thu"][:rng.randint(1, 4)]
+        teams = make_teams(n)
+        masks = {t["teamId"]: rng.randrange(1 << len(days)) for t in teams}
+
+        pairs = create_match_pairs(teams, days, masks)
+
+        assert_valid(pairs, days, masks)
+        assert len(pairs) == best_pair_count(tuple(masks), masks), masks
+
+
+def test_large_team_types_keep_their_parity():
+    # More Monday-only teams than popcount + 2, so most of them pair up
+    # outside the compressed graph. The Mon|Tue team has to take the
+    # Tue-only team, and an odd Monday team is the only one left over
+    days = ["Mon", "Tue"]
+    for mondays in (6, 7):
+        masks = {f"t{i}": 0b01 for i in range(mondays)}
+        masks[f"t{mondays}"] = 0b11
+        masks[f"t{mondays + 1}"] = 0b10
+        teams = make_teams(mondays + 2)
+
+        pairs = create_match_pairs(teams, days, masks)
+
+        assert_valid(pairs, days, masks)
+        assert len(pairs) == best_pair_count(tuple(masks), masks) == (mondays + 2) // 2
+
+
+def test_teams_without_a_day_are_left_out():
+    days, masks = availability_to_masks({"Mon": ["t0", "t1", "t2"], "Tue": []})
+
+    pairs = create_match_pairs(make_teams(4), days, masks)
+
+    assert pairs == [{"teamA": "t0", "teamB": "t1", "day": "Mon"}]
+    assert create_match_pairs(make_teams(2), days, {}) == []
+
+
+def test_more_than_64_days():
+    days = [f"slot-{i}" for i in range(70)]
+    masks = {"t0": 1 << 69, "t1": 1 << 69 | 1, "t2": 1 | 1 << 65, "t3": 1 << 65}
+
+    pairs = create_match_pairs(make_teams(4), days, masks)
+
+    assert_valid(pairs, days, masks)
+    assert sorted((p["teamA"], p["teamB"], p["day"]) for p in pairs) == [
+        ("t0", "t1", "slot-69"), ("t2", "t3", "slot-65")]
@@ -0,0 +1,25 @@
+import pytest
+
+import player_service
+
+
+@pytest.fixture
+def client(fake_auth):
+    return player_service.create_app().test_client()
+
+
+def test_profile_and_team_lookup(client):
+    db = player_service.db
+    db.collection("players").document("plAnn").set({"playerId": "plAnn", "username": "Ann"})
+    db.collection("teams").document("pl-red").set({
+        "team_id": "pl-red", "name": "Red", "players": {"plAnn": "Ann"}, "tournaments": {"pl-cup": "Cup"}})
+
+    assert client.get("/player/plAnn").get_json()["username"] == "Ann"
+    assert client.get("/player/pl-nobody").status_code == 404
+    headers = {"Authorization": "Bearer plAnn"}
+    assert client.get("/player/profile", headers=headers).get_json() == {"userId": "plAnn", "username": "Ann"}
+    assert client.get("/player/profile").status_code == 401
+
+    in_team = client.get("/player/my_teams?tournamentId=pl-cup", headers=headers).get_json()
+    assert in_team == {"inTeam": True, "teamId": "pl-red", "teamName": "Red"}
+    assert client.get("/player/my_teams?tournamentId=pl-other", headers=headers).get_json() == {"inTeam": False}
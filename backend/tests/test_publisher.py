@@ -0,0 +1,188 @@
+"""EventPublisher against a fake broker that fails in the ways a real one does."""
+import heapq
+import json
+import itertools
+import threading
+import time
+from queue import Empty, Queue
+from types import SimpleNamespace
+
+from pika.spec import Basic
+
+from publisher import EventPublisher
+
+
+class FakeIOLoop:
+    def __init__(self):
+        self._calls = Queue()
+        self._timers = []
+        self._order = itertools.count()
+        self._running = False
+
+    def add_callback_threadsafe(self, callback):
+        self._calls.put(callback)
+
+    def call_later(self, delay, callback):
+        heapq.heappush(self._timers, (time.monotonic() + delay, next(self._order), callback))
+
+    def start(self):
+        self._running = True
+        while self._running:
+            try:
+                self._calls.get(timeout=0.001)()
+            except Empty:
+                pass
+            while self._running and self._timers and self._timers[0][0] <= time.monotonic():
+                heapq.heappop(self._timers)[2]()
+
+    def stop(self):
+        self._running = False
+
+
+class FakeBroker:
+    """Refuses the first ``refuse`` connects, drops the connection on every
+    ``drop_every``th publish and nacks every ``nack_every``th one."""
+
+    def __init__(self, refuse=2, drop_every=250, nack_every=97):
+        self.refuse = refuse
+        self.drop_every = drop_every
+        self.nack_every = nack_every
+        self.received = []  # bodies, in arrival order, duplicates included
+        self.publishes = 0
+        self.connects = 0
+        self.max_unacked = 0
+        self.lock = threading.Lock()
+
+    def connection_class(self, parameters, on_open_callback, on_open_error_callback, on_close_callback):
+        return FakeConnection(self, on_open_callback, on_open_error_callback, on_close_callback)
+
+
+class FakeConnection:
+    def __init__(self, broker, on_open, on_open_error, on_close):
+        self.broker = broker
+        self.ioloop = FakeIOLoop()
+        self.is_open = False
+        self._on_close = on_close
+        broker.connects += 1
+        if broker.connects <= broker.refuse:
+            self.ioloop.add_callback_threadsafe(lambda: on_open_error(self, ConnectionRefusedError("refused")))
+        else:
+            self.is_open = True
+            self.ioloop.add_callback_threadsafe(lambda: on_open(self))
+
+    def channel(self, on_open_callback):
+        channel = FakeChannel(self)
+        self.ioloop.add_callback_threadsafe(lambda: on_open_callback(channel))
+
+    def close(self, reason="closed by client"):
+        if self.is_open:
+            self.is_open = False
+            self.ioloop.add_callback_threadsafe(lambda: self._on_close(self, reason))
+
+
+class FakeChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.queues = set()
+        self._tag = 0
+        self._unacked = []  # (tag, nack)
+        self._on_confirm = None
+
+    @property
+    def is_open(self):
+        return self.connection.is_open
+
+    def add_on_close_callback(self, callback):
+        pass
+
+    def confirm_delivery(self, ack_nack_callback, callback):
+        self._on_confirm = ack_nack_callback
+        self.connection.ioloop.add_callback_threadsafe(lambda: callback(None))
+
+    def queue_declare(self, queue, durable, callback):
+        self.queues.add(queue)
+        self.connection.ioloop.add_callback_threadsafe(lambda: callback(None))
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        assert routing_key in self.queues, "published before the queue was declared"
+        broker = self.broker
+        broker.publishes += 1
+        self._tag += 1
+        if broker.publishes % broker.drop_every == 0:
+            # Acks already on the wire arrive; those for the last few
+            # publishes are lost with the connection
+            self.connection.close("connection reset")
+            self._deliver(self._unacked[:-5])
+            self._unacked = []
+            return
+        nack = broker.publishes % broker.nack_every == 0
+        if not nack:
+            broker.received.append(body)
+        self._unacked.append((self._tag, nack))
+        broker.max_unacked = max(broker.max_unacked, len(self._unacked))
+        self.connection.ioloop.add_callback_threadsafe(self._confirm)
+
+    def _confirm(self):
+        if self.is_open and self._unacked:
+            unacked, self._unacked = self._unacked, []
+            self._deliver(unacked)
+
+    # Acks everything outstanding with one multiple=True frame; nacks singly
+    def _deliver(self, unacked):
+        for tag, nack in unacked:
+            if nack:
+                self._on_confirm(SimpleNamespace(method=Basic.Nack(delivery_tag=tag, multiple=False)))
+        acked = [tag for tag, nack in unacked if not nack]
+        if acked:
+            self._on_confirm(SimpleNamespace(method=Basic.Ack(delivery_tag=max(acked), multiple=True)))
+
+
+def make_publisher(broker, **kwargs):
+    publisher = EventPublisher(host="fake", max_backoff=0.01, **kwargs)
+    publisher.connection_class = broker.connection_class
+    return publisher
+
+
+def publish_all(publisher, count):
+    sent = [json.dumps({"event": "player_joined", "n": i}) for i in range(count)]
+    for body in sent:
+        assert publisher.publish("player_events", json.loads(body))
+    assert publisher.flush(timeout=10)
+    publisher.close()
+    return sent
+
+
+def test_refused_and_dropped_connections_lose_nothing_and_keep_order():
+    broker = FakeBroker(refuse=2, drop_every=250, nack_every=10 ** 9)
+    publisher = make_publisher(broker)
+    sent = publish_all(publisher, 2000)
+
+    # At least once: duplicates are allowed, losses and reordering are not
+    assert list(dict.fromkeys(broker.received)) == sent
+    assert publisher.stats()["published"] == 2000
+    assert publisher.stats()["buffered"] == 0
+    assert publisher.connects > 2  # reconnected after drops
+
+
+def test_nacked_messages_are_sent_again():
+    broker = FakeBroker(refuse=0, drop_every=250, nack_every=97)
+    publisher = make_publisher(broker)
+    sent = publish_all(publisher, 2000)
+
+    assert set(broker.received) == set(sent)
+    assert publisher.stats()["published"] == 2000
+    assert publisher.stats()["buffered"] == 0
+
+
+def test_confirms_are_pipelined():
+    broker = FakeBroker(refuse=0, drop_every=10 ** 9, nack_every=10 ** 9)
+    publisher = make_publisher(broker, max_in_flight=50)
+    for i in range(500):
+        publisher.publish("player_events", {"n": i})
+    assert publisher.flush(timeout=10)
+    publisher.close()
+
+    # Many publishes were outstanding at once, never more than the window
+    assert 1 < broker.max_unacked <= 50
+    assert len(broker.received) == 500
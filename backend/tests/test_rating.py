@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import rating
+
+
+def replay(team_ids, matches, initial=None):
+    """Finalize played matches one at a time, in round order."""
+    ratings = {t: (initial or {}).get(t, rating.DEFAULT_RATING) for t in team_ids}
+    for m in sorted(matches, key=lambda m: m.get("roundNumber") or 0):
+        a, b = m.get("teamAId"), m.get("teamBId")
+        if m.get("result") in rating.RESULT_SCORES and a in ratings and b in ratings and a != b:
+            ratings[a], ratings[b] = rating.update(ratings[a], ratings[b], m["result"])
+    return ratings
+
+
+def match(round_number, team_a, team_b, result):
+    return {"roundNumber": round_number, "teamAId": team_a, "teamBId": team_b, "result": result}
+
+
+def test_team_playing_twice_in_a_round_matches_sequential_updates():
+    matches = [match(1, "a", "b", "teamA won"), match(1, "a", "c", "teamA won")]
+
+    rebuilt = rating.recompute(["a", "b", "c"], matches)
+
+    assert [round(rebuilt[t]["elo"], 2) for t in "abc"] == [1531.26, 1484.0, 1484.74]
+    assert rebuilt["a"]["wins"] == 2 and rebuilt["b"]["losses"] == rebuilt["c"]["losses"] == 1
+
+
+def test_recompute_matches_a_sequential_replay():
+    rng = random.Random(3)
+    team_ids = [f"t{i}" for i in range(12)]
+    initial = {t: rng.randint(1300, 1700) for t in team_ids[::3]}
+    results = ["teamA won", "teamB won", "draw", "pending"]
+    matches = []
+    for round_number in range(1, 9):
+        # Mostly one match per team, with some teams playing again and a
+        # few matches against teams outside the tournament
+        for _ in range(rng.randint(3, 10)):
+            a, b = rng.sample(team_ids + ["outsider"], 2)
+            matches.append(match(round_number, a, b, rng.choice(results)))
+    rng.shuffle(matches)
+
+    rebuilt = rating.recompute(team_ids, matches, initial)
+    expected = replay(team_ids, matches, initial)
+
+    for team_id in team_ids:
+        assert rebuilt[team_id]["elo"] == pytest.approx(expected[team_id])
+
+
+def test_pending_and_draw_results():
+    matches = [match(1, "a", "b", "draw"), match(2, "a", "b", "pending"), match(2, "b", "a", None)]
+
+    rebuilt = rating.recompute(["a", "b"], matches, {"a": 1600})
+
+    expected = rating.update(1600, 1500, "draw")
+    assert (rebuilt["a"]["elo"], rebuilt["b"]["elo"]) == pytest.approx(expected)
+    assert rebuilt["a"]["elo"] < 1600 and rebuilt["b"]["elo"] > 1500
+    assert all(rebuilt[t]["wins"] == rebuilt[t]["losses"] == 0 for t in "ab")
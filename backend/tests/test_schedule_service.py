@@ -0,0 +1,71 @@
+import pytest
+
+import schedule_service
+
+
+@pytest.fixture
+def client():
+    return schedule_service.create_app().test_client()
+
+
+def test_compact_availability_is_one_bitmask_per_team(client):
+    schedule_service.schedule_ref.document("sc-bits_1").set({
+        "tournamentId": "sc-bits", "roundNumber": 1,
+        "teamAvailableDays": {"Tuesday": ["red", "blue"], "Holiday": ["blue"], "Monday": ["red"]}})
+
+    assert client.get("/schedule/sc-bits/1/compact").get_json() == {
+        "days": ["Monday", "Tuesday", "Holiday"], "teams": {"red": 3, "blue": 6}}
+    assert client.get("/schedule/sc-bits/2/compact").status_code == 404
+
+
+def test_schedules_are_keyed_by_tournament_and_round(client):
+    body = {"tournamentId": "sc-cup", "roundNumber": "1", "tournamentName": "Cup"}
+    assert client.post("/schedule", json=body).status_code == 201
+    assert client.post("/schedule", json=dict(body, roundNumber=1)).status_code == 400
+    assert client.post("/schedule", json=dict(body, roundNumber="first")).status_code == 400
+    client.post("/schedule", json=dict(body, roundNumber=2))
+
+    assert schedule_service.schedule_ref.document("sc-cup_1").get().exists
+    assert client.get("/schedule/sc-cup/1").get_json()["roundNumber"] == 1
+    assert client.get("/schedule/sc-cup/3").status_code == 404
+    assert sorted(s["roundNumber"] for s in client.get("/schedule/by-tournament/sc-cup").get_json()) == [1, 2]
+    assert client.get("/schedule/by-tournament/sc-none").status_code == 404
+
+
+def test_availability_submissions_add_to_each_day(client):
+    client.post("/schedule", json={"tournamentId": "sc-avail", "roundNumber": 1, "tournamentName": "Avail"})
+
+    single = {"teamId": "red", "availableDays": ["Tuesday"], "roundNumber": 1}
+    assert client.post("/schedule/sc-avail/availability", json=single).status_code == 200
+    response = client.post("/schedule/sc-avail/availability/bulk", json={"roundNumber": 1, "teams": [
+        {"teamId": "red", "availableDays": ["Monday"]}, {"teamId": "blue", "availableDays": ["Tuesday"]}]})
+    assert response.status_code == 200
+    assert client.post("/schedule/sc-avail/availability", json=single).status_code == 200
+
+    schedule = client.get("/schedule/sc-avail/1").get_json()
+    assert schedule["teamAvailableDays"] == {"Monday": ["red"], "Tuesday": ["red", "blue"]}
+
+
+def test_availability_for_a_missing_round_or_bad_body_is_rejected(client):
+    client.post("/schedule", json={"tournamentId": "sc-reject", "roundNumber": 1, "tournamentName": "Reject"})
+
+    assert client.post("/schedule/sc-reject/availability",
+                       json={"teamId": "red", "availableDays": ["Monday"], "roundNumber": 9}).status_code == 404
+    assert client.post("/schedule/sc-reject/availability/bulk", json={"roundNumber": 1, "teams": [
+        {"teamId": "red"}]}).status_code == 400
+    assert client.post("/schedule/sc-reject/availability/bulk",
+                       json={"roundNumber": 2, "teams": [{"teamId": "red", "availableDays": ["Monday"]}]}).status_code == 404
+    assert client.get("/schedule/sc-reject/1").get_json()["teamAvailableDays"] == {}
+
+
+def test_compact_availability_for_many_rounds(client):
+    client.post("/schedule", json={"tournamentId": "sc-many", "roundNumber": 1, "tournamentName": "Many"})
+    client.post("/schedule/sc-many/availability/bulk", json={"roundNumber": 1, "teams": [
+        {"teamId": "red", "availableDays": ["Monday", "Tuesday"]}, {"teamId": "blue", "availableDays": ["Tuesday"]}]})
+
+    batch = client.post("/schedules/compact", json={"rounds": [
+        {"tournamentId": "sc-many", "roundNumber": "1"}, {"tournamentId": "sc-many", "roundNumber": 2}]}).get_json()
+
+    assert batch["schedules"][0]["teams"] == {"red": 3, "blue": 2}
+    assert batch["schedules"][1]["error"] == "Schedule for that round not found"
+    assert client.post("/schedules/compact", json={"rounds": [{"tournamentId": "sc-many"}]}).status_code == 400
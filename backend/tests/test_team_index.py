@@ -0,0 +1,36 @@
+import backfill_team_index
+import storage
+import team_index
+
+
+def test_memberships_written_outside_the_index_appear_after_the_backfill():
+    db = storage.client()
+    teams = db.collection("teams")
+    teams.document("ti-red").set({"name": "Red", "players": {"ti-ann": "Ann"}})
+    batch = db.batch()
+    team_index.add_team(batch, db, "ti-ann", "ti-red")
+    batch.commit()
+    # Written straight to Firestore, not through join_team
+    teams.document("ti-blue").set({"name": "Blue", "players": {"ti-ann": "Ann", "ti-bob": "Bob"}})
+
+    assert [doc.id for doc in team_index.teams_for_player(db, "ti-ann")] == ["ti-red"]
+    assert team_index.teams_for_player(db, "ti-bob") == []
+
+    team_count, player_teams = backfill_team_index.collect_memberships(db)
+    assert team_count == 2 and player_teams == {"ti-ann": ["ti-blue", "ti-red"], "ti-bob": ["ti-blue"]}
+    backfill_team_index.write_index(db, player_teams)
+    backfill_team_index.write_index(db, player_teams)  # safe to re-run
+
+    assert [doc.id for doc in team_index.teams_for_player(db, "ti-ann")] == ["ti-red", "ti-blue"]
+    assert [doc.id for doc in team_index.teams_for_player(db, "ti-bob")] == ["ti-blue"]
+
+
+def test_indexed_teams_are_checked_against_the_team_documents():
+    db = storage.client()
+    db.collection("teams").document("ti-green").set({"name": "Green", "players": {"ti-cy": "Cy"}})
+    batch = db.batch()
+    team_index.add_team(batch, db, "ti-cy", "ti-green")
+    team_index.add_team(batch, db, "ti-cy", "ti-deleted")
+    batch.commit()
+
+    assert [doc.id for doc in team_index.teams_for_player(db, "ti-cy")] == ["ti-green"]
@@ -0,0 +1,44 @@
+import pytest
+
+import teams_service
+
+
+@pytest.fixture
+def client(fake_auth):
+    return teams_service.create_app().test_client()
+
+
+def make_team(team_id, players):
+    teams_service.db.collection("teams").document(team_id).set({
+        "name": team_id.title(), "team_id": team_id, "captain_id": "cap", "captain_name": "Cap",
+        "players": players, "tournaments": {"cup": "Cup"}})
+
+
+def join(client, team_id, uid):
+    return client.post(f"/team/{team_id}/join", json={"name": uid.title()},
+                       headers={"Authorization": f"Bearer {uid}"})
+
+
+def test_join_team_indexes_the_player_and_enforces_the_size(client):
+    make_team("tm-wolves", {"tm-cap": "Cap"})
+    assert join(client, "tm-wolves", "tm-ann").status_code == 200
+    assert join(client, "tm-wolves", "tm-ann").get_json()["message"] == "User already in this team"
+    for uid in ("tm-b", "tm-c", "tm-d"):
+        join(client, "tm-wolves", uid)
+    assert join(client, "tm-wolves", "tm-late").status_code == 400
+    assert join(client, "tm-nowhere", "tm-ann").status_code == 404
+
+    teams = client.get("/teams", headers={"Authorization": "Bearer tm-ann"}).get_json()["teams"]
+    assert [team["id"] for team in teams] == ["tm-wolves"]
+    assert client.get("/team/tm-wolves").get_json()["player_ids"] == ["tm-cap", "tm-ann", "tm-b", "tm-c", "tm-d"]
+
+
+
+def test_teams_batch_by_query_and_body(client):
+    make_team("tm-x", {})
+    make_team("tm-y", {})
+    by_query = client.get("/teams/batch?ids=tm-y,tm-none,tm-x").get_json()
+    assert [team["teamId"] for team in by_query["teams"]] == ["tm-y", "tm-x"]
+    assert by_query["missing"] == ["tm-none"]
+    by_body = client.post("/teams/batch", json={"ids": ["tm-x", "tm-x"]}).get_json()
+    assert [team["teamId"] for team in by_body["teams"]] == ["tm-x"]
@@ -0,0 +1,187 @@
+import json
+
+import pytest
+
+import rating
+import tournament_service
+
+
+@pytest.fixture
+def client():
+    return tournament_service.create_app().test_client()
+
+
+def add_team(client, tournament_id, team_id, players, elo=None):
+    body = {"teamId": team_id, "players": players}
+    if elo is not None:
+        body["elo"] = elo
+    response = client.post(f"/tournament/{tournament_id}/add_team", json=body)
+    assert response.status_code == 200, response.get_json()
+
+
+def team_stats(client, tournament_id):
+    teams = client.get(f"/tournament/{tournament_id}").get_json()["teams"]
+    return {team["teamId"]: team["teamStats"] for team in teams}
+
+
+def test_match_outcomes_update_only_the_two_teams(client):
+    client.post("/tournament", json={"tournament_id": "ts-outcome", "name": "Outcome"})
+    for team_id, player in (("red", "ann"), ("blue", "bob"), ("green", "cy")):
+        add_team(client, "ts-outcome", team_id, [player])
+
+    response = client.post("/tournament/ts-outcome/match_outcome",
+                           json={"teamAId": "red", "teamBId": "blue", "result": "teamA won"})
+    assert response.status_code == 200
+    client.post("/tournament/ts-outcome/match_outcome",
+                json={"teamAId": "green", "teamBId": "red", "result": "draw"})
+
+    stats = team_stats(client, "ts-outcome")
+    assert {team: (s["wins"], s["losses"]) for team, s in stats.items()} == {
+        "red": (1, 0), "blue": (0, 1), "green": (0, 0)}
+    # green drew with a stronger red, so gains what red loses
+    assert stats["green"]["elo"] > 1500 > stats["blue"]["elo"]
+    assert stats["red"]["elo"] + stats["blue"]["elo"] + stats["green"]["elo"] == pytest.approx(4500)
+    assert client.post("/tournament/ts-outcome/match_outcome",
+                       json={"teamAId": "red", "teamBId": "nobody", "result": "draw"}).status_code == 404
+    assert client.post("/tournament/ts-none/match_outcome",
+                       json={"teamAId": "red", "teamBId": "blue", "result": "draw"}).status_code == 404
+
+
+def test_recompute_ratings_rebuilds_from_match_history(client):
+    client.post("/tournament", json={"tournament_id": "ts-rebuild", "name": "Rebuild"})
+    for team_id, player, elo in (("a", "p1", 1600), ("b", "p2", None), ("c", "p3", None)):
+        add_team(client, "ts-rebuild", team_id, [player], elo)
+    history = [("a", "b", "teamB won", 1), ("a", "c", "teamA won", 2), ("b", "c", "pending", 3)]
+    for team_a, team_b, result, round_number in history:
+        tournament_service.match_ref.add({"tournamentId": "ts-rebuild", "teamAId": team_a, "teamBId": team_b,
+                                          "result": result, "roundNumber": round_number})
+    # A finalized result that the history no longer agrees with
+    client.post("/tournament/ts-rebuild/match_outcome", json={"teamAId": "c", "teamBId": "b", "result": "teamA won"})
+
+    response = client.post("/tournament/ts-rebuild/recompute_ratings")
+
+    assert response.status_code == 200
+    expected = rating.recompute(["a", "b", "c"], [
+        {"teamAId": a, "teamBId": b, "result": r, "roundNumber": n} for a, b, r, n in history], {"a": 1600})
+    stats = team_stats(client, "ts-rebuild")
+    for team_id, rebuilt in expected.items():
+        assert stats[team_id]["elo"] == pytest.approx(rebuilt["elo"])
+        assert (stats[team_id]["wins"], stats[team_id]["losses"]) == (rebuilt["wins"], rebuilt["losses"])
+    assert stats["a"]["initialElo"] == 1600
+    assert client.post("/tournament/ts-none/recompute_ratings").status_code == 404
+
+
+def test_match_outcomes_update_the_standings(client):
+    client.post("/tournament", json={"tournament_id": "ts-league", "name": "League"})
+    add_team(client, "ts-league", "red", ["ann"])
+    add_team(client, "ts-league", "blue", ["bob"])
+    add_team(client, "ts-league", "green", ["cy"])
+
+    client.post("/tournament/ts-league/match_outcome", json={"teamAId": "red", "teamBId": "blue", "result": "teamA won"})
+
+    standings = client.get("/tournament/ts-league/standings").get_json()["standings"]
+    assert [(s["teamId"], s["rank"]) for s in standings] == [("red", 1), ("green", 2), ("blue", 3)]
+    assert standings[0]["wins"] == 1 and standings[2]["losses"] == 1
+    assert client.get("/tournament/ts-league/standings/blue").get_json()["rank"] == 3
+    page = client.get("/tournament/ts-league/standings?offset=1&limit=1").get_json()["standings"]
+    assert [(s["teamId"], s["rank"]) for s in page] == [("green", 2)]
+
+
+def test_standings_share_ranks_and_drop_removed_teams(client):
+    client.post("/tournament", json={"tournament_id": "ts-tied", "name": "Tied"})
+    for team_id, player in (("a", "p1"), ("b", "p2"), ("c", "p3")):
+        add_team(client, "ts-tied", team_id, [player])
+
+    teams = client.get("/tournament/ts-tied").get_json()["teams"]
+    kept = [team for team in teams if team["teamId"] != "c"]
+    kept.append({"teamId": "d", "players": ["p4"]})  # no teamStats yet
+    assert client.put("/tournament/ts-tied/update_team_stats", json={"teams": kept}).status_code == 200
+
+    standings = client.get("/tournament/ts-tied/standings").get_json()["standings"]
+    assert sorted(s["teamId"] for s in standings) == ["a", "b", "d"]
+    assert {s["rank"] for s in standings} == {1}
+    assert client.get("/tournament/ts-tied/standings/c").status_code == 404
+
+
+def legacy_tournament(tournament_id):
+    """A tournament written before standings existed: teams, but no index."""
+    teams = [{"teamId": team_id, "players": [player], "teamStats": {"elo": 1500, "wins": wins, "losses": 0}}
+             for team_id, player, wins in (("red", "ann", 2), ("blue", "bob", 1), ("green", "cy", 0))]
+    tournament_service.tournament_ref.document(tournament_id).set({"name": tournament_id, "teams": teams})
+
+
+@pytest.mark.parametrize("write", ["add_team", "match_outcome"])
+def test_partial_writes_build_missing_standings_for_every_team(client, write):
+    tournament_id = f"ts-legacy-{write}"
+    legacy_tournament(tournament_id)
+
+    if write == "add_team":
+        add_team(client, tournament_id, "gold", ["dee"])
+        expected = [("red", 1), ("blue", 2), ("green", 3), ("gold", 3)]
+    else:
+        client.post(f"/tournament/{tournament_id}/match_outcome",
+                    json={"teamAId": "green", "teamBId": "blue", "result": "teamA won"})
+        expected = [("red", 1), ("green", 2), ("blue", 3)]
+
+    standings = client.get(f"/tournament/{tournament_id}/standings").get_json()["standings"]
+    assert sorted((s["teamId"], s["rank"]) for s in standings) == sorted(expected)
+    assert client.get(f"/tournament/{tournament_id}/standings/red").get_json()["rank"] == 1
+
+
+def test_team_rank_lookup_builds_missing_standings(client):
+    legacy_tournament("ts-legacy-rank")
+
+    assert client.get("/tournament/ts-legacy-rank/standings/blue").get_json()["rank"] == 2
+    assert client.get("/tournament/ts-legacy-rank/standings/nobody").status_code == 404
+    assert client.get("/tournament/ts-none/standings/red").status_code == 404
+
+
+def test_tournaments_page_by_cursor_with_projection_and_ndjson(client):
+    for tournament_id in ("tl-c", "tl-a", "tl-b"):
+        tournament_service.tournament_ref.document(tournament_id).set(
+            {"name": tournament_id.upper(), "status": "tl-listed", "teams": []})
+
+    first = client.get("/tournaments?status=tl-listed&limit=2&fields=name").get_json()
+    assert first == {"tournaments": [{"id": "tl-a", "name": "TL-A"}, {"id": "tl-b", "name": "TL-B"}],
+                     "nextCursor": "tl-b"}
+    rest = client.get("/tournaments?status=tl-listed&limit=2&start_after=tl-b").get_json()
+    assert [t["id"] for t in rest["tournaments"]] == ["tl-c"] and rest["nextCursor"] is None
+
+    everything = client.get("/tournaments?status=tl-listed").get_json()
+    assert [t["id"] for t in everything] == ["tl-a", "tl-b", "tl-c"]
+    lines = client.get("/tournaments?status=tl-listed&format=ndjson&fields=status").get_data(as_text=True)
+    assert [json.loads(line) for line in lines.splitlines()] == [
+        {"id": t, "status": "tl-listed"} for t in ("tl-a", "tl-b", "tl-c")]
+    assert client.get("/tournaments?limit=many").status_code == 400
+
+
+def test_tournament_reads_are_cached_until_a_write(client):
+    assert client.post("/tournament", json={"tournament_id": "ts-cup", "name": "Cup"}).status_code == 201
+
+    response = client.get("/tournament/ts-cup")
+    assert response.get_json()["name"] == "Cup"
+    misses = client.get("/cache/stats").get_json()["misses"]
+    assert client.get("/tournament/ts-cup", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/cache/stats").get_json()["misses"] == misses
+
+    client.put("/tournament/ts-cup/update_round", json={"curRound": 2})
+    updated = client.get("/tournament/ts-cup")
+    assert updated.get_json()["curRound"] == 2
+    assert updated.headers["ETag"] != response.headers["ETag"]
+    assert client.get("/tournament/ts-cup", headers={"If-None-Match": response.headers["ETag"]}).status_code == 200
+    assert client.get("/tournament/ts-missing").status_code == 404
+
+
+def test_batch_reads_and_round_updates(client):
+    for tournament_id in ("ts-b1", "ts-b2"):
+        client.post("/tournament", json={"tournament_id": tournament_id, "name": tournament_id})
+
+    response = client.post("/tournaments/batch", json={"ids": ["ts-b2", "ts-none", "ts-b1"], "fields": ["name"]})
+    body = response.get_json()
+    assert [t["id"] for t in body["tournaments"]] == ["ts-b2", "ts-b1"]
+    assert body["missing"] == ["ts-none"]
+
+    response = client.post("/tournaments/rounds", json={"rounds": [
+        {"tournamentId": "ts-b1", "curRound": 3}, {"tournamentId": "ts-none", "curRound": 1}]})
+    assert response.get_json() == {"updated": ["ts-b1"], "missing": ["ts-none"]}
+    assert client.get("/tournament/ts-b1").get_json()["curRound"] == 3
@@ -0,0 +1,39 @@
+import json
+import time
+
+import tracing
+
+
+def test_drain_writes_the_batch_the_writer_is_holding(tmp_path):
+    trace_dir = tmp_path / "traces"  # created by the exporter
+    exporter = tracing.JsonlExporter(str(trace_dir))
+    for i in range(15):
+        exporter.export({"spanId": str(i)})
+    # The writer has taken the spans and is waiting for more to fill its
+    # batch, which is what a process exiting right after a burst sees
+    time.sleep(0.05)
+    exporter._drain()
+
+    lines = [line for path in trace_dir.iterdir() for line in path.read_text().splitlines()]
+    assert [json.loads(line)["spanId"] for line in lines] == [str(i) for i in range(15)]
+
+
+def test_parse_traceparent():
+    header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    assert tracing.parse_traceparent(header) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+
+
+def test_streamed_response_span_covers_the_body(monkeypatch):
+    import tournament_service
+
+    spans = []
+    monkeypatch.setattr(tracing.exporter, "export", spans.append)
+    client = tournament_service.create_app().test_client()
+    response = client.get("/tournaments")
+    assert spans == []  # still streaming
+    response.get_data()
+    response.close()
+
+    assert [span["name"] for span in spans] == ["GET /tournaments"]